@@ -20,7 +20,8 @@ logger.info(f"sys.path: {sys.path}")
 try:
     from scripts.network_automation import main as network_automation_main
     from scripts.utils import load_yaml_file
-    from scripts.code_upgrade import code_upgrade
+    from scripts.code_upgrade import code_upgrade, stage_upgrade_images, upgrade_preflight_report
+    from scripts.connection_pool import close_pool
 except ImportError as e:
     logger.error(f"Import error: {e}")
     raise
@@ -122,6 +123,12 @@ def main():
             logger.info(f"Executing action {action_name} locally")
             if action_name == 'code_upgrade':
                 code_upgrade()
+            elif action_name == 'code_upgrade_resume':
+                code_upgrade(resume=True)
+            elif action_name == 'stage_images':
+                stage_upgrade_images()
+            elif action_name == 'upgrade_preflight':
+                upgrade_preflight_report()
             else:
                 network_automation_main(action_name)
         else:
@@ -135,6 +142,8 @@ def main():
     except Exception as e:
         logger.error(f"Error in launcher: {e}")
         print(f"Error: {e}")
+    finally:
+        close_pool()
 
 if __name__ == "__main__":
     main()
@@ -30,7 +30,8 @@ def get_hosts():
         raise
 
 def ping_hosts(username: str, password: str, host_ips: List[str], hosts: List[Dict],
-               connect_to_hosts: Callable, disconnect_from_hosts: Callable):
+               connect_to_hosts: Callable, disconnect_from_hosts: Callable, incremental: bool = False,
+               single_check: bool = True):
     """Wrapper for the actual ping_hosts implementation in diagnostic_actions.py"""
     try:
         logger.info("Starting ping action (wrapper)")
@@ -41,7 +42,9 @@ def ping_hosts(username: str, password: str, host_ips: List[str], hosts: List[Di
             host_ips=host_ips,
             hosts=hosts,
             connect_to_hosts=connect_to_hosts,
-            disconnect_from_hosts=disconnect_from_hosts
+            disconnect_from_hosts=disconnect_from_hosts,
+            incremental=incremental,
+            single_check=single_check
         )
         logger.info("Ping action wrapper completed")
     except Exception as e:
@@ -68,8 +71,14 @@ def configure_interfaces(username: str, password: str, host_ips: List[str], host
         raise
 
 def run_monitor_routes_action(username: str, password: str, host_ips: List[str], hosts: List[Dict],
-                              connect_to_hosts: Callable, disconnect_from_hosts: Callable, connections: List[Device] = None):
-    """Orchestrates the route monitoring action."""
+                              connect_to_hosts: Callable, disconnect_from_hosts: Callable, connections: List[Device] = None,
+                              diff: bool = False, continuous: bool = False, measure: bool = False,
+                              prefix: str = None):
+    """Orchestrates the route monitoring action; with diff set, full route tables are snapshotted and compared.
+
+    With measure set, the report also lists the cost of each route collection path per device.
+    With prefix set (diff only), the report traces that address or prefix across the devices.
+    """
     try:
         logger.info("Starting route_monitor action (orchestrator)")
         print("DEBUG: Entering run_monitor_routes_action")
@@ -92,7 +101,11 @@ def run_monitor_routes_action(username: str, password: str, host_ips: List[str],
             hosts=hosts,
             connect_to_hosts=connect_to_hosts,
             disconnect_from_hosts=disconnect_from_hosts,
-            connections=connections
+            connections=connections,
+            diff=diff,
+            measure=measure,
+            continuous=continuous,
+            prefix=prefix
         )
         disconnect_from_hosts(connections)
         logger.info("Route_monitor action orchestrator completed")
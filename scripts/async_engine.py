@@ -0,0 +1,133 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Engine defaults
+DEFAULT_MAX_CONCURRENCY = 200
+DEFAULT_MAX_THREADS = 32
+
+# Per-device jobs registered by the action modules, keyed by job name
+JOB_REGISTRY: Dict[str, Callable] = {}
+
+def register_job(name: str) -> Callable:
+    """
+    Register a per-device job under name.
+
+    A job takes the device as its first argument. It may be a coroutine function, which runs
+    directly on the event loop (e.g. over an async NETCONF transport), or a plain function,
+    which is offloaded to the engine's bounded thread pool (e.g. a blocking PyEZ call).
+    """
+    def decorator(func: Callable) -> Callable:
+        if name in JOB_REGISTRY and JOB_REGISTRY[name] is not func:
+            logger.warning(f"Job '{name}' is already registered; replacing it")
+        JOB_REGISTRY[name] = func
+        return func
+    return decorator
+
+def get_job(name: str) -> Callable:
+    """Return the job registered under name."""
+    if name not in JOB_REGISTRY:
+        raise KeyError(f"Unknown job: {name}. Registered jobs: {sorted(JOB_REGISTRY)}")
+    return JOB_REGISTRY[name]
+
+def _device_key(dev: Any) -> str:
+    """Return the key used to serialize work per device."""
+    return getattr(dev, 'hostname', None) or str(dev)
+
+class AsyncEngine:
+    """
+    asyncio execution core for fleet-wide fan-out of per-device jobs.
+
+    A global semaphore bounds how many jobs run at once, a per-device lock serializes jobs
+    on the same device (a NETCONF session handles one RPC at a time), and blocking jobs
+    share a small thread pool so thousands of devices never mean thousands of threads.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_threads: int = DEFAULT_MAX_THREADS):
+        self.max_concurrency = max_concurrency
+        self.max_threads = max(1, min(max_threads, max_concurrency))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._device_locks: Dict[str, asyncio.Lock] = {}
+
+    def _bind(self) -> None:
+        """Create the loop-bound primitives for the running event loop."""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._device_locks = {}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix='engine')
+
+    async def run_on_device(self, dev: Any, job: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a single job against one device under the global limit and the device's lock."""
+        if self._semaphore is None:
+            self._bind()
+        lock = self._device_locks.setdefault(_device_key(dev), asyncio.Lock())
+        async with self._semaphore:
+            if asyncio.iscoroutinefunction(job):
+                async with lock:
+                    return await asyncio.wait_for(job(dev, *args, **kwargs), timeout)
+            await lock.acquire()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, functools.partial(job, dev, *args, **kwargs))
+            # A worker thread cannot be interrupted: after a timeout or cancel it is still using the
+            # session, so the device stays locked until the thread really finishes
+            future.add_done_callback(functools.partial(self._release_device, lock, _device_key(dev)))
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    @staticmethod
+    def _release_device(lock: asyncio.Lock, key: str, future: asyncio.Future) -> None:
+        """Unlock a device once its offloaded job has finished, logging the outcome of an abandoned job."""
+        lock.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Offloaded job on {key} ended with: {future.exception()}")
+
+    async def fan_out(self, devices: List[Any], job: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Run job concurrently against every device.
+
+        Returns:
+            Dict[str, Any]: Result per device key; failed or timed-out jobs map to their exception.
+        """
+        self._bind()
+        tasks = [
+            asyncio.create_task(self.run_on_device(dev, job, *args, timeout=timeout, **kwargs), name=_device_key(dev))
+            for dev in devices
+        ]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        results = {}
+        for dev, outcome in zip(devices, outcomes):
+            key = _device_key(dev)
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.error(f"Job {getattr(job, '__name__', job)} timed out on {key}")
+            elif isinstance(outcome, BaseException):
+                logger.error(f"Job {getattr(job, '__name__', job)} failed on {key}: {outcome}")
+            results[key] = outcome
+        return results
+
+    def run(self, devices: List[Any], job: Any, *args, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        """Blocking entry point: run a job (callable or registered name) against all devices."""
+        if isinstance(job, str):
+            job = get_job(job)
+        start = time.time()
+        try:
+            results = asyncio.run(self.fan_out(devices, job, *args, timeout=timeout, **kwargs))
+        finally:
+            self.shutdown()
+        logger.info(f"Ran {getattr(job, '__name__', job)} on {len(devices)} device(s) in {time.time() - start:.2f}s")
+        return results
+
+    def shutdown(self) -> None:
+        """Release the offload thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+def run_job(devices: List[Any], job: Any, *args, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    """Run a job (callable or registered name) against devices with a fresh engine."""
+    return AsyncEngine(max_concurrency=max_concurrency).run(devices, job, *args, timeout=timeout, **kwargs)
@@ -1,21 +1,26 @@
+import argparse
 import logging
 import os
-import subprocess
 import time
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 
 from jnpr.junos import Device
 from jnpr.junos.exception import (
     ConnectError,
-    ConnectRefusedError,
-    ConnectTimeoutError,
-    ProbeError,
     RpcError,
 )
 from jnpr.junos.utils.sw import SW
 
-from scripts.connect_to_hosts import connect_to_hosts, disconnect_from_hosts
+from scripts.connection_pool import get_pool, pooled_connect_to_hosts, release_to_pool
+from scripts.facts_cache import get_device_facts, invalidate_device_facts
+from scripts.image_staging import print_staging, stage_images, staging_settings
+from scripts.readiness import wait_for_down, wait_for_ready
+from scripts.state_snapshots import StateStore, format_fleet_diff, take_fleet_snapshot
+from scripts.upgrade_journal import UpgradeJournal, next_phase
+from scripts.upgrade_orchestrator import RollingUpgrade, load_host_groups, rollout_settings
+from scripts.upgrade_preflight import format_preflight, preflight_settings, run_preflight, save_preflight_report
 from scripts.utils import load_yaml_file, save_yaml_file
+from scripts.validation_ledger import get_validation_ledger, validation_key
 
 logger = logging.getLogger(__name__)
 
@@ -235,7 +240,7 @@ def check_current_version(dev: Device, hostname: str, target_version: str) -> bo
     logger.info(f"Checking current version on {hostname}")
     print(f"Checking current version on {hostname}...")
     try:
-        current_version = dev.facts.get("version")
+        current_version = get_device_facts(dev).get("version")
         if not current_version:
             logger.warning(f"No version found in facts on {hostname}. Falling back to CLI.")
             version_output = dev.cli("show version", warning=False)
@@ -266,159 +271,254 @@ def check_current_version(dev: Device, hostname: str, target_version: str) -> bo
         print(f"⚠️ Warning: Failed to check Junos version on {hostname}: {e}. Proceeding with upgrade.")
         return True
 
-def probe_device(
-    hostname: str, username: str, password: str, max_wait: int = 900, interval: int = 60
-) -> bool:
-    """Probe device availability using ping and PyEZ connection until it responds or times out."""
-    logger.info(f"Probing {hostname} for availability post-reboot")
-    print(f"Probing {hostname} for availability post-reboot...")
-    start_time = time.time()
-    while time.time() - start_time < max_wait:
-        try:
-            # Check ping
-            ping_result = subprocess.run(
-                ["ping", "-c", "1", "-W", "2", hostname],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if ping_result.returncode != 0:
-                logger.debug(f"Ping to {hostname} failed: {ping_result.stderr}")
-                print(f"⚠️ {hostname} not yet reachable via ping. Retrying in {interval} seconds...")
-                time.sleep(interval)
-                continue
+def compare_version(hostname: str, current_version: str, target_version: str) -> tuple:
+    """
+    Compare the base version running on a device (sub-release like .5 stripped) with the target.
+
+    Returns:
+        tuple: (bool: True if the versions match, str: current_version,
+                str: Error message on mismatch, None otherwise)
+    """
+    base_current = current_version.split(".")[0] if "." in current_version else current_version
+    base_target = target_version.split(".")[0] if "." in target_version else target_version
+    if base_current == base_target:
+        print(f"✅ Version {current_version} matches target {target_version}.")
+        logger.info(f"Version {current_version} matches target {target_version}.")
+        return True, current_version, None
+    print(f"❌ Version mismatch: Found {current_version}, Target {target_version}.")
+    logger.warning(f"Version mismatch on {hostname}: Found {current_version}, Target {target_version}.")
+    return False, current_version, f"Version mismatch: Found {current_version}, Target {target_version}"
+
+def select_release(upgrade_data: Dict) -> Dict:
+    """Walk the vendor, product and release menus and return the selected release, or None."""
+    vendors = upgrade_data.get("products", [])
+    logger.info(f"Loaded vendors: {[v['vendor-name'] for v in vendors]}")
+
+    # Display vendor menu
+    vendor_idx = display_vendors(vendors)
+    if vendor_idx is None:
+        logger.error("No vendor selected")
+        return None
+    selected_vendor = vendors[vendor_idx]
+    logger.info(f"Selected vendor: {selected_vendor['vendor-name']}")
+    print(f"Selected vendor: {selected_vendor['vendor-name']}")
+
+    # Aggregate products from switches, firewalls, and routers
+    products = []
+    for device_type in ["switches", "firewalls", "routers"]:
+        products.extend(selected_vendor.get(device_type, []))
+    logger.info(f"Loaded products: {[p['product'] for p in products]}")
+
+    # Display product menu
+    product_idx = display_products(products)
+    if product_idx is None:
+        logger.error("No product selected")
+        return None
+    selected_product = products[product_idx]
+    logger.info(f"Selected product: {selected_product['product']}")
+    print(f"Selected product: {selected_product['product']}")
+
+    # Display release menu
+    selected_release = display_releases(selected_product)
+    if selected_release is None:
+        logger.error("No release selected")
+        return None
+    logger.info(f"Selected release: {selected_release['release']}")
+    print(f"Selected release: {selected_release['release']}")
+    return selected_release
+
+def local_image_size(upgrade_data: Dict, image_path: str) -> Optional[int]:
+    """Return the size of the image in the local image repository, or None if it is not there."""
+    local_path = os.path.join(staging_settings(upgrade_data)["image_dir"], os.path.basename(image_path))
+    return os.path.getsize(local_path) if os.path.isfile(local_path) else None
+
+class UpgradeError(Exception):
+    """An upgrade step did not succeed; the message is what the summary lists."""
+
+def preflight_device(dev: Device, image_path: str, target_version: str, journal: UpgradeJournal,
+                     report: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Run the preflight (version) and staged (image present) checks a device has not completed yet.
+
+    report is the device's result from run_preflight, if one ran; its version and image results
+    are used instead of asking the device again.
+
+    Returns:
+        Optional[Dict]: None when the device is ready to install, otherwise its final status
+                        (already on target, downgrade declined, missing image or error).
+    """
+    hostname = dev.hostname
+    status = {"hostname": hostname, "success": False, "error": None}
+    try:
+        # Set timeouts; pooled sessions are already open
+        dev.timeout = 600
+        if not dev.connected:
+            dev.open()
+
+        print(f"✅ Successfully logged in to {hostname}")
 
-            # Check PyEZ connection
-            connections = connect_to_hosts([hostname], username, password)
-            if connections:
-                logger.info(f"{hostname} is reachable and PyEZ connection is up")
-                print(f"✅ {hostname} is reachable and PyEZ connection is up")
-                disconnect_from_hosts(connections)
-                return True
-            logger.debug(f"PyEZ connection to {hostname} failed")
-            print(f"⚠️ {hostname} pingable but PyEZ not ready. Retrying in {interval} seconds...")
-        except Exception as e:
-            logger.debug(f"Probe to {hostname} failed: {e}")
-            print(f"⚠️ {hostname} not yet fully reachable. Retrying in {interval} seconds...")
-        time.sleep(interval)
-    logger.error(f"{hostname} did not become reachable within {max_wait} seconds")
-    print(f"❌ {hostname} did not become reachable within {max_wait} seconds")
-    return False
-
-def verify_version(
+        # Check current version
+        if journal.completed(hostname) is None:
+            if report and report["on_target"]:
+                logger.info(f"{hostname} already on target version {target_version}. Skipping upgrade.")
+                print(f"✅ {hostname} already on target version {target_version}. Skipping upgrade.")
+                journal.complete(hostname, "verified", skipped=True)
+                status["success"] = True
+                return status
+            if not check_current_version(dev, hostname, target_version):
+                journal.complete(hostname, "verified", skipped=True)
+                status["success"] = True
+                return status
+            journal.complete(hostname, "preflight")
+
+        # Check image existence
+        image_ok = report["checks"]["image"]["ok"] if report and "image" in report["checks"] else None
+        if image_ok is None:
+            image_ok = check_image_exists(dev, image_path, hostname)
+        if not image_ok:
+            logger.error(f"Skipping upgrade for {hostname} due to missing image")
+            print(f"❌ Skipping upgrade for {hostname} due to missing image")
+            status["error"] = "Missing image"
+            journal.fail(hostname, status["error"])
+            return status
+        journal.complete(hostname, "staged")
+        return None
+    except Exception as e:
+        logger.error(f"Error upgrading {hostname}: {e}")
+        print(f"❌ Error upgrading {hostname}: {e}")
+        status["error"] = str(e)
+        journal.fail(hostname, status["error"])
+        return status
+
+def upgrade_device(
     hostname: str,
     username: str,
     password: str,
+    image_path: str,
     target_version: str,
-    max_attempts: int = 30,
-    retry_interval: int = 30,
-) -> tuple:
+    journal: UpgradeJournal,
+    dev: Optional[Device] = None
+) -> Dict:
     """
-    Connects to a device, retrieves version via PyEZ facts, and compares to the target.
-    Uses connect_to_hosts for connection management.
+    Take one staged device from its last completed phase through install, reboot and verification.
 
-    Args:
-        hostname: Device IP address or hostname.
-        username: Login username.
-        password: Login password.
-        target_version: The desired JUNOS version string.
-        max_attempts: Maximum number of connection/verification attempts.
-        retry_interval: Seconds to wait between retry attempts.
+    Each phase is recorded in the journal as soon as it completes, so a resumed run continues
+    after it: an installed image is not installed again, and a device that was already
+    rebooting is only waited for. dev is an open session used for install and reboot; without
+    one, a session is taken from the pool.
 
     Returns:
-        tuple: (bool: True if version matches target, False otherwise,
-                str: Detected version string or None if detection failed,
-                str: Error message if verification failed, None otherwise)
+        Dict: {'hostname', 'success', 'error'} as listed in the upgrade summary.
     """
-    logger.info(f"Attempting to verify version on {hostname} against target '{target_version}'")
-    print(f"Attempting to verify version on {hostname} against target '{target_version}'...")
-
-    last_exception = None
-
-    for attempt in range(max_attempts):
-        connections = []
-        try:
-            print(f"Attempt {attempt + 1}/{max_attempts}: Connecting to {hostname}...")
-            logger.info(f"Attempt {attempt + 1}/{max_attempts}: Connecting to {hostname}...")
-
-            # Connect using connect_to_hosts
-            connections = connect_to_hosts([hostname], username, password)
-            if not connections:
-                raise ConnectError(f"{hostname}: Failed to establish connection")
-
-            dev = connections[0]
-            if not dev.connected:
-                logger.error(f"Attempt {attempt + 1}: Connection to {hostname} reported as not connected")
-                raise ConnectError(f"{hostname}: Connection failed (connected flag is False)")
-
-            print(f"✅ Successfully connected to {hostname} (Attempt {attempt + 1})")
-            logger.info(f"✅ Successfully connected to {hostname} (Attempt {attempt + 1})")
-
-            # Get version using facts
-            logger.debug(f"Retrieving facts from {hostname}")
-            facts = dev.facts
-            current_version = facts.get("version")
-
-            if current_version:
-                logger.info(f"Version found on {hostname}: {current_version} (via facts)")
-                print(f"✅ Version on {hostname}: {current_version} (via facts)")
-
-                # Compare base version (strip sub-release like .5)
-                base_current = current_version.split(".")[0] if "." in current_version else current_version
-                base_target = target_version.split(".")[0] if "." in target_version else target_version
-                match = base_current == base_target
-                if match:
-                    print(f"✅ Version {current_version} matches target {target_version}.")
-                    logger.info(f"Version {current_version} matches target {target_version}.")
-                    disconnect_from_hosts(connections)
-                    return True, current_version, None
-                else:
-                    print(f"❌ Version mismatch: Found {current_version}, Target {target_version}.")
-                    logger.warning(f"Version mismatch on {hostname}: Found {current_version}, Target {target_version}.")
-                    disconnect_from_hosts(connections)
-                    return False, current_version, f"Version mismatch: Found {current_version}, Target {target_version}"
-            else:
-                err_msg = "Version key not found in device facts."
-                logger.warning(f"{err_msg} on {hostname} (Attempt {attempt + 1})")
-                last_exception = ValueError(err_msg)
-
-        except ConnectRefusedError as e:
-            last_exception = e
-            logger.warning(f"Attempt {attempt + 1} failed: Connection refused by {hostname}. Device likely still booting or NETCONF not ready.")
-            print("❌ Connection refused. Retrying...")
-        except (ConnectError, ConnectTimeoutError, ProbeError) as e:
-            last_exception = e
-            logger.warning(f"PyEZ Connection/Auth Attempt {attempt + 1} failed for {hostname}: {type(e).__name__} - {e}")
-            print(f"⚠️ PyEZ Connection/Auth Attempt {attempt + 1} failed: {type(e).__name__}. Retrying...")
-        except RpcError as e:
-            last_exception = e
-            logger.warning(f"PyEZ RPC Error Attempt {attempt + 1} failed for {hostname}: {type(e).__name__} - {e}")
-            print(f"⚠️ PyEZ RPC Error on Attempt {attempt + 1}. Retrying...")
-        except Exception as e:
-            last_exception = e
-            logger.error(f"Unexpected Exception during PyEZ Attempt {attempt + 1} for {hostname}: {type(e).__name__} - {e}", exc_info=True)
-            print(f"⚠️ Unexpected Exception on Attempt {attempt + 1}: {e}. Retrying...")
-        finally:
-            if connections:
-                logger.debug(f"Closing connections to {hostname} after attempt {attempt + 1}")
-                disconnect_from_hosts(connections)
-
-        if attempt < max_attempts - 1:
-            logger.info(f"Waiting {retry_interval} seconds before next attempt ({attempt + 2}/{max_attempts}) to verify {hostname}")
-            print(f"Retrying in {retry_interval} seconds...")
-            time.sleep(retry_interval)
-        else:
-            logger.error(f"All {max_attempts} verification attempts failed for {hostname}. Last recorded error: {last_exception}")
-            print(f"❌ All {max_attempts} verification attempts failed for {hostname}.")
+    status = {"hostname": hostname, "success": False, "error": None}
+    pool = get_pool()
+    phase = journal.completed(hostname)
+    try:
+        if phase not in ("staged", "installed", "rebooting"):
+            raise UpgradeError(f"Cannot continue upgrade from phase {phase}")
+        # Run the phases after the last completed one, recording each as soon as it completes
+        while next_phase(phase) is not None:
+            phase = next_phase(phase)
+            details = {}
+            if phase == "installed":
+                dev = dev or pool.acquire(hostname, username, password)
+                dev.timeout = 600
 
-    error_message = f"Failed to connect and verify version on {hostname} after {max_attempts} attempts. Last error: {str(last_exception)}"
-    return False, None, error_message
+                # Skip validation when this image already passed against the same chassis and configuration
+                ledger = get_validation_ledger()
+                try:
+                    validation = validation_key(dev, image_path)
+                except Exception as e:
+                    logger.warning(f"Cannot build validation key for {hostname}: {e}. Validating.")
+                    validation = None
+                validated = ledger.lookup(validation) if validation else None
+                validate = validated is None
+                if not validate:
+                    logger.info(f"Reusing validation of {image_path} on {hostname} from {validated['timestamp']}")
+                    print(f"✅ {image_path} already validated on {hostname} with the current configuration; skipping validation")
+
+                # Validate on its own so the ledger records the validation outcome, not the install outcome
+                sw = SW(dev)
+                if validate:
+                    print(f"Validating {image_path} on {hostname} (this can take 15+ minutes)...")
+                    start = time.time()
+                    result = sw.validate(remote_package=image_path)
+                    # Some junos-eznc releases return (ok, msg) here as install() does
+                    valid = bool(result[0] if isinstance(result, tuple) else result)
+                    if validation:
+                        ledger.record(hostname, os.path.basename(image_path), validation, valid, time.time() - start)
+                    if not valid:
+                        print(f"❌ Package validation failed on {hostname}. No install or reboot issued.")
+                        raise UpgradeError("Package validation failed")
+                    print(f"✅ Package validated on {hostname}.")
+
+                # Perform upgrade; validation was done above or is reused from the ledger
+                print(f"Installing software (no reboot) on {hostname}...")
+                ok, msg = sw.install(package=image_path, validate=False, no_copy=True, progress=True)
+                if not ok:
+                    print(f"❌ Installation did not complete successfully on {hostname}: {msg}. No reboot issued.")
+                    raise UpgradeError(f"Installation failed: {msg}")
+                print(f"✅ Installation completed successfully on {hostname}.")
+            elif phase == "rebooting":
+                dev = dev or pool.acquire(hostname, username, password)
+                dev.timeout = 600
+                print(f"Rebooting {hostname}...")
+                SW(dev).reboot()
+                invalidate_device_facts(hostname)
+                logger.info(f"Reboot initiated on {hostname}")
+                print(f"✅ Reboot initiated on {hostname}")
+            elif phase == "verified":
+                # Wait for the device to answer a version RPC and verify over that session
+                ready = wait_for_ready(hostname, username, password, max_wait=900)
+                if not ready["ready"]:
+                    logger.error(f"Failed to confirm {hostname} availability after reboot")
+                    print(f"❌ Failed to confirm {hostname} availability after reboot")
+                    raise UpgradeError(f"Device not reachable after reboot (last check passed: {ready['stage'] or 'none'})")
+                pool.release(ready["device"])
+                success, current_version, error = compare_version(hostname, ready["version"], target_version)
+                if not success:
+                    raise UpgradeError(f"Version verification failed: {error}")
+                details["version"] = current_version
+            journal.complete(hostname, phase, **details)
+
+            if phase == "rebooting":
+                # Sessions to the rebooting device are dead; drop them from the pool
+                pool.release(dev, discard=True)
+                dev = None
+                pool.evict(hostname)
+                print(f"Device {hostname} is rebooting. Waiting for availability...")
+                wait_for_down(hostname)
+
+        logger.info(f"Upgrade successful on {hostname}. Version: {details['version']}")
+        print(f"✅ Upgrade successful on {hostname}. Version: {details['version']}")
+        status["success"] = True
+        return status
+
+    except UpgradeError as e:
+        status["error"] = str(e)
+    except ConnectError as e:
+        status["error"] = f"Connection error: {e}"
+    except RpcError as e:
+        status["error"] = f"RPC error: {e}"
+    except Exception as e:
+        status["error"] = f"Unexpected error: {e}"
+    logger.error(f"Error upgrading {hostname}: {status['error']}")
+    print(f"❌ Error upgrading {hostname}: {status['error']}")
+    journal.fail(hostname, status["error"])
+    if dev is not None:
+        pool.release(dev, discard=True)
+    return status
+
+def code_upgrade(resume: bool = False, journal_path: Optional[str] = None):
+    """
+    Perform code upgrade on selected devices.
 
-def code_upgrade():
-    """Perform code upgrade on selected devices."""
+    With resume, the selections of an interrupted run are read from its journal (the latest one
+    unless journal_path is given) and every device continues from its last completed phase.
+    """
     upgrade_status = []
     try:
-        logger.info("Starting code_upgrade action")
+        logger.info(f"Starting code_upgrade action{' (resume)' if resume else ''}")
         print("Starting code upgrade process...")
 
         # Load upgrade_data.yml
@@ -431,49 +531,41 @@ def code_upgrade():
             logger.error("Failed to load upgrade_data.yml")
             print("❌ Error: Failed to load upgrade_data.yml")
             return
-        vendors = upgrade_data.get("products", [])
-        logger.info(f"Loaded vendors: {[v['vendor-name'] for v in vendors]}")
-
-        # Display vendor menu
-        vendor_idx = display_vendors(vendors)
-        if vendor_idx is None:
-            logger.error("No vendor selected")
-            return
-        selected_vendor = vendors[vendor_idx]
-        logger.info(f"Selected vendor: {selected_vendor['vendor-name']}")
-        print(f"Selected vendor: {selected_vendor['vendor-name']}")
-
-        # Aggregate products from switches, firewalls, and routers
-        products = []
-        for device_type in ["switches", "firewalls", "routers"]:
-            products.extend(selected_vendor.get(device_type, []))
-        logger.info(f"Loaded products: {[p['product'] for p in products]}")
-
-        # Display product menu
-        product_idx = display_products(products)
-        if product_idx is None:
-            logger.error("No product selected")
-            return
-        selected_product = products[product_idx]
-        logger.info(f"Selected product: {selected_product['product']}")
-        print(f"Selected product: {selected_product['product']}")
-
-        # Display release menu
-        selected_release = display_releases(selected_product)
-        if selected_release is None:
-            logger.error("No release selected")
-            return
-        logger.info(f"Selected release: {selected_release['release']}")
-        print(f"Selected release: {selected_release['release']}")
 
-        # Get host IPs
-        host_ips = get_host_ips()
-        if not host_ips:
-            logger.error("No host IPs provided")
-            print("❌ Error: No host IPs provided")
-            return
-        logger.info(f"Host IPs: {host_ips}")
-        print(f"Hosts to upgrade: {host_ips}")
+        if resume:
+            journal_path = journal_path or UpgradeJournal.latest()
+            if not journal_path:
+                logger.error("No upgrade journal to resume")
+                print("❌ Error: No upgrade journal to resume")
+                return
+            journal = UpgradeJournal.load(journal_path)
+            image_path = journal.run["image_path"]
+            target_version = journal.run["target_version"]
+            host_ips = journal.pending()
+            for hostname in journal.run["hosts"]:
+                if hostname not in host_ips:
+                    upgrade_status.append({"hostname": hostname, "success": True, "error": None})
+            print(f"Resuming {journal_path}: {len(host_ips)} of {len(journal.run['hosts'])} device(s) not verified")
+            for hostname in host_ips:
+                print(f"  - {hostname}: last completed phase {journal.completed(hostname) or 'none'}")
+            if not host_ips:
+                print("✅ Every device of this run is already verified.")
+                return
+        else:
+            selected_release = select_release(upgrade_data)
+            if selected_release is None:
+                return
+
+            # Get host IPs
+            host_ips = get_host_ips()
+            if not host_ips:
+                logger.error("No host IPs provided")
+                print("❌ Error: No host IPs provided")
+                return
+            logger.info(f"Host IPs: {host_ips}")
+            print(f"Hosts to upgrade: {host_ips}")
+            image_path = f"/var/tmp/{selected_release['os']}"
+            target_version = selected_release["release"]
 
         # Get credentials
         username, password = get_credentials()
@@ -482,118 +574,96 @@ def code_upgrade():
             print("❌ Error: No credentials provided")
             return
 
-        # Connect to hosts
-        print("Connecting to devices...")
-        connections = connect_to_hosts(host_ips, username, password)
-        if not connections:
-            logger.error("No devices connected for code upgrade")
-            print("❌ Error: No devices connected for code upgrade")
-            return
-        logger.info(f"Connected to devices: {[dev.hostname for dev in connections]}")
+        if not resume:
+            journal = UpgradeJournal.create({"image_path": image_path, "target_version": target_version,
+                                             "hosts": host_ips, "username": username})
+            logger.info(f"Journaling upgrade to {journal.path}")
 
-        # Perform upgrade
-        image_path = f"/var/tmp/{selected_release['os']}"
-        target_version = selected_release["release"]
-        for dev in connections:
-            hostname = dev.hostname
-            status = {"hostname": hostname, "success": False, "error": None}
-            try:
-                # Set timeouts
-                dev.timeout = 600
-                dev.open(timeout=300)
-
-                print(f"✅ Successfully logged in to {hostname}")
-
-                # Check image existence
-                if not check_image_exists(dev, image_path, hostname):
-                    logger.error(f"Skipping upgrade for {hostname} due to missing image")
-                    print(f"❌ Skipping upgrade for {hostname} due to missing image")
-                    status["error"] = "Missing image"
-                    upgrade_status.append(status)
-                    dev.close()
-                    continue
-
-                # Check current version
-                if not check_current_version(dev, hostname, target_version):
-                    status["success"] = True
-                    upgrade_status.append(status)
-                    dev.close()
-                    continue
-
-                # Perform upgrade
-                sw = SW(dev)
-                print(f"Installing software with validation (no reboot) on {hostname}...")
-                try:
-                    success = sw.install(package=image_path, validate=True, no_copy=True, progress=True)
-                    if success:
-                        print("✅ Installation validated successfully. Rebooting...")
-                        sw.reboot()
-                        logger.info(f"Reboot initiated on {hostname}")
-                        print(f"✅ Reboot initiated on {hostname}")
-                    else:
-                        print("❌ Installation did not complete successfully. No reboot issued.")
-                        logger.error(f"Software upgrade failed on {hostname}")
-                        status["error"] = "Installation failed"
-                        upgrade_status.append(status)
-                        dev.close()
-                        continue
-                except ConnectError as e:
-                    logger.error(f"Connection error on {hostname}: {e}")
-                    print(f"❌ Connection error: {e}")
-                    status["error"] = f"Connection error: {e}"
-                    upgrade_status.append(status)
-                    dev.close()
-                    continue
-                except RpcError as e:
-                    logger.error(f"RPC error during install on {hostname}: {e}")
-                    print(f"❌ RPC error during install: {e}")
-                    status["error"] = f"RPC error: {e}"
-                    upgrade_status.append(status)
-                    dev.close()
-                    continue
-                except Exception as e:
-                    logger.error(f"Unexpected error on {hostname}: {e}")
-                    print(f"❌ Unexpected error: {e}")
-                    status["error"] = f"Unexpected error: {e}"
+        # Connect to the devices that still need preflight checks
+        state_store = StateStore()
+        pre_snapshot = journal.snapshots.get("pre")
+        pending_preflight = [h for h in host_ips if journal.completed(h) in (None, "preflight")]
+        connections = []
+        if pending_preflight:
+            print("Connecting to devices...")
+            connections = pooled_connect_to_hosts(pending_preflight, username, password)
+            connected = {dev.hostname for dev in connections}
+            logger.info(f"Connected to devices: {sorted(connected)}")
+            for hostname in pending_preflight:
+                if hostname not in connected:
+                    status = {"hostname": hostname, "success": False, "error": "Connection failed"}
+                    journal.fail(hostname, status["error"])
                     upgrade_status.append(status)
-                    dev.close()
-                    continue
 
-                # Wait for reboot and probe device
-                print(f"Device {hostname} is rebooting. Waiting for availability...")
-                time.sleep(60)  # Initial delay to allow reboot to start
-                if dev.connected:
-                    dev.close()
-
-                # Probe device until available
-                if not probe_device(hostname, username, password, max_wait=900, interval=60):
-                    logger.error(f"Failed to confirm {hostname} availability after reboot")
-                    print(f"❌ Failed to confirm {hostname} availability after reboot")
-                    status["error"] = "Device not reachable after reboot"
+        # Snapshot the state of every target device concurrently before touching any of them
+        if pre_snapshot is None and not resume and connections:
+            pre_snapshot = take_fleet_snapshot(connections, "pre", state_store)
+            journal.snapshot("pre", pre_snapshot)
+
+        # Run the pre-flight checks on every device at once; only devices that pass go on
+        reports = {}
+        if connections:
+            reports = run_preflight(connections, image_path, target_version, local_image_size(upgrade_data, image_path),
+                                    preflight_settings(upgrade_data))
+            preflight_table = format_preflight(reports, target_version)
+            print(f"\nPre-flight checks:\n{preflight_table}")
+            print(f"Pre-flight report saved to {save_preflight_report(preflight_table)}")
+            for dev in list(connections):
+                report = reports.get(dev.hostname)
+                if report and not report["go"] and not report["on_target"]:
+                    status = {"hostname": dev.hostname, "success": False,
+                              "error": f"Pre-flight failed: {'; '.join(report['reasons'])}"}
+                    journal.fail(dev.hostname, status["error"])
                     upgrade_status.append(status)
-                    continue
-
-                # Verify version
-                success, current_version, error = verify_version(hostname, username, password, target_version)
-                if success:
-                    logger.info(f"Upgrade successful on {hostname}. Version: {current_version}")
-                    print(f"✅ Upgrade successful on {hostname}. Version: {current_version}")
-                    status["success"] = True
-                else:
-                    logger.error(f"Version verification failed on {hostname}: {error}")
-                    print(f"❌ Version verification failed on {hostname}: {error}")
-                    status["error"] = f"Version verification failed: {error}"
-                upgrade_status.append(status)
-
-            except Exception as e:
-                logger.error(f"Error upgrading {hostname}: {e}")
-                print(f"❌ Error upgrading {hostname}: {e}")
-                status["error"] = str(e)
+                    connections.remove(dev)
+                    release_to_pool([dev])
+
+        # Confirm version and image per device; a downgrade prompts, so this stays sequential
+        sessions = {}
+        for dev in list(connections):
+            status = preflight_device(dev, image_path, target_version, journal, reports.get(dev.hostname))
+            if status is None:
+                sessions[dev.hostname] = dev
+            else:
                 upgrade_status.append(status)
+                connections.remove(dev)
                 if dev.connected:
-                    dev.close()
+                    get_pool().release(dev, discard=bool(status["error"]))
+
+        # Upgrade the staged devices concurrently within the rollout limits
+        to_upgrade = [h for h in host_ips if journal.completed(h) in ("staged", "installed", "rebooting")]
+        if to_upgrade:
+            settings = rollout_settings(upgrade_data)
+            rollout = RollingUpgrade(
+                to_upgrade,
+                lambda host: upgrade_device(host, username, password, image_path, target_version, journal,
+                                            dev=sessions.get(host)),
+                max_in_flight=settings["max_in_flight"],
+                caps=settings["caps"],
+                failure_budget=settings["failure_budget"],
+                host_groups=load_host_groups(),
+            )
+            print(f"Upgrading {len(to_upgrade)} device(s), up to {settings['max_in_flight']} at a time...")
+            upgrade_status.extend(rollout.run())
 
-        disconnect_from_hosts(connections)
+        release_to_pool([dev for dev in connections if dev.connected])
+
+        # Snapshot again and report what changed across the fleet
+        if pre_snapshot:
+            post_connections = pooled_connect_to_hosts(journal.run["hosts"], username, password)
+            try:
+                post_snapshot = take_fleet_snapshot(post_connections, "post", state_store)
+                journal.snapshot("post", post_snapshot)
+            finally:
+                release_to_pool(post_connections)
+            state_report = format_fleet_diff(state_store.diff_snapshots(pre_snapshot, post_snapshot))
+            report_dir = os.path.join(os.path.dirname(__file__), "../reports")
+            os.makedirs(report_dir, exist_ok=True)
+            state_report_file = os.path.join(report_dir, f"upgrade_state_diff_{post_snapshot}.txt")
+            with open(state_report_file, "w") as f:
+                f.write(f"State changes {pre_snapshot} -> {post_snapshot}\n{state_report}")
+            print(f"\nState changes: {state_report.splitlines()[0]}")
+            print(f"State diff saved to {state_report_file}")
 
         # Summarize upgrade status
         successful = [s for s in upgrade_status if s["success"]]
@@ -605,11 +675,12 @@ def code_upgrade():
             print(f"  - {s['hostname']}")
         print(f"Failed: {len(failed)} device(s)")
         for s in failed:
-            print(f"  - {s['hostname']}: {s['error']}")
+            print(f"  - {s['hostname']}: {s['error']} (last completed phase: {journal.completed(s['hostname']) or 'none'})")
 
         if failed:
             logger.warning("Code upgrade process completed with failures")
             print("Code upgrade process completed with failures.")
+            print(f"Resume with: python -m scripts.code_upgrade --resume {journal.path}")
         else:
             logger.info("Code upgrade process completed successfully")
             print("Code upgrade process completed successfully.")
@@ -620,3 +691,133 @@ def code_upgrade():
     except Exception as e:
         logger.error(f"Error in code_upgrade: {e}")
         print(f"❌ Error: {e}")
+
+def stage_upgrade_images():
+    """Copy the image of a selected release to the /var/tmp of selected devices ahead of an upgrade."""
+    try:
+        logger.info("Starting stage_images action")
+        print("Starting image staging...")
+
+        upgrade_data_file = os.path.join(
+            os.getenv("VECTOR_PY_DIR", "/home/nikos/github/ngeran/vector-py"),
+            "data/upgrade_data.yml",
+        )
+        upgrade_data = load_yaml_file(upgrade_data_file)
+        if not upgrade_data:
+            logger.error("Failed to load upgrade_data.yml")
+            print("❌ Error: Failed to load upgrade_data.yml")
+            return
+        selected_release = select_release(upgrade_data)
+        if selected_release is None:
+            return
+
+        settings = staging_settings(upgrade_data)
+        local_path = os.path.join(settings["image_dir"], selected_release["os"])
+        if not os.path.isfile(local_path):
+            logger.error(f"Image {local_path} not found in the local image repository")
+            print(f"❌ Error: Image {local_path} not found in the local image repository")
+            return
+
+        host_ips = get_host_ips()
+        if not host_ips:
+            logger.error("No host IPs provided")
+            print("❌ Error: No host IPs provided")
+            return
+        username, password = get_credentials()
+        if not username or not password:
+            logger.error("No credentials provided")
+            print("❌ Error: No credentials provided")
+            return
+
+        print(f"Staging {selected_release['os']} on {len(host_ips)} device(s), "
+              f"up to {settings['max_parallel']} at a time...")
+        results = stage_images(host_ips, username, password, local_path,
+                               max_parallel=settings["max_parallel"], bandwidth_kbps=settings["bandwidth_kbps"])
+        print_staging(results)
+        failed = [r for r in results if r["status"] == "failed"]
+        if failed:
+            logger.warning(f"Image staging completed with {len(failed)} failure(s)")
+            print(f"Image staging completed with {len(failed)} failure(s).")
+        else:
+            logger.info("Image staging completed successfully")
+            print("Image staging completed successfully.")
+
+    except KeyboardInterrupt:
+        logger.info("Image staging interrupted by user (Ctrl+C)")
+        print("\nProgram interrupted by user. Exiting.")
+    except Exception as e:
+        logger.error(f"Error in stage_upgrade_images: {e}")
+        print(f"❌ Error: {e}")
+
+def upgrade_preflight_report():
+    """Run the pre-flight checks for a selected release on selected devices and print go/no-go per device."""
+    try:
+        logger.info("Starting upgrade_preflight action")
+        print("Starting upgrade pre-flight checks...")
+
+        upgrade_data_file = os.path.join(
+            os.getenv("VECTOR_PY_DIR", "/home/nikos/github/ngeran/vector-py"),
+            "data/upgrade_data.yml",
+        )
+        upgrade_data = load_yaml_file(upgrade_data_file)
+        if not upgrade_data:
+            logger.error("Failed to load upgrade_data.yml")
+            print("❌ Error: Failed to load upgrade_data.yml")
+            return
+        selected_release = select_release(upgrade_data)
+        if selected_release is None:
+            return
+
+        host_ips = get_host_ips()
+        if not host_ips:
+            logger.error("No host IPs provided")
+            print("❌ Error: No host IPs provided")
+            return
+        username, password = get_credentials()
+        if not username or not password:
+            logger.error("No credentials provided")
+            print("❌ Error: No credentials provided")
+            return
+
+        image_path = f"/var/tmp/{selected_release['os']}"
+        target_version = selected_release["release"]
+        print("Connecting to devices...")
+        connections = pooled_connect_to_hosts(host_ips, username, password)
+        try:
+            start = time.time()
+            reports = run_preflight(connections, image_path, target_version, local_image_size(upgrade_data, image_path),
+                                    preflight_settings(upgrade_data))
+        finally:
+            release_to_pool(connections)
+        connected = {dev.hostname for dev in connections}
+        for hostname in host_ips:
+            if hostname not in connected:
+                reports[hostname] = {"version": None, "on_target": False, "checks": {}, "go": False,
+                                     "reasons": ["connection failed"], "warnings": []}
+        preflight_table = format_preflight(reports, target_version)
+        print(f"\nPre-flight checks ({time.time() - start:.1f}s):\n{preflight_table}")
+        print(f"Pre-flight report saved to {save_preflight_report(preflight_table)}")
+        go = sum(1 for r in reports.values() if r["go"])
+        logger.info(f"Pre-flight: {go} of {len(reports)} device(s) go")
+        print(f"{go} of {len(reports)} device(s) ready to upgrade.")
+
+    except KeyboardInterrupt:
+        logger.info("Pre-flight checks interrupted by user (Ctrl+C)")
+        print("\nProgram interrupted by user. Exiting.")
+    except Exception as e:
+        logger.error(f"Error in upgrade_preflight_report: {e}")
+        print(f"❌ Error: {e}")
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Upgrade Junos on selected devices")
+    parser.add_argument("--resume", nargs="?", const="", metavar="JOURNAL",
+                        help="Continue an interrupted upgrade from its journal (default: the latest)")
+    args = parser.parse_args(argv)
+    if args.resume is None:
+        code_upgrade()
+    else:
+        code_upgrade(resume=True, journal_path=args.resume or None)
+
+if __name__ == "__main__":
+    # Run as: python -m scripts.code_upgrade [--resume [reports/upgrade_journal_<time>.jsonl]]
+    main()
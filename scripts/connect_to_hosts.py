@@ -1,7 +1,14 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from jnpr.junos import Device
-from jnpr.junos.exception import ConnectError
-from typing import List, Union
+from jnpr.junos.exception import (
+    ConnectAuthError,
+    ConnectError,
+    ConnectRefusedError,
+    ConnectTimeoutError,
+    ProbeError,
+)
+from typing import Dict, List, Optional, Union
 
 # Configure logging
 logging.basicConfig(
@@ -11,28 +18,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def connect_to_hosts(host: Union[str, List[str]], username: str, password: str) -> List[Device]:
-    """Connect to one or more Juniper devices and return the connection objects."""
-    # Ensure host is a list
-    hosts = [host] if isinstance(host, str) else host
-    connections = []
-    for h in hosts:
-        try:
-            logger.info(f"Connecting to host {h} with username {username}")
-            print(f"DEBUG (connect): Attempting to connect to: {h} with user: {username}")
-            dev = Device(host=h, user=username, password=password)
-            dev.open()
-            logger.info(f"Connected to {h}")
-            print(f"DEBUG (connect): Successfully connected to {h}")
-            connections.append(dev)
-        except ConnectError as e:
-            logger.error(f"Failed to connect to {h}: {str(e)}")
-            print(f"ERROR (connect): Failed to connect to {h}: {str(e)}")
-            continue  # Continue to next host instead of raising
-        except Exception as e:
-            logger.error(f"Unexpected error connecting to {h}: {str(e)}")
-            print(f"ERROR (connect): Unexpected error connecting to {h}: {str(e)}")
-            continue
+# Defaults for parallel connection establishment
+DEFAULT_MAX_WORKERS = 20
+DEFAULT_CONNECT_TIMEOUT = 30
+
+# Per-host connection outcomes reported by connect_hosts_detailed
+STATUS_CONNECTED = 'connected'
+STATUS_REFUSED = 'refused'
+STATUS_TIMED_OUT = 'timed_out'
+STATUS_AUTH_FAILED = 'auth_failed'
+STATUS_ERROR = 'error'
+
+def _open_device(h: str, username: str, password: str, connect_timeout: int) -> Dict:
+    """Open a single device and return a structured per-host result."""
+    result = {'host': h, 'status': STATUS_ERROR, 'device': None, 'error': None}
+    try:
+        logger.info(f"Connecting to host {h} with username {username}")
+        print(f"DEBUG (connect): Attempting to connect to: {h} with user: {username}")
+        # Facts are read on demand through scripts.facts_cache rather than gathered on every open
+        dev = Device(host=h, user=username, password=password, conn_open_timeout=connect_timeout,
+                     gather_facts=False)
+        dev.open(auto_probe=connect_timeout)
+        logger.info(f"Connected to {h}")
+        print(f"DEBUG (connect): Successfully connected to {h}")
+        result['status'] = STATUS_CONNECTED
+        result['device'] = dev
+    except ConnectAuthError as e:
+        result['status'] = STATUS_AUTH_FAILED
+        result['error'] = str(e)
+    except ConnectRefusedError as e:
+        result['status'] = STATUS_REFUSED
+        result['error'] = str(e)
+    except (ConnectTimeoutError, ProbeError) as e:
+        result['status'] = STATUS_TIMED_OUT
+        result['error'] = str(e)
+    except ConnectError as e:
+        result['error'] = str(e)
+    except Exception as e:
+        logger.error(f"Unexpected error connecting to {h}: {str(e)}")
+        print(f"ERROR (connect): Unexpected error connecting to {h}: {str(e)}")
+        result['error'] = str(e)
+        return result
+    if result['status'] != STATUS_CONNECTED:
+        logger.error(f"Failed to connect to {h} ({result['status']}): {result['error']}")
+        print(f"ERROR (connect): Failed to connect to {h} ({result['status']}): {result['error']}")
+    return result
+
+def connect_hosts_detailed(
+    host: Union[str, List[str]],
+    username: str,
+    password: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    connect_timeout: int = DEFAULT_CONNECT_TIMEOUT
+) -> List[Dict]:
+    """
+    Connect to one or more Juniper devices in parallel and report the outcome per host.
+
+    Args:
+        host: A single host or a list of hosts.
+        username: Login username.
+        password: Login password.
+        max_workers: Maximum number of handshakes in flight at once (1 connects sequentially).
+        connect_timeout: Seconds allowed for the TCP probe and NETCONF session setup per host.
+
+    Returns:
+        List[Dict]: One result per host, in input order, with keys 'host', 'status'
+                    (connected, refused, timed_out, auth_failed or error), 'device' and 'error'.
+    """
+    hosts = [host] if isinstance(host, str) else list(host)
+    if not hosts:
+        return []
+    workers = max(1, min(max_workers, len(hosts)))
+    logger.info(f"Connecting to {len(hosts)} host(s) with up to {workers} in flight")
+    if workers == 1:
+        return [_open_device(h, username, password, connect_timeout) for h in hosts]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='connect') as executor:
+        return list(executor.map(lambda h: _open_device(h, username, password, connect_timeout), hosts))
+
+def connect_to_hosts(
+    host: Union[str, List[str]],
+    username: str,
+    password: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    connect_timeout: int = DEFAULT_CONNECT_TIMEOUT,
+    results: Optional[List[Dict]] = None
+) -> List[Device]:
+    """Connect to one or more Juniper devices and return the connection objects.
+
+    Handshakes run in parallel with at most max_workers in flight. When a list is
+    passed as results, it is extended with the per-host results from connect_hosts_detailed.
+    """
+    host_results = connect_hosts_detailed(host, username, password, max_workers, connect_timeout)
+    if results is not None:
+        results.extend(host_results)
+    connections = [r['device'] for r in host_results if r['status'] == STATUS_CONNECTED]
     if not connections:
         logger.error("No connections established to any hosts")
         print("ERROR (connect): No connections established to any hosts")
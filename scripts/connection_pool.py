@@ -0,0 +1,290 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from jnpr.junos import Device
+
+from scripts.connect_to_hosts import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_WORKERS,
+    STATUS_CONNECTED,
+    connect_hosts_detailed,
+)
+from scripts.liveness import sweep
+
+logger = logging.getLogger(__name__)
+
+# Pool defaults
+DEFAULT_MAX_SESSIONS_PER_DEVICE = 4
+DEFAULT_REVALIDATE_AFTER = 30  # Seconds a session may sit idle before it is health-checked
+DEFAULT_PROBE_TIMEOUT = 10
+DEFAULT_ACQUIRE_TIMEOUT = 300
+
+class PoolExhaustedError(Exception):
+    """Raised when no session to a device becomes available within the acquire timeout."""
+
+class ConnectionPool:
+    """
+    Process-wide pool of open NETCONF sessions keyed by (host, user).
+
+    Sessions are handed out by acquire() and returned by release(). Sessions that sat idle
+    longer than revalidate_after are checked with a cheap uptime RPC before reuse, and dead
+    ones are evicted. At most max_sessions_per_device sessions (idle + in use) exist per key.
+    """
+
+    def __init__(
+        self,
+        max_sessions_per_device: int = DEFAULT_MAX_SESSIONS_PER_DEVICE,
+        revalidate_after: int = DEFAULT_REVALIDATE_AFTER,
+        probe_timeout: int = DEFAULT_PROBE_TIMEOUT,
+        connect_timeout: int = DEFAULT_CONNECT_TIMEOUT
+    ):
+        self.max_sessions_per_device = max_sessions_per_device
+        self.revalidate_after = revalidate_after
+        self.probe_timeout = probe_timeout
+        self.connect_timeout = connect_timeout
+        self._cond = threading.Condition()
+        self._idle: Dict[Tuple[str, str], List[Tuple[Device, float]]] = {}
+        self._total: Dict[Tuple[str, str], int] = {}
+        self._owner: Dict[int, Tuple[str, str]] = {}
+        self._checked_out: Set[int] = set()
+        self.stats = {'opened': 0, 'reused': 0, 'evicted': 0}
+
+    def _is_healthy(self, dev: Device, last_used: float) -> bool:
+        """Return True if an idle session is still usable, probing it if it has been idle a while."""
+        if not dev.connected:
+            return False
+        if time.time() - last_used < self.revalidate_after:
+            return True
+        try:
+            dev.rpc.get_system_uptime_information(dev_timeout=self.probe_timeout)
+            return True
+        except Exception as e:
+            logger.info(f"Idle session to {dev.hostname} failed revalidation: {e}")
+            return False
+
+    def _discard(self, key: Tuple[str, str], dev: Device) -> None:
+        """Close a session and free its slot."""
+        try:
+            if dev.connected:
+                dev.close()
+        except Exception as e:
+            logger.debug(f"Error closing session to {key[0]}: {e}")
+        with self._cond:
+            self._owner.pop(id(dev), None)
+            self._checked_out.discard(id(dev))
+            self._total[key] = max(0, self._total.get(key, 1) - 1)
+            self.stats['evicted'] += 1
+            self._cond.notify_all()
+
+    def acquire(self, host: str, username: str, password: str, timeout: int = DEFAULT_ACQUIRE_TIMEOUT) -> Device:
+        """Return a healthy session to host, reusing an idle one when possible."""
+        key = (host, username)
+        deadline = time.time() + timeout
+        while True:
+            candidate = None
+            with self._cond:
+                idle = self._idle.get(key)
+                if idle:
+                    candidate = idle.pop()
+                elif self._total.get(key, 0) < self.max_sessions_per_device:
+                    self._total[key] = self._total.get(key, 0) + 1
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(f"No session to {host} available within {timeout} seconds")
+                    self._cond.wait(remaining)
+                    continue
+
+            if candidate is not None:
+                dev, last_used = candidate
+                if self._is_healthy(dev, last_used):
+                    with self._cond:
+                        self._checked_out.add(id(dev))
+                        self.stats['reused'] += 1
+                    logger.info(f"Reusing pooled session to {host}")
+                    return dev
+                self._discard(key, dev)
+                continue
+
+            # A slot was reserved above, so open a new session outside the lock
+            result = connect_hosts_detailed(host, username, password, max_workers=1,
+                                            connect_timeout=self.connect_timeout)[0]
+            with self._cond:
+                if result['status'] != STATUS_CONNECTED:
+                    self._total[key] -= 1
+                    self._cond.notify_all()
+                    raise ConnectionError(f"{host}: {result['status']}: {result['error']}")
+                dev = result['device']
+                self._owner[id(dev)] = key
+                self._checked_out.add(id(dev))
+                self.stats['opened'] += 1
+            return dev
+
+    def release(self, dev: Device, discard: bool = False) -> None:
+        """
+        Return a session to the pool, or close it if it is dead or discard is set.
+
+        A session that is not checked out (already released or discarded) is left alone, so a
+        double release can never put the same session in the idle list twice.
+        """
+        with self._cond:
+            key = self._owner.get(id(dev))
+            if key is not None and id(dev) not in self._checked_out:
+                logger.warning(f"Ignoring release of session to {dev.hostname}: it is not checked out")
+                return
+            self._checked_out.discard(id(dev))
+        if key is None:
+            if not dev.connected:
+                # Already closed, e.g. a pooled session that was discarded earlier
+                return
+            # Not a pooled session; close it like disconnect_from_hosts would
+            try:
+                dev.close()
+            except Exception as e:
+                logger.debug(f"Error closing unpooled session to {dev.hostname}: {e}")
+            return
+        if discard or not dev.connected:
+            self._discard(key, dev)
+            return
+        with self._cond:
+            self._idle.setdefault(key, []).append((dev, time.time()))
+            self._cond.notify_all()
+
+    def evict(self, host: str) -> None:
+        """Close all idle sessions to host, e.g. after it was rebooted."""
+        with self._cond:
+            stale = []
+            for key in [k for k in self._idle if k[0] == host]:
+                stale.extend((key, dev) for dev, _ in self._idle.pop(key))
+        for key, dev in stale:
+            self._discard(key, dev)
+        if stale:
+            logger.info(f"Evicted {len(stale)} idle session(s) to {host}")
+
+    def close_all(self) -> None:
+        """Close every idle session. Sessions still checked out are closed when released."""
+        with self._cond:
+            stale = [(key, dev) for key, idle in self._idle.items() for dev, _ in idle]
+            self._idle.clear()
+        for key, dev in stale:
+            self._discard(key, dev)
+        logger.info(f"Connection pool closed: {self.stats}")
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Return the pool shared by the whole launcher process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+def close_pool() -> None:
+    """Close the shared pool, if one was created."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+class DeviceSessions:
+    """Sessions to one device for concurrent RPCs, starting from an open one and grown lazily up to a cap."""
+
+    def __init__(self, dev: Device, cap: int, username: Optional[str], password: Optional[str]):
+        self.host = dev.hostname
+        self.cap = cap
+        self.username = username
+        self.password = password
+        self.opened = 1
+        self.extra: List[Device] = []
+        self.free: queue.Queue = queue.Queue()
+        self.free.put(dev)
+        self._lock = threading.Lock()
+
+    def checkout(self) -> Device:
+        """Return a free session, opening an extra pooled one if under the cap."""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self.username is not None and self.opened < self.cap
+            if grow:
+                self.opened += 1
+        if grow:
+            try:
+                dev = get_pool().acquire(self.host, self.username, self.password, timeout=0)
+                with self._lock:
+                    self.extra.append(dev)
+                return dev
+            except Exception as e:
+                logger.info(f"Extra session to {self.host} unavailable, sharing existing ones: {e}")
+                with self._lock:
+                    self.opened -= 1
+                    # Stop trying to grow this device
+                    self.cap = self.opened
+        return self.free.get()
+
+    def checkin(self, dev: Device) -> None:
+        self.free.put(dev)
+
+    def release_extra(self) -> None:
+        """Return the extra sessions to the connection pool."""
+        pool = get_pool()
+        for dev in self.extra:
+            pool.release(dev)
+        self.extra = []
+
+def pooled_connect_to_hosts(
+    host: Union[str, List[str]],
+    username: str,
+    password: str,
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> List[Device]:
+    """Drop-in replacement for connect_to_hosts that checks sessions out of the shared pool.
+
+    Hosts are first swept for an open NETCONF port, so dead devices fail in milliseconds
+    instead of each holding a worker for the full connect timeout.
+    """
+    hosts = [host] if isinstance(host, str) else list(host)
+    if not hosts:
+        return []
+    pool = get_pool()
+
+    liveness = sweep(hosts, ports=(830,), icmp=False)
+    for h in [h for h in hosts if not liveness[h]['alive']]:
+        logger.error(f"NETCONF port on {h} is not reachable; skipping")
+        print(f"ERROR (connect): NETCONF port on {h} is not reachable; skipping")
+    hosts = [h for h in hosts if liveness[h]['alive']]
+    if not hosts:
+        logger.error("No connections established to any hosts")
+        print("ERROR (connect): No connections established to any hosts")
+        return []
+
+    def _acquire(h: str) -> Optional[Device]:
+        try:
+            return pool.acquire(h, username, password)
+        except Exception as e:
+            logger.error(f"Failed to get pooled session to {h}: {e}")
+            print(f"ERROR (connect): Failed to connect to {h}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))), thread_name_prefix='pool') as executor:
+        connections = [dev for dev in executor.map(_acquire, hosts) if dev is not None]
+    if not connections:
+        logger.error("No connections established to any hosts")
+        print("ERROR (connect): No connections established to any hosts")
+    return connections
+
+def release_to_pool(connections: list):
+    """Drop-in replacement for disconnect_from_hosts that returns sessions to the shared pool."""
+    pool = get_pool()
+    logger.info(f"Returning {len(connections)} connections to the pool")
+    for dev in connections:
+        pool.release(dev)
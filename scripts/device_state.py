@@ -0,0 +1,183 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from jnpr.junos import Device
+
+from scripts.async_engine import AsyncEngine, register_job
+from scripts.route_monitor import parse_route_summary
+from scripts.rpc_batch import run_batch
+
+logger = logging.getLogger(__name__)
+
+# Sections of a captured state, in report order
+SECTIONS = ('interfaces', 'bgp', 'ospf', 'routes')
+
+# Numeric fields that drift on a healthy network; differences within the tolerance are ignored
+COUNT_FIELDS = {'destinations', 'routes', 'active'}
+DEFAULT_COUNT_TOLERANCE = 0.05  # Relative change of a count field that is reported
+DEFAULT_FLEET_CONCURRENCY = 256  # Devices captured at once; each capture blocks one thread on I/O
+
+def _text(element, path: str) -> Optional[str]:
+    value = element.findtext(path)
+    return value.strip() if value is not None else None
+
+def parse_interfaces(reply) -> Dict[str, Dict]:
+    """Key interfaces (physical and logical) by name with admin/oper status and addresses."""
+    records = {}
+    for physical in reply.iter('physical-interface'):
+        name = _text(physical, 'name')
+        if not name:
+            continue
+        records[name] = {'admin': _text(physical, 'admin-status'), 'oper': _text(physical, 'oper-status')}
+        for logical in physical.findall('logical-interface'):
+            unit = _text(logical, 'name')
+            if not unit:
+                continue
+            families = sorted(f for f in (_text(af, 'address-family-name') for af in logical.findall('address-family')) if f)
+            addresses = sorted(a for a in (_text(addr, 'ifa-local') for addr in logical.iter('interface-address')) if a)
+            records[unit] = {
+                'admin': _text(logical, 'admin-status'),
+                'oper': _text(logical, 'oper-status'),
+                'families': families,
+                'addresses': addresses,
+            }
+    return records
+
+def parse_bgp_peers(reply) -> Dict[str, Dict]:
+    """Key BGP peers by address with AS, state and description; flap counts and timers are left out."""
+    records = {}
+    for peer in reply.iter('bgp-peer'):
+        address = _text(peer, 'peer-address')
+        if not address:
+            continue
+        records[address.split('+')[0]] = {
+            'peer_as': _text(peer, 'peer-as'),
+            'state': _text(peer, 'peer-state'),
+            'description': _text(peer, 'description'),
+        }
+    return records
+
+def parse_ospf_neighbors(reply) -> Dict[str, Dict]:
+    """Key OSPF neighbors by router ID (plus interface if a neighbor appears on several links)."""
+    records = {}
+    for neighbor in reply.iter('ospf-neighbor'):
+        neighbor_id = _text(neighbor, 'neighbor-id')
+        if not neighbor_id:
+            continue
+        record = {
+            'address': _text(neighbor, 'neighbor-address'),
+            'interface': _text(neighbor, 'interface-name'),
+            'state': _text(neighbor, 'ospf-neighbor-state'),
+        }
+        key = neighbor_id if neighbor_id not in records else f"{neighbor_id}%{record['interface']}"
+        records[key] = record
+    return records
+
+def parse_routes(reply) -> Dict[str, Dict]:
+    """Key route tables by name with destination, route and active counts."""
+    return {
+        table: {'destinations': c['destinations'], 'routes': c['routes'], 'active': c['active']}
+        for table, c in parse_route_summary(reply).items()
+    }
+
+# Section -> (RPC call, parser)
+_PROBES: Dict[str, tuple] = {
+    'interfaces': (lambda d: d.rpc.get_interface_information(terse=True), parse_interfaces),
+    'bgp': (lambda d: d.rpc.get_bgp_summary_information(), parse_bgp_peers),
+    'ospf': (lambda d: d.rpc.get_ospf_neighbor_information(), parse_ospf_neighbors),
+    'routes': (lambda d: d.rpc.get_route_summary_information(), parse_routes),
+}
+
+def _timed(call: Callable, timings: Dict[str, float], section: str) -> Callable:
+    """Wrap a probe so its duration is recorded even when it fails."""
+    def _probe(d: Device) -> Any:
+        start = time.time()
+        try:
+            return call(d)
+        finally:
+            timings[section] = round(time.time() - start, 3)
+    return _probe
+
+@register_job('capture_state')
+def capture_state(dev: Device) -> Dict[str, Any]:
+    """
+    Capture interfaces, BGP peers, OSPF neighbors and route table counts as keyed records.
+
+    Every probe runs on the already-open session of dev, one after another; the session is
+    neither opened nor closed here and no other session is used. A section whose RPC fails
+    (e.g. BGP not running) is captured empty, with the error under 'errors'.
+
+    Returns:
+        Dict[str, Any]: Section -> {key: record}, plus 'errors' (section -> message) and
+                        'timings' (section -> seconds).
+    """
+    timings: Dict[str, float] = {}
+    calls: Dict[str, Callable] = {section: _timed(probe[0], timings, section) for section, probe in _PROBES.items()}
+    replies = run_batch(dev, calls, raise_errors=False)
+    state: Dict[str, Any] = {'errors': {}, 'timings': timings}
+    for section in SECTIONS:
+        reply = replies[section]
+        if isinstance(reply, Exception):
+            state[section] = {}
+            state['errors'][section] = str(reply)
+            logger.info(f"No {section} state from {dev.hostname}: {reply}")
+            continue
+        state[section] = _PROBES[section][1](reply)
+    return state
+
+def _changed(field: str, before: Any, after: Any, tolerance: float) -> bool:
+    if field in COUNT_FIELDS and isinstance(before, int) and isinstance(after, int):
+        return abs(after - before) > tolerance * max(abs(before), 1)
+    return before != after
+
+def diff_states(pre: Dict[str, Any], post: Dict[str, Any],
+                count_tolerance: float = DEFAULT_COUNT_TOLERANCE) -> Dict[str, Dict]:
+    """
+    Return only the objects and fields that differ between two captured states.
+
+    Returns:
+        Dict[str, Dict]: Per section with differences, 'added' and 'removed' (key -> record)
+                         and 'changed' (key -> field -> [pre, post]).
+    """
+    differences = {}
+    for section in SECTIONS:
+        before = pre.get(section) or {}
+        after = post.get(section) or {}
+        added = {key: after[key] for key in after.keys() - before.keys()}
+        removed = {key: before[key] for key in before.keys() - after.keys()}
+        changed = {}
+        for key in before.keys() & after.keys():
+            old, new = before[key], after[key]
+            fields = {f: [old.get(f), new.get(f)] for f in old.keys() | new.keys()
+                      if _changed(f, old.get(f), new.get(f), count_tolerance)}
+            if fields:
+                changed[key] = fields
+        if added or removed or changed:
+            differences[section] = {'added': added, 'removed': removed, 'changed': changed}
+    return differences
+
+def capture_fleet_state(connections: List[Device], max_concurrency: int = DEFAULT_FLEET_CONCURRENCY,
+                        host_lookup: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+    """
+    Capture state from every open device concurrently, one session per device.
+
+    Captures only wait on the network, so the engine gets one thread per concurrent capture and
+    a fleet up to max_concurrency devices finishes in about the time of its slowest device.
+
+    Returns:
+        Dict[str, Dict]: State per device hostname; a device that failed maps to {'error': message}.
+    """
+    host_lookup = host_lookup or {}
+    start = time.time()
+    engine = AsyncEngine(max_concurrency=max_concurrency, max_threads=max_concurrency)
+    results = engine.run(connections, capture_state)
+    states = {}
+    for host, result in results.items():
+        if isinstance(result, BaseException):
+            logger.error(f"Error capturing state for {host_lookup.get(host, host)}: {result}")
+            states[host] = {'error': str(result)}
+        else:
+            states[host] = result
+    logger.info(f"Captured state from {len(states)} device(s) in {time.time() - start:.2f}s")
+    return states
@@ -1,24 +1,108 @@
 import os
+import glob
+import json
 from datetime import datetime
-from contextlib import contextmanager
-import signal
 import logging
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from jnpr.junos import Device
+from scripts.async_engine import run_job
+from scripts.metrics_store import get_metrics_store, record_ping_results
+from scripts.ping_matrix import PingMatrix, compare_matrices
+from scripts.ping_monitor import PingMonitor, monitor_pings
+from scripts.utils import monitor_settings
+from scripts.reachability import (
+    DEFAULT_FLEET_LIMIT,
+    DEFAULT_PER_SOURCE,
+    PING_REACHABLE,
+    PING_TIMEOUT,
+    PING_UNREACHABLE,
+    device_fingerprint,
+    merge_matrix,
+    run_ping_matrix,
+    select_incremental_pairs,
+)
 
 logger = logging.getLogger(__name__)
 
-# Timeout context for RPC calls
-@contextmanager
-def timeout(seconds):
-    def signal_handler(signum, frame):
-        raise TimeoutError("Operation timed out")
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
+# Fraction of healthy pairs re-probed on each incremental run
+INCREMENTAL_SAMPLE_FRACTION = 0.1
+DEFAULT_PING_INTERVAL = 60  # Seconds between continuous ping rounds when hosts_data.yml sets none
+
+def _format_stats(result: Dict) -> str:
+    """Return a short loss/RTT summary for a ping result, or '' if there are no statistics."""
+    if result.get('sent') is None:
+        return ""
+    stats = f" [loss {result['loss']:g}%, {result['received']}/{result['sent']} probes"
+    if result.get('rtt_avg') is not None:
+        stats += f", rtt min/avg/max/stddev {result['rtt_min']}/{result['rtt_avg']}/{result['rtt_max']}/{result['rtt_stddev']} ms"
+    return stats + "]"
+
+def latest_matrix_file(report_dir: str) -> Optional[str]:
+    """Return the most recent saved ping matrix in report_dir, if any."""
+    files = sorted(glob.glob(os.path.join(report_dir, 'ping_matrix_*.bin')))
+    return files[-1] if files else None
+
+def load_ping_state(report_dir: str) -> Dict:
+    """Load device fingerprints and the sampling cursor saved by the last incremental run."""
     try:
-        yield
-    finally:
-        signal.alarm(0)
+        with open(os.path.join(report_dir, 'ping_state.json'), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'fingerprints': {}, 'cursor': 0}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable ping state: {e}")
+        return {'fingerprints': {}, 'cursor': 0}
+
+def save_ping_state(report_dir: str, state: Dict) -> None:
+    """Persist device fingerprints and the sampling cursor for the next incremental run."""
+    state_file = os.path.join(report_dir, 'ping_state.json')
+    with open(f"{state_file}.tmp", 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{state_file}.tmp", state_file)
+
+def plan_incremental_run(connections: List[Device], previous: Optional[PingMatrix], state: Dict) -> Tuple[List[Tuple[str, str]], Dict]:
+    """Return the pairs to re-probe and the updated state for an incremental run."""
+    hosts = [dev.hostname for dev in connections]
+    fingerprints = run_job(connections, device_fingerprint)
+    known = state.get('fingerprints', {})
+    changed = []
+    new_fingerprints = {}
+    for host in hosts:
+        fingerprint = fingerprints.get(host)
+        if isinstance(fingerprint, BaseException):
+            # Treat devices we cannot fingerprint as changed
+            changed.append(host)
+            continue
+        new_fingerprints[host] = fingerprint
+        if known.get(host) != fingerprint:
+            changed.append(host)
+    pairs, cursor = select_incremental_pairs(previous, hosts, changed, state.get('cursor', 0),
+                                             INCREMENTAL_SAMPLE_FRACTION)
+    logger.info(f"Incremental ping: {len(changed)} changed device(s), probing {len(pairs)} pair(s)")
+    print(f"Incremental ping: {len(changed)} changed device(s), re-probing {len(pairs)} of {len(hosts) * (len(hosts) - 1)} pair(s)")
+    return pairs, {'fingerprints': dict(known, **new_fingerprints), 'cursor': cursor}
+
+def print_monitor_summary(monitor: PingMonitor, host_lookup: Dict[str, str]) -> None:
+    """Print rolling RTT percentiles and loss per pair."""
+    print("\nReachability summary (rolling window):")
+    print(f"{'Source':<16} {'Target':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Loss %':>7} {'Samples':>8}")
+    for (source, target) in sorted(monitor.rings):
+        stats = monitor.stats((source, target))
+        fmt = lambda v: f"{v:>8}" if v is not None else f"{'-':>8}"
+        print(f"{host_lookup.get(source, source):<16} {host_lookup.get(target, target):<16} "
+              f"{fmt(stats['p50'])} {fmt(stats['p95'])} {fmt(stats['p99'])} {stats['loss']:>7} {stats['samples']:>8}")
+
+def describe_ping(source_ip: str, target_ip: str, result: Dict, host_lookup: Dict[str, str]) -> Tuple[bool, str]:
+    """Return (reachable, report line) for one ping result."""
+    source_host = host_lookup.get(source_ip, source_ip)
+    target_host = host_lookup.get(target_ip, target_ip)
+    if result['status'] == PING_REACHABLE:
+        return True, f"{source_host} ({source_ip}) can reach {target_host} ({target_ip}){_format_stats(result)}"
+    if result['status'] == PING_UNREACHABLE:
+        return False, f"{source_host} ({source_ip}) cannot reach {target_host} ({target_ip}){_format_stats(result)}"
+    if result['status'] == PING_TIMEOUT:
+        return False, f"{source_host} ({source_ip}) ping to {target_host} ({target_ip}) timed out"
+    return False, f"{source_host} ({source_ip}) ping to {target_ip} failed: {result.get('error')}"
 
 def ping_hosts(
     username: str,
@@ -28,9 +112,23 @@ def ping_hosts(
     connect_to_hosts: callable,
     disconnect_from_hosts: callable,
     connections: List[Device] = None,
-    single_check: bool = False
+    single_check: bool = True,
+    per_source: int = DEFAULT_PER_SOURCE,
+    fleet_limit: int = DEFAULT_FLEET_LIMIT,
+    incremental: bool = False,
+    interval: Optional[int] = None
 ):
-    """Verify reachability by pinging hosts from each device and generate a report."""
+    """Verify reachability by pinging hosts from each device and generate a report.
+
+    All pairs are pinged concurrently, with at most per_source pings in flight per source
+    device and fleet_limit pings in flight overall. In incremental mode only failed pairs,
+    pairs involving devices whose facts or last commit changed, and a rotating sample of
+    healthy pairs are re-probed; the rest are carried over from the last saved matrix.
+
+    With single_check=False the mesh is probed every interval seconds (hosts_data.yml
+    'interval' by default) until interrupted; per-pair RTT and loss history is kept in
+    fixed-size ring buffers and only threshold crossings are written to the report directory.
+    """
     logger.info("Starting ping_hosts")
     report_dir = os.path.join(os.path.dirname(__file__), '../reports')
     os.makedirs(report_dir, exist_ok=True)
@@ -51,29 +149,53 @@ def ping_hosts(
             print("No devices connected for ping verification.")
             return
 
-        connected_ips = [dev.hostname for dev in connections]
         host_lookup = {h['ip_address']: h['host_name'] for h in hosts}
+
+        if not single_check:
+            monitor = PingMonitor()
+            interval = interval or monitor_settings(DEFAULT_PING_INTERVAL)['interval']
+            try:
+                monitor_pings(connections, report_dir, host_lookup, interval,
+                              username=username, password=password, per_source=per_source,
+                              fleet_limit=fleet_limit, monitor=monitor)
+            except KeyboardInterrupt:
+                logger.info("Continuous ping monitoring stopped by user")
+                print("\nContinuous ping monitoring stopped.")
+            print_monitor_summary(monitor, host_lookup)
+            return
+
         reachable = []
         unreachable = []
 
-        for dev in connections:
-            source_host = host_lookup.get(dev.hostname, dev.hostname)
-            for target_ip in connected_ips:
-                if target_ip == dev.hostname:
-                    continue
-                target_host = host_lookup.get(target_ip, target_ip)
-                try:
-                    with timeout(5):
-                        ping_result = dev.rpc.cli(f"ping {target_ip} count 4", format='text')
-                    ping_output = ping_result.text
-                    if " 0% packet loss" in ping_output:
-                        reachable.append(f"{source_host} ({dev.hostname}) can reach {target_host} ({target_ip})")
-                    else:
-                        unreachable.append(f"{source_host} ({dev.hostname}) cannot reach {target_host} ({target_ip})")
-                except TimeoutError:
-                    unreachable.append(f"{source_host} ({dev.hostname}) ping to {target_host} ({target_ip}) timed out")
-                except Exception as error:
-                    unreachable.append(f"{source_host} ({dev.hostname}) ping to {target_ip} failed: {error}")
+        previous = None
+        previous_file = latest_matrix_file(report_dir)
+        if previous_file:
+            try:
+                previous = PingMatrix.load(previous_file)
+            except Exception as e:
+                logger.warning(f"Could not load previous ping matrix {previous_file}: {e}")
+
+        # Run the selected pairs concurrently, with per-source and fleet-wide caps
+        pairs = None
+        if incremental:
+            pairs, ping_state = plan_incremental_run(connections, previous, load_ping_state(report_dir))
+        results = run_ping_matrix(connections, pairs=pairs, username=username, password=password,
+                                  per_source=per_source, fleet_limit=fleet_limit)
+        record_ping_results(get_metrics_store(), results)
+        if incremental:
+            matrix = merge_matrix(previous, [dev.hostname for dev in connections], results)
+        else:
+            matrix = PingMatrix.from_results(results)
+
+        for source_ip, target_ip in matrix.pairs():
+            result = results.get((source_ip, target_ip))
+            ok, line = describe_ping(source_ip, target_ip, result or matrix.get(source_ip, target_ip), host_lookup)
+            if result is None:
+                line += " (carried over from last run)"
+            (reachable if ok else unreachable).append(line)
+
+        # Compare against the previous run's matrix to surface latency and loss regressions
+        regressions = compare_matrices(previous, matrix) if previous is not None else []
 
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         report = f"Ping Verification Report - {timestamp}\n{'='*50}\n"
@@ -83,6 +205,18 @@ def ping_hosts(
         report += "\nUnreachable:\n"
         for entry in unreachable:
             report += f"  - {entry}\n"
+        if regressions:
+            report += f"\nRegressions since {os.path.basename(previous_file)}:\n"
+            for change in regressions:
+                source = host_lookup.get(change['source'], change['source'])
+                target = host_lookup.get(change['target'], change['target'])
+                report += f"  - {source} -> {target}: {change['change']} {change['before']} -> {change['after']}\n"
+
+        matrix_file = os.path.join(report_dir, f"ping_matrix_{timestamp}.bin")
+        matrix.save(matrix_file)
+        logger.info(f"Ping matrix saved to {matrix_file}")
+        if incremental:
+            save_ping_state(report_dir, ping_state)
 
         report_file = os.path.join(report_dir, f"ping_report_{timestamp}.txt")
         with open(report_file, 'w') as f:
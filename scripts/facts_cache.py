@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from jnpr.junos import Device
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(__file__), '../reports/facts_cache.json')
+DEFAULT_TTL = 24 * 3600  # Seconds before a cached entry is considered stale
+
+def _parse_software_information(reply) -> Dict:
+    """Extract hostname, model and version from a get-software-information reply."""
+    info = reply.find('.//software-information')
+    if info is None:
+        info = reply
+    version = info.findtext('junos-version')
+    if not version:
+        # Older releases only report the version in the package comment
+        for comment in info.xpath('.//package-information/comment/text()'):
+            match = re.search(r'\[([^\]]+)\]', comment)
+            if match:
+                version = match.group(1)
+                break
+    return {
+        'hostname': info.findtext('host-name'),
+        'model': (info.findtext('product-model') or '').upper() or None,
+        'version': version,
+    }
+
+def fetch_software_facts(dev: Device, known: Optional[Dict] = None) -> Dict:
+    """
+    Read version, model and serial number from a device with targeted RPCs instead of full facts gathering.
+
+    Args:
+        dev: Open Junos Device object.
+        known: Facts previously recorded for this device; their serial number is reused, which
+               skips the chassis inventory RPC, unless the model differs (a swapped chassis).
+
+    Returns:
+        Dict: Facts with keys 'hostname', 'model', 'version' and 'serial'.
+    """
+    known = known or {}
+    facts = _parse_software_information(dev.rpc.get_software_information())
+    serial = known.get('serial') if known.get('model') == facts['model'] else None
+    if not serial:
+        inventory = dev.rpc.get_chassis_inventory()
+        serial = inventory.findtext('.//chassis/serial-number')
+    facts['serial'] = serial
+    return facts
+
+class FactsCache:
+    """
+    On-disk cache of device facts keyed by host, recording the serial number of each entry.
+
+    Entries are also indexed by serial number. When a chassis shows up at a new address, the
+    entry at its old address is marked stale, since whatever answers there now is another device.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = self._load()
+        self._by_serial: Dict[str, str] = {e['serial']: h for h, e in self._entries.items() if e.get('serial')}
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load the cache file, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get('hosts', {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable facts cache {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        """Write the cache atomically so a crash never leaves a truncated file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'hosts': self._entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, host: str) -> Optional[Dict]:
+        """Return the cached facts for host, or None if there is no fresh entry."""
+        with self._lock:
+            entry = self._entries.get(host)
+        if not entry or time.time() - entry.get('fetched_at', 0) > self.ttl:
+            return None
+        return dict(entry)
+
+    def peek(self, host: str) -> Dict:
+        """Return the entry for host even if it is stale."""
+        with self._lock:
+            return dict(self._entries.get(host, {}))
+
+    def put(self, host: str, facts: Dict) -> Dict:
+        """Store facts for host, persist the cache and return a copy of the stored entry."""
+        entry = dict(facts, fetched_at=time.time())
+        with self._lock:
+            previous = self._entries.get(host)
+            if previous and previous.get('serial') and previous.get('serial') != entry.get('serial'):
+                logger.info(f"Serial number of {host} changed from {previous['serial']} to {entry.get('serial')}")
+                if self._by_serial.get(previous['serial']) == host:
+                    del self._by_serial[previous['serial']]
+            serial = entry.get('serial')
+            moved_from = self._by_serial.get(serial) if serial else None
+            if moved_from and moved_from != host and moved_from in self._entries:
+                logger.info(f"Chassis {serial} moved from {moved_from} to {host}; marking {moved_from} stale")
+                self._entries[moved_from]['fetched_at'] = 0
+            self._entries[host] = entry
+            if serial:
+                self._by_serial[serial] = host
+            self._save()
+        return dict(entry)
+
+    def invalidate(self, host: str) -> None:
+        """Mark the entry for host as stale, e.g. after a reboot or upgrade."""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return
+            entry['fetched_at'] = 0
+            self._save()
+        logger.info(f"Invalidated cached facts for {host}")
+
+_cache: Optional[FactsCache] = None
+_cache_lock = threading.Lock()
+
+def get_facts_cache() -> FactsCache:
+    """Return the process-wide facts cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FactsCache()
+        return _cache
+
+def get_device_facts(dev: Device, refresh: bool = False) -> Dict:
+    """Return version, model and serial for dev from the cache, refreshing stale entries from the device."""
+    cache = get_facts_cache()
+    entry = None if refresh else cache.get(dev.hostname)
+    if entry is not None:
+        logger.info(f"Using cached facts for {dev.hostname}")
+        return entry
+    # Keep the cached serial so a stale entry costs a single RPC, unless the chassis looks swapped
+    facts = fetch_software_facts(dev, cache.peek(dev.hostname))
+    logger.info(f"Refreshed facts for {dev.hostname}: {facts}")
+    return cache.put(dev.hostname, facts)
+
+def invalidate_device_facts(host: str) -> None:
+    """Invalidate the cached facts for host."""
+    get_facts_cache().invalidate(host)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(__file__), '../images')
+DEFAULT_CHECKSUM_CACHE = os.path.join(os.path.dirname(__file__), '../reports/image_checksums.json')
+REMOTE_DIR = '/var/tmp'
+
+# Staging defaults, overridden by the 'staging' section of upgrade_data.yml
+DEFAULT_MAX_PARALLEL = 8  # Devices receiving an image at once
+DEFAULT_SSH_PORT = 22
+DEFAULT_TIMEOUT = 60
+_CHUNK_SIZE = 256 * 1024
+_PART_SUFFIX = '.part'
+_CHECKSUM = re.compile(r'=\s*([0-9a-fA-F]{32,})')
+
+class ChecksumCache:
+    """
+    MD5 of local image files, computed once and kept while the file's size and mtime are unchanged.
+
+    MD5 is what every Junos release can compute with 'file checksum md5', and it is much cheaper
+    than SHA-256 on branch SRX CPUs; it guards against corrupt transfers, not tampering.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKSUM_CACHE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def md5(self, path: str) -> str:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._load().get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                return entry['md5']
+            start = time.time()
+            digest = hashlib.md5()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            self._entries[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': digest.hexdigest()}
+            self._save()
+            logger.info(f"Computed MD5 of {path} in {time.time() - start:.1f}s")
+            return self._entries[path]['md5']
+
+_checksums: Optional[ChecksumCache] = None
+_checksums_lock = threading.Lock()
+
+def get_checksum_cache() -> ChecksumCache:
+    """Return the local checksum cache shared by the process."""
+    global _checksums
+    with _checksums_lock:
+        if _checksums is None:
+            _checksums = ChecksumCache()
+        return _checksums
+
+def staging_settings(upgrade_data: Dict) -> Dict:
+    """Return the staging settings from upgrade_data.yml, falling back to the defaults."""
+    settings = upgrade_data.get('staging') or {}
+    image_dir = settings.get('image_dir')
+    if image_dir and not os.path.isabs(image_dir):
+        image_dir = os.path.join(os.path.dirname(__file__), '..', image_dir)
+    return {
+        'image_dir': image_dir or DEFAULT_IMAGE_DIR,
+        'max_parallel': int(settings.get('max_parallel', DEFAULT_MAX_PARALLEL)),
+        'bandwidth_kbps': int(settings.get('bandwidth_kbps') or 0),
+    }
+
+def remote_md5(client: paramiko.SSHClient, path: str, timeout: int = DEFAULT_TIMEOUT) -> Optional[str]:
+    """Return the MD5 of a file on the device from 'file checksum md5', or None if it is missing."""
+    _, stdout, _ = client.exec_command(f"file checksum md5 {path}", timeout=timeout)
+    match = _CHECKSUM.search(stdout.read().decode('utf-8', 'replace'))
+    return match.group(1).lower() if match else None
+
+def _upload(sftp: paramiko.SFTPClient, local_path: str, remote_path: str, bandwidth_kbps: int) -> int:
+    """
+    Copy local_path to remote_path, appending to whatever part of it is already there.
+
+    Returns the number of bytes sent. With bandwidth_kbps, the transfer is paced to that rate.
+    """
+    size = os.path.getsize(local_path)
+    try:
+        offset = sftp.stat(remote_path).st_size
+    except IOError:
+        offset = 0
+    if offset > size:
+        sftp.remove(remote_path)
+        offset = 0
+    if offset:
+        logger.info(f"Resuming {remote_path} at {offset}/{size} bytes")
+    rate = bandwidth_kbps * 1024
+    sent = 0
+    start = time.monotonic()
+    with open(local_path, 'rb') as local, sftp.open(remote_path, 'ab' if offset else 'wb') as remote:
+        remote.set_pipelined(True)
+        local.seek(offset)
+        for block in iter(lambda: local.read(_CHUNK_SIZE), b''):
+            remote.write(block)
+            sent += len(block)
+            if rate:
+                ahead = sent / rate - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return sent
+
+def stage_image(
+    host: str,
+    username: str,
+    password: str,
+    local_path: str,
+    bandwidth_kbps: int = 0,
+    port: int = DEFAULT_SSH_PORT,
+    timeout: int = DEFAULT_TIMEOUT
+) -> Dict:
+    """
+    Make sure /var/tmp on host holds an intact copy of local_path.
+
+    The image is skipped when the remote checksum already matches. Otherwise it is copied over
+    SFTP to a .part file, resuming any earlier partial copy, verified with 'file checksum md5'
+    and renamed into place. A part file that fails verification is removed and copied once more
+    from the start.
+
+    Returns:
+        Dict: 'host', 'status' ('present', 'staged' or 'failed'), 'bytes' sent, 'seconds' and 'error'.
+    """
+    name = os.path.basename(local_path)
+    remote_path = f"{REMOTE_DIR}/{name}"
+    part_path = f"{remote_path}{_PART_SUFFIX}"
+    result = {'host': host, 'status': 'failed', 'bytes': 0, 'seconds': 0.0, 'error': None}
+    start = time.time()
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        expected = get_checksum_cache().md5(local_path)
+        client.connect(host, port=port, username=username, password=password, timeout=timeout,
+                       allow_agent=False, look_for_keys=False)
+        if remote_md5(client, remote_path, timeout) == expected:
+            logger.info(f"{name} already staged on {host}")
+            result['status'] = 'present'
+            return result
+        sftp = client.open_sftp()
+        try:
+            for attempt in range(2):
+                result['bytes'] += _upload(sftp, local_path, part_path, bandwidth_kbps)
+                if remote_md5(client, part_path, timeout) == expected:
+                    try:
+                        sftp.remove(remote_path)
+                    except IOError:
+                        pass
+                    sftp.rename(part_path, remote_path)
+                    result['status'] = 'staged'
+                    logger.info(f"Staged {name} on {host} ({result['bytes']} bytes sent)")
+                    return result
+                logger.warning(f"Checksum mismatch for {part_path} on {host} (attempt {attempt + 1})")
+                sftp.remove(part_path)
+            result['error'] = "Checksum mismatch after transfer"
+        finally:
+            sftp.close()
+    except Exception as e:
+        logger.error(f"Error staging {name} on {host}: {e}")
+        result['error'] = str(e)
+    finally:
+        client.close()
+        result['seconds'] = round(time.time() - start, 1)
+    return result
+
+def stage_images(
+    hosts: List[str],
+    username: str,
+    password: str,
+    local_path: str,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    bandwidth_kbps: int = 0
+) -> List[Dict]:
+    """Stage local_path on every host, up to max_parallel devices at a time, and return one result per host."""
+    if not hosts:
+        return []
+    # Hash the image once up front rather than in every worker
+    get_checksum_cache().md5(local_path)
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(hosts))), thread_name_prefix='stage') as executor:
+        results = list(executor.map(lambda h: stage_image(h, username, password, local_path, bandwidth_kbps), hosts))
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('present', 'staged', 'failed')}
+    logger.info(f"Staged {os.path.basename(local_path)} on {len(hosts)} device(s) in {time.time() - start:.0f}s: {counts}")
+    return results
+
+def print_staging(results: List[Dict]) -> None:
+    """Print one line per device with the staging outcome."""
+    print(f"{'Host':<18} {'Status':<8} {'MB sent':>8} {'Seconds':>8}  Error")
+    for r in results:
+        print(f"{r['host']:<18} {r['status']:<8} {r['bytes'] / 1048576:>8.1f} {r['seconds']:>8.1f}  {r['error'] or ''}")
@@ -4,11 +4,59 @@ from typing import List, Dict
 from jnpr.junos import Device
 from jnpr.junos.utils.config import Config
 from jnpr.junos.exception import CommitError
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, Template
+from scripts.async_engine import register_job, run_job
 from scripts.utils import load_yaml_file
 
 logger = logging.getLogger(__name__)
 
+@register_job('interfaces')
+def configure_device_interfaces(dev: Device, hosts: List[Dict], template: Template) -> bool:
+    """Render the interface template for one device and commit it. Returns True if committed."""
+    host_lookup = {h['ip_address']: h['host_name'] for h in hosts}
+    hostname = host_lookup.get(dev.hostname, dev.hostname)
+    try:
+        # Find the host data for the current device
+        host_data = next((h for h in hosts if h['ip_address'] == dev.hostname), None)
+        if not host_data or 'interfaces' not in host_data:
+            logger.error(f"No interface data for {hostname} ({dev.hostname})")
+            print(f"No interface data for {hostname} ({dev.hostname})")
+            return False
+
+        # Prepare template variables
+        template_vars = {
+            'interfaces': host_data['interfaces']
+        }
+        logger.info(f"Template vars for {hostname}: {template_vars}")
+
+        # Render template
+        config_data = template.render(**template_vars)
+        logger.info(f"Rendered config for {hostname}:\n{config_data}")
+        print(f"Config for {hostname} ({dev.hostname}):\n{config_data}")
+
+        if not config_data.strip():
+            logger.error(f"Empty configuration for {hostname}")
+            print(f"Empty configuration for {hostname}")
+            return False
+
+        # Apply configuration
+        config = Config(dev)
+        config.load(config_data, format='text')
+        config.commit_check()
+        config.commit()
+
+        logger.info(f"Interface configured on {hostname} ({dev.hostname})")
+        print(f"Interface configured on {hostname} ({dev.hostname})")
+        return True
+
+    except CommitError as e:
+        logger.error(f"Commit error on {hostname} ({dev.hostname}): {e}")
+        print(f"Commit error on {hostname} ({dev.hostname}): {e}")
+    except Exception as e:
+        logger.error(f"Failed to configure interfaces on {hostname} ({dev.hostname}): {e}")
+        print(f"Failed to configure interfaces on {hostname} ({dev.hostname}): {e}")
+    return False
+
 def configure_interfaces(
     username: str,
     password: str,
@@ -53,54 +101,16 @@ def configure_interfaces(
             print("No devices connected for interface configuration.")
             return
 
-        host_lookup = {h['ip_address']: h['host_name'] for h in hosts}
         print(f"Configuring interfaces for IPs: {host_ips}")
 
         # Setup Jinja2 environment
         env = Environment(loader=FileSystemLoader(template_dir))
         template = env.get_template(template_file)
 
-        for dev in connections:
-            hostname = host_lookup.get(dev.hostname, dev.hostname)
-            try:
-                # Find the host data for the current device
-                host_data = next((h for h in hosts if h['ip_address'] == dev.hostname), None)
-                if not host_data or 'interfaces' not in host_data:
-                    logger.error(f"No interface data for {hostname} ({dev.hostname})")
-                    print(f"No interface data for {hostname} ({dev.hostname})")
-                    continue
-
-                # Prepare template variables
-                template_vars = {
-                    'interfaces': host_data['interfaces']
-                }
-                logger.info(f"Template vars for {hostname}: {template_vars}")
-
-                # Render template
-                config_data = template.render(**template_vars)
-                logger.info(f"Rendered config for {hostname}:\n{config_data}")
-                print(f"Config for {hostname} ({dev.hostname}):\n{config_data}")
-
-                if not config_data.strip():
-                    logger.error(f"Empty configuration for {hostname}")
-                    print(f"Empty configuration for {hostname}")
-                    continue
-
-                # Apply configuration
-                config = Config(dev)
-                config.load(config_data, format='text')
-                config.commit_check()
-                config.commit()
-
-                logger.info(f"Interface configured on {hostname} ({dev.hostname})")
-                print(f"Interface configured on {hostname} ({dev.hostname})")
-
-            except CommitError as e:
-                logger.error(f"Commit error on {hostname} ({dev.hostname}): {e}")
-                print(f"Commit error on {hostname} ({dev.hostname}): {e}")
-            except Exception as e:
-                logger.error(f"Failed to configure interfaces on {hostname} ({dev.hostname}): {e}")
-                print(f"Failed to configure interfaces on {hostname} ({dev.hostname}): {e}")
+        # Configure all devices concurrently through the async engine
+        results = run_job(connections, configure_device_interfaces, hosts, template)
+        configured = sum(1 for result in results.values() if result is True)
+        logger.info(f"Interfaces configured on {configured}/{len(connections)} device(s)")
 
     except Exception as e:
         logger.error(f"Error in configure_interfaces: {e}")
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import socket
+import struct
+import sys
+import time
+from itertools import count
+from typing import Dict, Iterable, List, Optional
+
+from scripts.utils import flatten_inventory, load_yaml_file
+
+logger = logging.getLogger(__name__)
+
+# Prober defaults
+DEFAULT_PORTS = (22, 830)
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_CONCURRENCY = 500
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+_sequence = count(1)
+
+def _checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071)."""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _open_icmp_socket() -> Optional[socket.socket]:
+    """Open an unprivileged ICMP datagram socket, or a raw one when running privileged."""
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            sock.setblocking(False)
+            return sock
+        except (PermissionError, OSError):
+            continue
+    return None
+
+def icmp_available() -> bool:
+    """Return True if this process may send ICMP echo requests."""
+    sock = _open_icmp_socket()
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+def _recvfrom(loop: asyncio.AbstractEventLoop, sock: socket.socket) -> asyncio.Future:
+    """Return a future for the next datagram on a non-blocking socket."""
+    future = loop.create_future()
+
+    def _on_readable():
+        try:
+            data = sock.recvfrom(1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            loop.remove_reader(sock.fileno())
+            if not future.done():
+                future.set_exception(e)
+            return
+        loop.remove_reader(sock.fileno())
+        if not future.done():
+            future.set_result(data)
+
+    loop.add_reader(sock.fileno(), _on_readable)
+    return future
+
+async def icmp_probe(host: str, timeout: float = DEFAULT_TIMEOUT) -> Optional[float]:
+    """Send one ICMP echo request and return the RTT in milliseconds, or None on timeout or failure."""
+    loop = asyncio.get_running_loop()
+    sock = _open_icmp_socket()
+    if sock is None:
+        return None
+    try:
+        address = (await loop.getaddrinfo(host, None, family=socket.AF_INET))[0][4][0]
+        ident = os.getpid() & 0xFFFF
+        seq = next(_sequence) & 0xFFFF
+        header = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+        payload = struct.pack('!d', time.time())
+        packet = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, _checksum(header + payload), ident, seq) + payload
+        raw = sock.type == socket.SOCK_RAW
+        start = time.perf_counter()
+        sock.sendto(packet, (address, 0))
+        deadline = start + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            data, source = await asyncio.wait_for(_recvfrom(loop, sock), remaining)
+            if raw:
+                # Raw sockets see every ICMP packet with its IP header
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8 or source[0] != address:
+                continue
+            icmp_type, _, _, reply_ident, reply_seq = struct.unpack('!BBHHH', data[:8])
+            # The kernel rewrites the identifier on datagram sockets, so only check it on raw ones
+            if icmp_type == _ICMP_ECHO_REPLY and reply_seq == seq and (not raw or reply_ident == ident):
+                return round((time.perf_counter() - start) * 1000, 3)
+    except (asyncio.TimeoutError, OSError):
+        return None
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+
+async def tcp_probe(host: str, port: int, timeout: float = DEFAULT_TIMEOUT) -> Optional[float]:
+    """Open and close a TCP connection; return the connect time in milliseconds, or None if it failed."""
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (asyncio.TimeoutError, OSError):
+        return None
+    elapsed = round((time.perf_counter() - start) * 1000, 3)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return elapsed
+
+async def probe_host_async(host: str, ports: Iterable[int] = DEFAULT_PORTS, icmp: bool = True,
+                           timeout: float = DEFAULT_TIMEOUT) -> Dict:
+    """
+    Probe one host with ICMP and TCP connects in parallel.
+
+    Returns:
+        Dict: 'host', 'icmp_ms' (None if unanswered or unavailable), 'tcp_ms' (port -> ms or None)
+              and 'alive' (True if anything answered).
+    """
+    ports = list(ports)
+    checks = [tcp_probe(host, port, timeout) for port in ports]
+    if icmp:
+        checks.append(icmp_probe(host, timeout))
+    outcomes = await asyncio.gather(*checks)
+    tcp_ms = dict(zip(ports, outcomes[:len(ports)]))
+    icmp_ms = outcomes[len(ports)] if icmp else None
+    alive = icmp_ms is not None or any(v is not None for v in tcp_ms.values())
+    return {'host': host, 'icmp_ms': icmp_ms, 'tcp_ms': tcp_ms, 'alive': alive}
+
+async def sweep_async(hosts: List[str], ports: Iterable[int] = DEFAULT_PORTS, icmp: Optional[bool] = None,
+                      timeout: float = DEFAULT_TIMEOUT, concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Dict]:
+    """Probe many hosts concurrently with at most concurrency hosts in flight."""
+    if icmp is None:
+        icmp = icmp_available()
+    semaphore = asyncio.Semaphore(concurrency)
+    ports = list(ports)
+
+    async def _bounded(host: str) -> Dict:
+        async with semaphore:
+            return await probe_host_async(host, ports, icmp, timeout)
+
+    results = await asyncio.gather(*(_bounded(h) for h in hosts))
+    return {r['host']: r for r in results}
+
+def sweep(hosts: List[str], ports: Iterable[int] = DEFAULT_PORTS, icmp: Optional[bool] = None,
+          timeout: float = DEFAULT_TIMEOUT, concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Dict]:
+    """
+    Blocking liveness sweep of hosts from the controller.
+
+    ICMP is used when the process is allowed to open ICMP sockets (icmp=None detects this);
+    TCP connects to ports are always tried.
+    """
+    start = time.time()
+    results = asyncio.run(sweep_async(list(hosts), ports, icmp, timeout, concurrency))
+    alive = sum(1 for r in results.values() if r['alive'])
+    logger.info(f"Liveness sweep of {len(results)} host(s) in {time.time() - start:.2f}s: {alive} alive")
+    return results
+
+def probe_host(host: str, ports: Iterable[int] = DEFAULT_PORTS, icmp: Optional[bool] = None,
+               timeout: float = DEFAULT_TIMEOUT) -> Dict:
+    """Blocking liveness probe of a single host."""
+    return sweep([host], ports, icmp, timeout)[host]
+
+def sweep_inventory(inventory_file: str, ports: Iterable[int] = DEFAULT_PORTS, timeout: float = DEFAULT_TIMEOUT,
+                    concurrency: int = DEFAULT_CONCURRENCY) -> List[Dict]:
+    """Sweep every management IP in inventory.yml and return results with inventory details."""
+    inventory = load_yaml_file(inventory_file) or []
+    hosts = flatten_inventory(inventory)
+    results = sweep([h['ip_address'] for h in hosts], ports, timeout=timeout, concurrency=concurrency)
+    return [dict(results[h['ip_address']], host_name=h.get('host_name'), location=h.get('location')) for h in hosts]
+
+def print_sweep(rows: List[Dict], ports: Iterable[int] = DEFAULT_PORTS) -> None:
+    """Print a liveness table."""
+    ports = list(ports)
+    fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+    print(f"{'Host':<20} {'IP':<16} {'ICMP ms':>8} " + " ".join(f"{'TCP ' + str(p):>8}" for p in ports) + "  Alive")
+    for row in rows:
+        print(f"{(row.get('host_name') or row['host']):<20} {row['host']:<16} {fmt(row['icmp_ms']):>8} "
+              + " ".join(f"{fmt(row['tcp_ms'].get(p)):>8}" for p in ports) + f"  {'yes' if row['alive'] else 'NO'}")
+
+if __name__ == "__main__":
+    # Run as: python -m scripts.liveness [inventory.yml]
+    project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    inventory_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(project_dir, 'data/inventory.yml')
+    print_sweep(sweep_inventory(inventory_file))
@@ -0,0 +1,251 @@
+import argparse
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DIR = os.path.join(os.path.dirname(__file__), '../reports/metrics')
+AGGREGATES = ('avg', 'min', 'max', 'sum', 'count', 'last', 'first')
+
+_UNSAFE = re.compile(r'[^\w.\-]')
+
+def _partition(timestamp: float) -> str:
+    """Return the monthly partition (YYYY-MM, UTC) a timestamp belongs to."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m')
+
+def _month_start(partition: str) -> float:
+    return datetime.strptime(partition, '%Y-%m').replace(tzinfo=timezone.utc).timestamp()
+
+def _read_column(path: str, typecode: str = 'd') -> array:
+    column = array(typecode)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return column
+    # A crash mid-append can leave a partial trailing item
+    usable = len(data) - len(data) % column.itemsize
+    column.frombytes(data[:usable])
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+def _align(base: str) -> None:
+    """Trim the longer column of a metric after a crash between its two appends."""
+    try:
+        sizes = [os.path.getsize(f"{base}.t"), os.path.getsize(f"{base}.v")]
+    except FileNotFoundError:
+        return
+    size = min(sizes) - min(sizes) % 8
+    for suffix, current in zip(('.t', '.v'), sizes):
+        if current != size:
+            os.truncate(f"{base}{suffix}", size)
+
+class MetricsStore:
+    """
+    Append-only columnar time-series store for per-device metrics.
+
+    Layout: <root>/<device>/<YYYY-MM>/<metric>.t and <metric>.v, holding the sample timestamps and
+    values as little-endian float64 columns. The directory tree is the index by device and
+    month; within a month, timestamps are sorted, so a range is found by binary search and read
+    with a single bulk array load.
+    """
+
+    def __init__(self, root: str = DEFAULT_METRICS_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, device: str, partition: str) -> str:
+        return os.path.join(self.root, _UNSAFE.sub('_', device), partition)
+
+    def append(self, device: str, metrics: Dict[str, Optional[float]], timestamp: Optional[float] = None) -> None:
+        """Append one sample per metric; None values are stored as NaN."""
+        timestamp = time.time() if timestamp is None else timestamp
+        directory = self._dir(device, _partition(timestamp))
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            stamp = array('d', [timestamp])
+            if sys.byteorder != 'little':
+                stamp.byteswap()
+            for metric, value in metrics.items():
+                base = os.path.join(directory, _UNSAFE.sub('_', metric))
+                sample = array('d', [math.nan if value is None else float(value)])
+                if sys.byteorder != 'little':
+                    sample.byteswap()
+                _align(base)
+                with open(f"{base}.v", 'ab') as f:
+                    f.write(sample.tobytes())
+                with open(f"{base}.t", 'ab') as f:
+                    f.write(stamp.tobytes())
+
+    def devices(self) -> List[str]:
+        try:
+            return sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return []
+
+    def _partitions(self, device: str) -> List[str]:
+        try:
+            return sorted(os.listdir(os.path.join(self.root, _UNSAFE.sub('_', device))))
+        except FileNotFoundError:
+            return []
+
+    def metrics(self, device: str) -> List[str]:
+        """Return every metric recorded for device."""
+        names = set()
+        for partition in self._partitions(device):
+            names.update(n[:-2] for n in os.listdir(self._dir(device, partition)) if n.endswith('.t'))
+        return sorted(names)
+
+    def query(self, device: str, metric: str, start: Optional[float] = None,
+              end: Optional[float] = None) -> Tuple[array, array]:
+        """Return (timestamps, values) of a metric within [start, end], oldest first."""
+        timestamps, values = array('d'), array('d')
+        metric = _UNSAFE.sub('_', metric)
+        for partition in self._partitions(device):
+            month = _month_start(partition)
+            if end is not None and month > end:
+                break
+            if start is not None and partition < _partition(start):
+                continue
+            base = os.path.join(self._dir(device, partition), metric)
+            t = _read_column(f"{base}.t")
+            v = _read_column(f"{base}.v")
+            n = min(len(t), len(v))
+            lo = bisect_left(t, start, 0, n) if start is not None else 0
+            hi = bisect_right(t, end, 0, n) if end is not None else n
+            timestamps.extend(t[lo:hi])
+            values.extend(v[lo:hi])
+        return timestamps, values
+
+    def aggregate(self, device: str, metric: str, func: str = 'avg', start: Optional[float] = None,
+                  end: Optional[float] = None, bucket: Optional[float] = None) -> List[Tuple[float, Optional[float]]]:
+        """
+        Aggregate a metric over [start, end], optionally per bucket of seconds.
+
+        Returns:
+            List[Tuple[float, Optional[float]]]: (bucket start, value) pairs; a single pair
+                                                 starting at the first sample without bucket.
+        """
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {func}; expected one of {', '.join(AGGREGATES)}")
+        timestamps, values = self.query(device, metric, start, end)
+        groups: Dict[float, List[float]] = {}
+        for t, v in zip(timestamps, values):
+            key = (t // bucket) * bucket if bucket else (timestamps[0] if timestamps else 0.0)
+            groups.setdefault(key, []).append(v)
+        return [(key, _aggregate(func, samples)) for key, samples in groups.items()]
+
+def _aggregate(func: str, samples: List[float]) -> Optional[float]:
+    """Apply func to samples, ignoring NaN (missing) values except for count."""
+    present = [s for s in samples if not math.isnan(s)]
+    if func == 'count':
+        return float(len(present))
+    if not present:
+        return None
+    if func == 'avg':
+        return sum(present) / len(present)
+    if func == 'min':
+        return min(present)
+    if func == 'max':
+        return max(present)
+    if func == 'sum':
+        return sum(present)
+    if func == 'first':
+        return present[0]
+    return present[-1]
+
+def route_metrics(entry: Dict) -> Dict[str, Optional[float]]:
+    """Return the metrics recorded for one collect_route_summary result."""
+    metrics = {'bgp_peers': entry['bgp'], 'ospf_neighbors': entry['ospf'], 'ldp_sessions': entry['ldp']}
+    for table, counts in entry.get('tables', {}).items():
+        metrics[f"routes.{table}"] = counts.get('destinations')
+        for change in ('added', 'removed', 'flapped'):
+            if change in counts:
+                metrics[f"routes.{table}.{change}"] = counts[change]
+    return metrics
+
+def record_ping_results(store: 'MetricsStore', results: Dict[Tuple[str, str], Dict],
+                        timestamp: Optional[float] = None) -> None:
+    """Record RTT and loss of each (source, target) result under the source device."""
+    timestamp = time.time() if timestamp is None else timestamp
+    by_source: Dict[str, Dict[str, Optional[float]]] = {}
+    for (source, target), result in results.items():
+        metrics = by_source.setdefault(source, {})
+        metrics[f"ping.{target}.rtt_avg"] = result.get('rtt_avg')
+        metrics[f"ping.{target}.loss"] = result.get('loss')
+    for source, metrics in by_source.items():
+        store.append(source, metrics, timestamp)
+
+_store: Optional[MetricsStore] = None
+_store_lock = threading.Lock()
+
+def get_metrics_store() -> MetricsStore:
+    """Return the metrics store shared by the process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore()
+        return _store
+
+def _parse_time(text: Optional[str]) -> Optional[float]:
+    """Parse an ISO date/time or a relative age such as 30m, 12h, 7d."""
+    if not text:
+        return None
+    match = re.fullmatch(r'(\d+)([smhd])', text)
+    if match:
+        seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return time.time() - int(match.group(1)) * seconds
+    return datetime.fromisoformat(text).timestamp()
+
+def _parse_bucket(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    match = re.fullmatch(r'(\d+)([smhd])', text)
+    if not match:
+        raise ValueError(f"Invalid bucket {text}; use e.g. 15m, 1h, 1d")
+    return int(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query the per-device metrics store")
+    parser.add_argument('--root', default=DEFAULT_METRICS_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('devices', help="List devices with metrics")
+    metrics_parser = sub.add_parser('metrics', help="List the metrics of a device")
+    metrics_parser.add_argument('device')
+    query_parser = sub.add_parser('query', help="Print samples or aggregates of a metric")
+    query_parser.add_argument('device')
+    query_parser.add_argument('metric')
+    query_parser.add_argument('--since', help="Start as ISO time or age (e.g. 7d)")
+    query_parser.add_argument('--until', help="End as ISO time or age")
+    query_parser.add_argument('--agg', choices=AGGREGATES, help="Aggregate instead of listing samples")
+    query_parser.add_argument('--bucket', help="Aggregate per bucket (e.g. 1h, 1d)")
+    args = parser.parse_args(argv)
+
+    store = MetricsStore(args.root)
+    if args.command == 'devices':
+        print('\n'.join(store.devices()))
+    elif args.command == 'metrics':
+        print('\n'.join(store.metrics(args.device)))
+    else:
+        start, end = _parse_time(args.since), _parse_time(args.until)
+        fmt = lambda t: datetime.fromtimestamp(t).isoformat(timespec='seconds')
+        if args.agg or args.bucket:
+            rows = store.aggregate(args.device, args.metric, args.agg or 'avg', start, end, _parse_bucket(args.bucket))
+        else:
+            rows = zip(*store.query(args.device, args.metric, start, end))
+        for t, v in rows:
+            print(f"{fmt(t)}  {'-' if v is None or math.isnan(v) else round(v, 3)}")
+
+if __name__ == "__main__":
+    # Run as: python -m scripts.metrics_store query <device> <metric> [--since 30d] [--agg avg --bucket 1d]
+    main()
@@ -69,9 +69,9 @@ def main(action_name=None):
         # Get hosts data
         host_ips, hosts, username, password = get_hosts()
 
-        # Import connect_to_hosts and disconnect_from_hosts here
-        from scripts.connect_to_hosts import connect_to_hosts
-        from scripts.actions import disconnect_from_hosts
+        # Sessions come from the launcher-wide pool so repeated actions skip the handshake
+        from scripts.connection_pool import pooled_connect_to_hosts as connect_to_hosts
+        from scripts.connection_pool import release_to_pool as disconnect_from_hosts
 
         # Map action names to functions
         action_map = {
@@ -83,6 +83,24 @@ def main(action_name=None):
                 connect_to_hosts=connect_to_hosts,
                 disconnect_from_hosts=disconnect_from_hosts
             ),
+            'ping_incremental': lambda: ping_hosts(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                incremental=True
+            ),
+            'ping_monitor': lambda: ping_hosts(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                single_check=False
+            ),
             'interfaces': lambda: configure_interface(
                 username=username,
                 password=password,
@@ -99,6 +117,43 @@ def main(action_name=None):
                 hosts=hosts,
                 connect_to_hosts=connect_to_hosts,
                 disconnect_from_hosts=disconnect_from_hosts
+            ),
+            'route_monitor_diff': lambda: run_monitor_routes_action(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                diff=True
+            ),
+            'route_prefix_trace': lambda: run_monitor_routes_action(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                diff=True,
+                prefix=input("Address or prefix to trace (e.g. 10.0.0.0/8): ").strip()
+            ),
+            'route_monitor_measure': lambda: run_monitor_routes_action(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                measure=True
+            ),
+            'route_monitor_continuous': lambda: run_monitor_routes_action(
+                username=username,
+                password=password,
+                host_ips=host_ips,
+                hosts=hosts,
+                connect_to_hosts=connect_to_hosts,
+                disconnect_from_hosts=disconnect_from_hosts,
+                continuous=True
             )
         }
 
@@ -0,0 +1,209 @@
+import csv
+import io
+import json
+import math
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Per-pair status codes stored in the matrix
+STATUS_CODES = {'unknown': 0, 'reachable': 1, 'unreachable': 2, 'timeout': 3, 'error': 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Float metrics kept per pair; RTTs in milliseconds, loss in percent, NaN when unknown
+FLOAT_METRICS = ('loss', 'rtt_min', 'rtt_avg', 'rtt_max', 'rtt_stddev')
+COUNT_METRICS = ('sent', 'received')
+
+# Severity of a pair's state for regression checks: reachable, partial loss, no replies
+SEVERITY_REACHABLE = 0
+SEVERITY_DEGRADED = 1
+SEVERITY_DOWN = 2
+SEVERITY_NAMES = ('reachable', 'degraded', 'down')
+
+_MAGIC = b'PMX1'
+_HEADER = struct.Struct('<4sdI')
+
+class PingMatrix:
+    """
+    Source x target reachability matrix backed by flat typed arrays.
+
+    Cell (i, j) holds the result of pinging hosts[j] from hosts[i]. Metrics live in one
+    array each, so a 50-device site costs a few kilobytes and serializes without per-cell objects.
+    """
+
+    def __init__(self, hosts: List[str], timestamp: Optional[float] = None):
+        self.hosts = list(hosts)
+        self.index = {host: i for i, host in enumerate(self.hosts)}
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        cells = len(self.hosts) ** 2
+        self.status = array('B', bytes(cells))
+        self.floats = {name: array('f', [math.nan]) * cells for name in FLOAT_METRICS}
+        self.counts = {name: array('H', bytes(2 * cells)) for name in COUNT_METRICS}
+
+    def _cell(self, source: str, target: str) -> int:
+        return self.index[source] * len(self.hosts) + self.index[target]
+
+    def set(self, source: str, target: str, result: Dict) -> None:
+        """Store a ping result dict (as returned by reachability.ping_once) for a pair."""
+        cell = self._cell(source, target)
+        self.status[cell] = STATUS_CODES.get(result.get('status'), 0)
+        for name in FLOAT_METRICS:
+            value = result.get(name)
+            self.floats[name][cell] = math.nan if value is None else value
+        for name in COUNT_METRICS:
+            self.counts[name][cell] = min(int(result.get(name) or 0), 0xFFFF)
+
+    def get(self, source: str, target: str) -> Dict:
+        """Return the stored result for a pair as a dict."""
+        cell = self._cell(source, target)
+        result = {'status': STATUS_NAMES[self.status[cell]]}
+        for name in FLOAT_METRICS:
+            value = self.floats[name][cell]
+            result[name] = None if math.isnan(value) else round(value, 3)
+        for name in COUNT_METRICS:
+            result[name] = self.counts[name][cell]
+        return result
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """Return every pair that has a result."""
+        n = len(self.hosts)
+        return [(self.hosts[c // n], self.hosts[c % n]) for c, code in enumerate(self.status) if code]
+
+    @classmethod
+    def from_results(cls, results: Dict[Tuple[str, str], Dict], timestamp: Optional[float] = None) -> 'PingMatrix':
+        """Build a matrix from run_ping_matrix output."""
+        hosts = sorted({h for pair in results for h in pair})
+        matrix = cls(hosts, timestamp)
+        for (source, target), result in results.items():
+            matrix.set(source, target, result)
+        return matrix
+
+    def to_json(self) -> str:
+        """Serialize as JSON with one list per metric in row-major order."""
+        data = {
+            'timestamp': self.timestamp,
+            'hosts': self.hosts,
+            'status': [STATUS_NAMES[c] for c in self.status],
+        }
+        for name in FLOAT_METRICS:
+            data[name] = [None if math.isnan(v) else round(v, 3) for v in self.floats[name]]
+        for name in COUNT_METRICS:
+            data[name] = list(self.counts[name])
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'PingMatrix':
+        data = json.loads(text)
+        matrix = cls(data['hosts'], data['timestamp'])
+        matrix.status = array('B', (STATUS_CODES[s] for s in data['status']))
+        for name in FLOAT_METRICS:
+            matrix.floats[name] = array('f', (math.nan if v is None else v for v in data[name]))
+        for name in COUNT_METRICS:
+            matrix.counts[name] = array('H', data[name])
+        return matrix
+
+    def to_csv(self) -> str:
+        """Serialize as CSV with one row per measured pair."""
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(('source', 'target', 'status') + FLOAT_METRICS + COUNT_METRICS)
+        for source, target in self.pairs():
+            result = self.get(source, target)
+            writer.writerow([source, target] + [result[k] for k in ('status',) + FLOAT_METRICS + COUNT_METRICS])
+        return out.getvalue()
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact little-endian binary blob."""
+        hosts = '\n'.join(self.hosts).encode('utf-8')
+        parts = [_HEADER.pack(_MAGIC, self.timestamp, len(hosts)), hosts]
+        for arr in [self.status] + [self.floats[n] for n in FLOAT_METRICS] + [self.counts[n] for n in COUNT_METRICS]:
+            if sys.byteorder != 'little':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            parts.append(arr.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'PingMatrix':
+        magic, timestamp, hosts_len = _HEADER.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError("Not a ping matrix file")
+        offset = _HEADER.size
+        hosts_text = blob[offset:offset + hosts_len].decode('utf-8')
+        offset += hosts_len
+        matrix = cls(hosts_text.split('\n') if hosts_text else [], timestamp)
+        targets = [('status', None)] + [(n, 'floats') for n in FLOAT_METRICS] + [(n, 'counts') for n in COUNT_METRICS]
+        for name, group in targets:
+            current = matrix.status if group is None else getattr(matrix, group)[name]
+            size = len(current) * current.itemsize
+            arr = array(current.typecode)
+            arr.frombytes(blob[offset:offset + size])
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            offset += size
+            if group is None:
+                matrix.status = arr
+            else:
+                getattr(matrix, group)[name] = arr
+        return matrix
+
+    def save(self, path: str) -> None:
+        """Write the matrix to path; the format follows the extension (.json, .csv, otherwise binary)."""
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                f.write(self.to_json())
+        elif path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                f.write(self.to_csv())
+        else:
+            with open(path, 'wb') as f:
+                f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'PingMatrix':
+        """Read a matrix written by save() in JSON or binary format."""
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                return cls.from_json(f.read())
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def severity(result: Dict) -> int:
+    """Rank a pair result: reachable < degraded (some replies lost) < down (unreachable, timeout or error)."""
+    if result['status'] == 'reachable':
+        return SEVERITY_REACHABLE
+    if result['status'] == 'unreachable' and result['received']:
+        return SEVERITY_DEGRADED
+    return SEVERITY_DOWN
+
+def compare_matrices(previous: PingMatrix, current: PingMatrix, rtt_factor: float = 1.5,
+                     min_rtt_delta: float = 5.0) -> List[Dict]:
+    """
+    Return the pairs whose reachability got worse or whose average RTT regressed.
+
+    A status change is only reported when the pair now ranks worse (see severity), so a
+    recovery is never listed as a regression. An RTT regression needs both a ratio of at least rtt_factor and an absolute increase of
+    at least min_rtt_delta milliseconds, so jitter on sub-millisecond links is ignored.
+    """
+    changes = []
+    for source, target in current.pairs():
+        if source not in previous.index or target not in previous.index:
+            continue
+        before = previous.get(source, target)
+        after = current.get(source, target)
+        if before['status'] == 'unknown':
+            continue
+        if severity(after) > severity(before):
+            changes.append({'source': source, 'target': target, 'change': 'status',
+                            'before': SEVERITY_NAMES[severity(before)], 'after': SEVERITY_NAMES[severity(after)]})
+        elif after['loss'] is not None and before['loss'] is not None and after['loss'] > before['loss']:
+            changes.append({'source': source, 'target': target, 'change': 'loss',
+                            'before': before['loss'], 'after': after['loss']})
+        elif before['rtt_avg'] and after['rtt_avg'] and \
+                after['rtt_avg'] >= before['rtt_avg'] * rtt_factor and \
+                after['rtt_avg'] - before['rtt_avg'] >= min_rtt_delta:
+            changes.append({'source': source, 'target': target, 'change': 'rtt',
+                            'before': before['rtt_avg'], 'after': after['rtt_avg']})
+    return changes
@@ -0,0 +1,154 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from jnpr.junos import Device
+
+from scripts.metrics_store import get_metrics_store, record_ping_results
+from scripts.reachability import (
+    DEFAULT_FLEET_LIMIT,
+    DEFAULT_PER_SOURCE,
+    run_ping_matrix,
+)
+
+logger = logging.getLogger(__name__)
+
+# Continuous monitoring defaults
+DEFAULT_WINDOW = 120  # Samples kept per pair
+DEFAULT_LOSS_THRESHOLD = 20.0  # Percent loss over the window that raises an event
+DEFAULT_P95_THRESHOLD = 100.0  # p95 RTT in milliseconds that raises an event
+
+class RttRing:
+    """Fixed-size ring buffer of per-cycle RTT (ms, NaN when lost) and loss (%) samples."""
+
+    def __init__(self, size: int = DEFAULT_WINDOW):
+        self.size = size
+        self.rtt = array('f', [math.nan]) * size
+        self.loss = array('f', [0.0]) * size
+        self.count = 0
+        self.head = 0
+
+    def add(self, rtt: Optional[float], loss: Optional[float]) -> None:
+        self.rtt[self.head] = math.nan if rtt is None else rtt
+        self.loss[self.head] = 100.0 if loss is None else loss
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _samples(self, arr: array) -> List[float]:
+        if self.count < self.size:
+            return list(arr[:self.count])
+        return list(arr)
+
+    def percentiles(self, quantiles: Tuple[float, ...] = (50, 95, 99)) -> Dict[str, Optional[float]]:
+        """Return nearest-rank RTT percentiles over the samples that got a reply."""
+        values = sorted(v for v in self._samples(self.rtt) if not math.isnan(v))
+        result = {}
+        for q in quantiles:
+            key = f"p{q:g}"
+            if not values:
+                result[key] = None
+            else:
+                rank = max(1, math.ceil(q / 100.0 * len(values)))
+                result[key] = round(values[rank - 1], 3)
+        return result
+
+    def loss_rate(self) -> float:
+        """Return the mean loss percentage over the window."""
+        samples = self._samples(self.loss)
+        return round(sum(samples) / len(samples), 2) if samples else 0.0
+
+class PingMonitor:
+    """Keeps a ring buffer per (source, target) pair and reports threshold crossings."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, loss_threshold: float = DEFAULT_LOSS_THRESHOLD,
+                 p95_threshold: float = DEFAULT_P95_THRESHOLD):
+        self.window = window
+        self.loss_threshold = loss_threshold
+        self.p95_threshold = p95_threshold
+        self.rings: Dict[Tuple[str, str], RttRing] = {}
+        self.alerting: Dict[Tuple[str, str], Dict[str, bool]] = {}
+
+    def stats(self, pair: Tuple[str, str]) -> Dict:
+        ring = self.rings[pair]
+        return dict(ring.percentiles(), loss=ring.loss_rate(), samples=ring.count)
+
+    def observe(self, results: Dict[Tuple[str, str], Dict]) -> List[Dict]:
+        """Add one cycle of ping results and return the events for thresholds crossed in either direction."""
+        events = []
+        for pair, result in results.items():
+            ring = self.rings.setdefault(pair, RttRing(self.window))
+            ring.add(result.get('rtt_avg'), result.get('loss'))
+            stats = self.stats(pair)
+            checks = {
+                'loss': stats['loss'] >= self.loss_threshold,
+                'p95': stats['p95'] is not None and stats['p95'] >= self.p95_threshold,
+            }
+            state = self.alerting.setdefault(pair, {'loss': False, 'p95': False})
+            for metric, breached in checks.items():
+                if breached != state[metric]:
+                    state[metric] = breached
+                    events.append({
+                        'time': datetime.now().isoformat(timespec='seconds'),
+                        'source': pair[0],
+                        'target': pair[1],
+                        'metric': metric,
+                        'event': 'breach' if breached else 'recovered',
+                        'stats': stats,
+                    })
+        return events
+
+def write_events(events_file: str, events: List[Dict], host_lookup: Dict[str, str]) -> None:
+    """Append events as JSON lines and echo them to the console."""
+    if not events:
+        return
+    with open(events_file, 'a') as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+            source = host_lookup.get(event['source'], event['source'])
+            target = host_lookup.get(event['target'], event['target'])
+            print(f"{event['time']} {event['event'].upper()} {event['metric']} {source} -> {target}: {event['stats']}")
+
+def monitor_pings(
+    connections: List[Device],
+    report_dir: str,
+    host_lookup: Dict[str, str],
+    interval: int,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    per_source: int = DEFAULT_PER_SOURCE,
+    fleet_limit: int = DEFAULT_FLEET_LIMIT,
+    monitor: Optional[PingMonitor] = None,
+    max_cycles: Optional[int] = None,
+    stop_event: Optional[threading.Event] = None
+) -> PingMonitor:
+    """
+    Ping the full mesh every interval seconds until stopped, writing only threshold events.
+
+    Cycles are scheduled against a fixed start time, so they do not drift when a cycle is slow;
+    a cycle that overruns the interval causes the missed slots to be skipped.
+    """
+    monitor = monitor or PingMonitor()
+    stop_event = stop_event or threading.Event()
+    events_file = os.path.join(report_dir, 'ping_events.jsonl')
+    logger.info(f"Starting continuous ping monitoring every {interval}s, events in {events_file}")
+    print(f"Monitoring reachability every {interval} seconds. Press Ctrl+C to stop. Events: {events_file}")
+    start = time.monotonic()
+    cycle = 0
+    while not stop_event.is_set() and (max_cycles is None or cycle < max_cycles):
+        results = run_ping_matrix(connections, username=username, password=password,
+                                  per_source=per_source, fleet_limit=fleet_limit)
+        write_events(events_file, monitor.observe(results), host_lookup)
+        record_ping_results(get_metrics_store(), results)
+        cycle += 1
+        # Sleep until the next slot on the fixed grid
+        elapsed = time.monotonic() - start
+        next_slot = (math.floor(elapsed / interval) + 1) * interval
+        if next_slot - elapsed > 0:
+            stop_event.wait(next_slot - elapsed)
+    return monitor
@@ -0,0 +1,331 @@
+import ipaddress
+import logging
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_FILE = os.path.join(os.path.dirname(__file__), '../reports/prefix_index.pfx')
+
+_MAGIC = b'PFX1'
+_HEADER = struct.Struct('<4sIII')
+_TRIE_HEADER = struct.Struct('<BI')
+_NONE = -1
+
+class PrefixTrie:
+    """
+    Path-compressed binary (Patricia) trie of prefixes of one address family, stored in flat arrays.
+
+    Node i holds the prefix (hi[i] << 64 | lo[i]) / length[i], its two children and the index of
+    its payload (-1 for glue nodes). A trie of n prefixes has fewer than 2n nodes.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.length = array('B')
+        self.hi = array('Q')
+        self.lo = array('Q')
+        self.left = array('i')
+        self.right = array('i')
+        self.value = array('i')
+        self.root = _NONE
+
+    def __len__(self) -> int:
+        return sum(1 for v in self.value if v != _NONE)
+
+    def _key(self, node: int) -> int:
+        return (self.hi[node] << 64) | self.lo[node]
+
+    def _new(self, key: int, length: int) -> int:
+        self.length.append(length)
+        self.hi.append(key >> 64)
+        self.lo.append(key & 0xFFFFFFFFFFFFFFFF)
+        self.left.append(_NONE)
+        self.right.append(_NONE)
+        self.value.append(_NONE)
+        return len(self.length) - 1
+
+    def _bit(self, key: int, position: int) -> int:
+        return (key >> (self.width - 1 - position)) & 1
+
+    def _common(self, a: int, b: int, limit: int) -> int:
+        """Return the number of leading bits a and b share, capped at limit."""
+        diff = a ^ b
+        return limit if not diff else min(limit, self.width - diff.bit_length())
+
+    def _link(self, parent: int, bit: int, child: int) -> None:
+        if parent == _NONE:
+            self.root = child
+        elif bit:
+            self.right[parent] = child
+        else:
+            self.left[parent] = child
+
+    def insert(self, key: int, length: int) -> int:
+        """Return the node for key/length, creating it (and a glue node if needed)."""
+        width = self.width
+        key &= ~((1 << (width - length)) - 1)
+        if self.root == _NONE:
+            self.root = self._new(key, length)
+            return self.root
+        parent, parent_bit, node = _NONE, 0, self.root
+        while True:
+            node_key, node_length = self._key(node), self.length[node]
+            common = self._common(key, node_key, min(length, node_length))
+            if common == node_length == length:
+                return node
+            if common == node_length:
+                bit = self._bit(key, node_length)
+                child = self.right[node] if bit else self.left[node]
+                if child == _NONE:
+                    leaf = self._new(key, length)
+                    self._link(node, bit, leaf)
+                    return leaf
+                parent, parent_bit, node = node, bit, child
+                continue
+            if common == length:
+                # The new prefix covers the existing node
+                new = self._new(key, length)
+                self._link(new, self._bit(node_key, length), node)
+                self._link(parent, parent_bit, new)
+                return new
+            glue = self._new(key & ~((1 << (width - common)) - 1), common)
+            leaf = self._new(key, length)
+            self._link(glue, self._bit(key, common), leaf)
+            self._link(glue, self._bit(node_key, common), node)
+            self._link(parent, parent_bit, glue)
+            return leaf
+
+    def _matches(self, node: int, key: int) -> bool:
+        length = self.length[node]
+        return length == 0 or (key ^ self._key(node)) >> (self.width - length) == 0
+
+    def covering(self, key: int, length: Optional[int] = None) -> List[int]:
+        """Return the nodes with a payload whose prefix covers key/length, least specific first."""
+        length = self.width if length is None else length
+        found = []
+        node = self.root
+        while node != _NONE and self.length[node] <= length and self._matches(node, key):
+            if self.value[node] != _NONE:
+                found.append(node)
+            if self.length[node] == self.width:
+                break
+            node = self.right[node] if self._bit(key, self.length[node]) else self.left[node]
+        return found
+
+    def under(self, key: int, length: int) -> List[int]:
+        """Return the nodes with a payload inside key/length (including it), in address order."""
+        node = self.root
+        while node != _NONE and self.length[node] < length:
+            if not self._matches(node, key):
+                return []
+            node = self.right[node] if self._bit(key, self.length[node]) else self.left[node]
+        if node == _NONE:
+            return []
+        # The node is at least as specific as the query; check it falls inside it
+        if length and (key ^ self._key(node)) >> (self.width - length):
+            return []
+        found, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            if self.value[node] != _NONE:
+                found.append(node)
+            for child in (self.right[node], self.left[node]):
+                if child != _NONE:
+                    stack.append(child)
+        return found
+
+    def prefix(self, node: int) -> str:
+        """Return the prefix of a node in text form."""
+        key = self._key(node)
+        address = ipaddress.IPv4Address(key) if self.width == 32 else ipaddress.IPv6Address(key)
+        return f"{address}/{self.length[node]}"
+
+    def to_bytes(self) -> bytes:
+        arrays = (self.length, self.hi, self.lo, self.left, self.right, self.value)
+        parts = [_TRIE_HEADER.pack(self.width, len(self.length)), struct.pack('<i', self.root)]
+        for arr in arrays:
+            if sys.byteorder != 'little':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            parts.append(arr.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, offset: int) -> Tuple['PrefixTrie', int]:
+        width, nodes = _TRIE_HEADER.unpack_from(blob, offset)
+        offset += _TRIE_HEADER.size
+        trie = cls(width)
+        trie.root = struct.unpack_from('<i', blob, offset)[0]
+        offset += 4
+        for name in ('length', 'hi', 'lo', 'left', 'right', 'value'):
+            arr = array(getattr(trie, name).typecode)
+            size = nodes * arr.itemsize
+            arr.frombytes(blob[offset:offset + size])
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            setattr(trie, name, arr)
+            offset += size
+        return trie, offset
+
+def _parse(prefix: str) -> Optional[Tuple[int, int, int]]:
+    """Return (width, key, length) for an IPv4/IPv6 address or prefix, or None for anything else."""
+    try:
+        network = ipaddress.ip_network(prefix.strip(), strict=False)
+    except ValueError:
+        return None
+    return network.max_prefixlen, int(network.network_address), network.prefixlen
+
+class PrefixIndex:
+    """
+    Index of the prefixes held by each device, for covering, longest-match and subtree queries.
+
+    Each prefix carries a bitmask of the devices that have it. Non-IP entries (e.g. MPLS labels) are skipped.
+    """
+
+    def __init__(self):
+        self.tries = {32: PrefixTrie(32), 128: PrefixTrie(128)}
+        self.devices: List[str] = []
+        self._device_index: Dict[str, int] = {}
+        self.masks: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def add(self, prefix: str, device: str) -> bool:
+        """Record that device has a route to prefix; returns False if prefix is not an IP prefix."""
+        parsed = _parse(prefix)
+        if parsed is None:
+            return False
+        width, key, length = parsed
+        if device not in self._device_index:
+            self._device_index[device] = len(self.devices)
+            self.devices.append(device)
+        trie = self.tries[width]
+        node = trie.insert(key, length)
+        if trie.value[node] == _NONE:
+            trie.value[node] = len(self.masks)
+            self.masks.append(0)
+        self.masks[trie.value[node]] |= 1 << self._device_index[device]
+        return True
+
+    def add_many(self, prefixes: Iterable[str], device: str) -> int:
+        """Add prefixes of one device and return how many were indexed."""
+        return sum(1 for prefix in prefixes if self.add(prefix, device))
+
+    def _devices(self, mask: int) -> List[str]:
+        return [device for i, device in enumerate(self.devices) if mask >> i & 1]
+
+    def _entries(self, trie: PrefixTrie, nodes: List[int]) -> List[Tuple[str, List[str]]]:
+        return [(trie.prefix(node), self._devices(self.masks[trie.value[node]])) for node in nodes]
+
+    def covering(self, target: str) -> List[Tuple[str, List[str]]]:
+        """Return every indexed prefix covering target (address or prefix) with its devices, least specific first."""
+        parsed = _parse(target)
+        if parsed is None:
+            return []
+        width, key, length = parsed
+        trie = self.tries[width]
+        return self._entries(trie, trie.covering(key, length))
+
+    def longest_match(self, target: str) -> Optional[Tuple[str, List[str]]]:
+        """Return the most specific indexed prefix covering target, or None."""
+        matches = self.covering(target)
+        return matches[-1] if matches else None
+
+    def devices_covering(self, target: str) -> Dict[str, str]:
+        """Return, per device with a route covering target, its most specific covering prefix."""
+        result = {}
+        for prefix, devices in self.covering(target):
+            for device in devices:
+                result[device] = prefix
+        return result
+
+    def under(self, prefix: str) -> List[Tuple[str, List[str]]]:
+        """Return every indexed prefix inside prefix (e.g. everything under 10.0.0.0/8) with its devices."""
+        parsed = _parse(prefix)
+        if parsed is None:
+            return []
+        width, key, length = parsed
+        trie = self.tries[width]
+        return self._entries(trie, trie.under(key, length))
+
+    def to_bytes(self) -> bytes:
+        devices = '\n'.join(self.devices).encode('utf-8')
+        mask_size = max(1, (len(self.devices) + 7) // 8)
+        parts = [_HEADER.pack(_MAGIC, len(devices), len(self.masks), mask_size), devices]
+        parts.extend(mask.to_bytes(mask_size, 'little') for mask in self.masks)
+        parts.extend(self.tries[width].to_bytes() for width in (32, 128))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'PrefixIndex':
+        magic, devices_len, count, mask_size = _HEADER.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError("Not a prefix index file")
+        index = cls()
+        offset = _HEADER.size
+        text = blob[offset:offset + devices_len].decode('utf-8')
+        index.devices = text.split('\n') if text else []
+        index._device_index = {device: i for i, device in enumerate(index.devices)}
+        offset += devices_len
+        index.masks = [int.from_bytes(blob[o:o + mask_size], 'little')
+                       for o in range(offset, offset + count * mask_size, mask_size)]
+        offset += count * mask_size
+        for _ in range(2):
+            trie, offset = PrefixTrie.from_bytes(blob, offset)
+            index.tries[trie.width] = trie
+        return index
+
+    def save(self, path: str = DEFAULT_INDEX_FILE) -> None:
+        """Write the index atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_FILE) -> 'PrefixIndex':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def build_index(snapshots: Iterable) -> PrefixIndex:
+    """Build an index from route snapshots, labelling each prefix with the snapshot's host."""
+    index = PrefixIndex()
+    for snapshot in snapshots:
+        index.add_many(snapshot.prefixes, snapshot.host)
+    return index
+
+def changes_under(previous, current, prefix: str) -> Dict[str, List[str]]:
+    """Return the prefixes inside prefix that were added, removed or changed between two snapshots."""
+    from scripts.route_snapshot import diff_snapshots
+    result = {}
+    for change, prefixes in diff_snapshots(previous, current).items():
+        index = PrefixIndex()
+        index.add_many(prefixes, current.host)
+        result[change] = [p for p, _ in index.under(prefix)]
+    return result
+
+def print_entries(entries: List[Tuple[str, List[str]]], host_lookup: Optional[Dict[str, str]] = None) -> None:
+    """Print query results one prefix per line."""
+    host_lookup = host_lookup or {}
+    for prefix, devices in entries:
+        print(f"{prefix:<43} {', '.join(host_lookup.get(d, d) for d in devices)}")
+
+if __name__ == "__main__":
+    # Run as: python -m scripts.prefix_index {covering|longest|under} <address or prefix> [index file]
+    if len(sys.argv) < 3 or sys.argv[1] not in ('covering', 'longest', 'under'):
+        print("Usage: python -m scripts.prefix_index {covering|longest|under} <address or prefix> [index file]")
+        sys.exit(1)
+    loaded = PrefixIndex.load(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_INDEX_FILE)
+    if sys.argv[1] == 'covering':
+        print_entries(loaded.covering(sys.argv[2]))
+    elif sys.argv[1] == 'longest':
+        match = loaded.longest_match(sys.argv[2])
+        print_entries([match] if match else [])
+    else:
+        print_entries(loaded.under(sys.argv[2]))
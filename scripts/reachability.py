@@ -0,0 +1,209 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from jnpr.junos import Device
+from jnpr.junos.exception import RpcTimeoutError
+
+from scripts.connection_pool import DeviceSessions
+from scripts.facts_cache import get_device_facts
+from scripts.ping_matrix import PingMatrix
+
+logger = logging.getLogger(__name__)
+
+# Reachability engine defaults
+DEFAULT_PER_SOURCE = 4  # Pings in flight per source device (one NETCONF session each)
+DEFAULT_FLEET_LIMIT = 64  # Pings in flight across the whole fleet
+DEFAULT_PING_COUNT = 4
+PING_RPC_TIMEOUT = 10  # Per-RPC deadline enforced by the NETCONF session, safe off the main thread
+
+# Ping outcomes
+PING_REACHABLE = 'reachable'
+PING_UNREACHABLE = 'unreachable'
+PING_TIMEOUT = 'timeout'
+PING_ERROR = 'error'
+
+Pair = Tuple[str, str]
+
+def full_mesh(hosts: List[str]) -> List[Pair]:
+    """Return every (source, target) pair between distinct hosts."""
+    return [(src, tgt) for src in hosts for tgt in hosts if src != tgt]
+
+def _number(element, path: str) -> Optional[float]:
+    """Return the numeric text at path, or None if it is missing."""
+    text = element.findtext(path)
+    try:
+        return float(text.strip()) if text is not None else None
+    except ValueError:
+        return None
+
+def parse_ping_results(reply) -> Dict:
+    """
+    Parse a <ping-results> reply into loss, probe counts and RTT statistics.
+
+    Junos reports RTTs in microseconds; they are returned in milliseconds.
+    """
+    summary = reply.find('.//probe-results-summary')
+    result = {'status': PING_UNREACHABLE, 'error': None, 'loss': 100.0, 'sent': 0, 'received': 0,
+              'rtt_min': None, 'rtt_avg': None, 'rtt_max': None, 'rtt_stddev': None}
+    if summary is None:
+        error = reply.findtext('.//rpc-error/error-message') or reply.findtext('.//error-message')
+        if error:
+            result['status'] = PING_ERROR
+            result['error'] = error.strip()
+        return result
+    result['sent'] = int(_number(summary, 'probes-sent') or 0)
+    result['received'] = int(_number(summary, 'responses-received') or 0)
+    loss = _number(summary, 'packet-loss')
+    if loss is None and result['sent']:
+        loss = 100.0 * (result['sent'] - result['received']) / result['sent']
+    result['loss'] = loss if loss is not None else 100.0
+    for name, tag in (('rtt_min', 'rtt-minimum'), ('rtt_avg', 'rtt-average'),
+                      ('rtt_max', 'rtt-maximum'), ('rtt_stddev', 'rtt-stddev')):
+        value = _number(summary, tag)
+        result[name] = round(value / 1000.0, 3) if value is not None else None
+    if result['received'] and result['loss'] == 0:
+        result['status'] = PING_REACHABLE
+    return result
+
+def ping_once(dev: Device, target_ip: str, count: int = DEFAULT_PING_COUNT, rpc_timeout: int = PING_RPC_TIMEOUT) -> Dict:
+    """Ping target_ip from dev with the structured ping RPC and return the parsed result."""
+    try:
+        reply = dev.rpc.ping(host=target_ip, count=str(count), rapid=True, dev_timeout=rpc_timeout)
+        return parse_ping_results(reply)
+    except RpcTimeoutError as e:
+        return {'status': PING_TIMEOUT, 'error': str(e)}
+    except Exception as e:
+        return {'status': PING_ERROR, 'error': str(e)}
+
+def run_ping_matrix(
+    connections: List[Device],
+    pairs: Optional[List[Pair]] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    per_source: int = DEFAULT_PER_SOURCE,
+    fleet_limit: int = DEFAULT_FLEET_LIMIT,
+    count: int = DEFAULT_PING_COUNT,
+    rpc_timeout: int = PING_RPC_TIMEOUT
+) -> Dict[Pair, Dict]:
+    """
+    Ping many (source, target) pairs concurrently.
+
+    Each source device runs up to per_source pings at once, one per NETCONF session; extra
+    sessions come from the shared connection pool when credentials are given. At most
+    fleet_limit pings run across the fleet. Every ping carries its own RPC deadline.
+
+    Args:
+        connections: Open devices to ping from.
+        pairs: (source, target) pairs to probe; defaults to the full mesh of connections.
+        username: Login username used to open extra sessions per source.
+        password: Login password used to open extra sessions per source.
+        per_source: Maximum pings in flight per source device.
+        fleet_limit: Maximum pings in flight overall.
+        count: Probes per ping.
+        rpc_timeout: Seconds allowed for each ping RPC.
+
+    Returns:
+        Dict[Pair, Dict]: Result per pair as returned by ping_once, plus 'elapsed'.
+    """
+    by_host = {dev.hostname: dev for dev in connections}
+    if pairs is None:
+        pairs = full_mesh(list(by_host))
+    runnable = [p for p in pairs if p[0] in by_host]
+    results: Dict[Pair, Dict] = {
+        p: {'status': PING_ERROR, 'error': 'Source device not connected', 'elapsed': 0.0}
+        for p in pairs if p[0] not in by_host
+    }
+    if not runnable:
+        return results
+
+    sources = {host: DeviceSessions(dev, max(1, per_source), username, password) for host, dev in by_host.items()}
+
+    # Interleave pairs across sources so fleet workers never pile up behind a single device
+    per_source_pairs: Dict[str, List[Pair]] = {}
+    for p in runnable:
+        per_source_pairs.setdefault(p[0], []).append(p)
+    ordered = []
+    depth = max(len(v) for v in per_source_pairs.values())
+    for i in range(depth):
+        ordered.extend(v[i] for v in per_source_pairs.values() if i < len(v))
+
+    def _probe(pair: Pair) -> Tuple[Pair, Dict]:
+        src = sources[pair[0]]
+        dev = src.checkout()
+        start = time.time()
+        try:
+            result = ping_once(dev, pair[1], count=count, rpc_timeout=rpc_timeout)
+        finally:
+            src.checkin(dev)
+        result['elapsed'] = round(time.time() - start, 3)
+        return pair, result
+
+    start = time.time()
+    workers = max(1, min(fleet_limit, len(ordered)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ping') as executor:
+            for pair, result in executor.map(_probe, ordered):
+                results[pair] = result
+    finally:
+        for src in sources.values():
+            src.release_extra()
+    logger.info(f"Pinged {len(ordered)} pair(s) from {len(sources)} source(s) in {time.time() - start:.2f}s")
+    return results
+
+def device_fingerprint(dev: Device) -> str:
+    """Return a string that changes when the device's software, chassis or committed config changes."""
+    facts = get_device_facts(dev)
+    commit = dev.rpc.get_commit_information(dev_timeout=PING_RPC_TIMEOUT)
+    last_commit = commit.findtext('.//commit-history/date-time') or ''
+    return f"{facts.get('serial')}|{facts.get('version')}|{last_commit.strip()}"
+
+def select_incremental_pairs(
+    previous: Optional[PingMatrix],
+    hosts: List[str],
+    changed_hosts: List[str],
+    cursor: int = 0,
+    sample_fraction: float = 0.1
+) -> Tuple[List[Pair], int]:
+    """
+    Choose which pairs to re-probe given the last known matrix.
+
+    Re-probed pairs are those never measured or not reachable last time, those involving a
+    changed host, and a rotating slice of sample_fraction of the healthy pairs, so every pair
+    is re-tested at least once every 1/sample_fraction runs.
+
+    Returns:
+        Tuple[List[Pair], int]: The pairs to probe and the rotation cursor for the next run.
+    """
+    mesh = full_mesh(hosts)
+    if previous is None:
+        return mesh, 0
+    changed = set(changed_hosts)
+    selected = []
+    healthy = []
+    for source, target in mesh:
+        known = source in previous.index and target in previous.index
+        if not known or source in changed or target in changed:
+            selected.append((source, target))
+        elif previous.get(source, target)['status'] != PING_REACHABLE:
+            selected.append((source, target))
+        else:
+            healthy.append((source, target))
+    if healthy:
+        sample_size = max(1, int(len(healthy) * sample_fraction))
+        start = cursor % len(healthy)
+        sample = (healthy + healthy)[start:start + sample_size]
+        selected.extend(sample)
+        cursor = (start + sample_size) % len(healthy)
+    return selected, cursor
+
+def merge_matrix(previous: Optional[PingMatrix], hosts: List[str], results: Dict[Pair, Dict]) -> PingMatrix:
+    """Return a full matrix over hosts with fresh results where probed and last known values elsewhere."""
+    matrix = PingMatrix(hosts)
+    for source, target in full_mesh(hosts):
+        if (source, target) in results:
+            matrix.set(source, target, results[(source, target)])
+        elif previous is not None and source in previous.index and target in previous.index:
+            matrix.set(source, target, previous.get(source, target))
+    return matrix
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from scripts.connection_pool import get_pool
+from scripts.facts_cache import get_device_facts
+from scripts.liveness import icmp_available, icmp_probe, tcp_probe
+
+logger = logging.getLogger(__name__)
+
+# Readiness defaults
+NETCONF_PORT = 830
+DEFAULT_MAX_WAIT = 900  # Seconds to wait for a rebooted device to be ready
+DEFAULT_DOWN_WAIT = 180  # Seconds to wait for the device to go down after a reboot command
+INITIAL_BACKOFF = 2.0  # Seconds between checks right after a stage passes
+MAX_BACKOFF = 20.0
+BACKOFF_FACTOR = 1.5
+CHECK_TIMEOUT = 2.0  # Timeout of a single ICMP or TCP check
+
+# Stages in order, cheapest first
+STAGES = ('icmp', 'tcp', 'netconf', 'version')
+
+def _icmp_up(host: str) -> bool:
+    return asyncio.run(icmp_probe(host, CHECK_TIMEOUT)) is not None
+
+def _tcp_up(host: str) -> bool:
+    return asyncio.run(tcp_probe(host, NETCONF_PORT, CHECK_TIMEOUT)) is not None
+
+def wait_for_down(host: str, max_wait: int = DEFAULT_DOWN_WAIT) -> bool:
+    """
+    Wait until the NETCONF port of host stops answering after a reboot command.
+
+    Until then the old software may still accept sessions, which would report the old version.
+    Returns True once the port is closed, False if it stayed open for max_wait seconds.
+    """
+    deadline = time.time() + max_wait
+    while time.time() < deadline:
+        if not _tcp_up(host):
+            logger.info(f"{host} went down for reboot")
+            return True
+        time.sleep(INITIAL_BACKOFF)
+    logger.warning(f"{host} still answered on port {NETCONF_PORT} after {max_wait} seconds")
+    return False
+
+def wait_for_ready(host: str, username: str, password: str, max_wait: int = DEFAULT_MAX_WAIT) -> Dict:
+    """
+    Wait until a rebooted device answers a version RPC, using staged checks from cheap to expensive.
+
+    Each attempt only runs the next stage once the cheaper ones pass: ICMP echo (skipped when the
+    process cannot send ICMP), TCP connect to the NETCONF port, a NETCONF session (the hello
+    exchange happens on open) and a version RPC on that session. The wait between attempts
+    starts at INITIAL_BACKOFF, grows by BACKOFF_FACTOR up to MAX_BACKOFF while the device makes
+    no progress, and drops back to INITIAL_BACKOFF whenever a further stage passes, so a device
+    is noticed within seconds of becoming ready.
+
+    Returns:
+        Dict: 'ready', 'stage' (last stage passed or None), 'elapsed' (seconds), 'version',
+              'device' (the open pooled session when ready; the caller releases it) and 'error'.
+    """
+    use_icmp = icmp_available()
+    pool = get_pool()
+    start = time.time()
+    backoff = INITIAL_BACKOFF
+    best = -1
+    last_error = None
+    while True:
+        reached = -1
+        dev = None
+        try:
+            if use_icmp and not _icmp_up(host):
+                raise ConnectionError("no ICMP reply")
+            reached = 0
+            if not _tcp_up(host):
+                raise ConnectionError(f"port {NETCONF_PORT} closed")
+            reached = 1
+            dev = pool.acquire(host, username, password, timeout=int(MAX_BACKOFF))
+            reached = 2
+            version = get_device_facts(dev, refresh=True).get('version')
+            if not version:
+                raise ValueError("version not found in software information")
+            elapsed = round(time.time() - start, 1)
+            logger.info(f"{host} ready after {elapsed}s, running {version}")
+            print(f"✅ {host} is ready after {elapsed}s (version {version})")
+            return {'ready': True, 'stage': STAGES[-1], 'elapsed': elapsed, 'version': version,
+                    'device': dev, 'error': None}
+        except Exception as e:
+            last_error = e
+            if dev is not None:
+                pool.release(dev, discard=True)
+        if reached > best:
+            best = reached
+            backoff = INITIAL_BACKOFF
+            logger.info(f"{host} passed {STAGES[reached]} check after {time.time() - start:.1f}s")
+        else:
+            backoff = min(backoff * BACKOFF_FACTOR, MAX_BACKOFF)
+        remaining = max_wait - (time.time() - start)
+        if remaining <= 0:
+            break
+        logger.debug(f"{host} not ready ({last_error}); next check in {backoff:.1f}s")
+        time.sleep(min(backoff, remaining))
+    stage = STAGES[best] if best >= 0 else None
+    logger.error(f"{host} not ready within {max_wait} seconds (last stage passed: {stage}): {last_error}")
+    print(f"❌ {host} not ready within {max_wait} seconds (last stage passed: {stage or 'none'})")
+    return {'ready': False, 'stage': stage, 'elapsed': round(time.time() - start, 1), 'version': None,
+            'device': None, 'error': str(last_error)}
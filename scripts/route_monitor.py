@@ -1,12 +1,282 @@
 import os
 from datetime import datetime
 import logging
-from typing import List, Dict, Callable
+import resource
+import time
+import tracemalloc
+from typing import List, Dict, Callable, Iterator, Optional
+from lxml import etree
 from jnpr.junos import Device
 from jnpr.junos.exception import ConnectError
+from scripts.async_engine import register_job, run_job
+from scripts.metrics_store import get_metrics_store, route_metrics
+from scripts.utils import monitor_settings
+from scripts.prefix_index import DEFAULT_INDEX_FILE, PrefixIndex, build_index, changes_under
+from scripts.route_poller import DevicePoller
+from scripts.rpc_batch import run_batch
+from scripts.route_snapshot import RouteSnapshot, get_snapshot_store
+from scripts.route_stream import Route, count_routes, iter_routes_from_tree, stream_routes
 
 logger = logging.getLogger(__name__)
 
+# Tables reported when none are configured
+DEFAULT_TABLES = ['inet.0', 'inet.3', 'mpls.0']
+DEFAULT_INTERVAL = 300  # Seconds between route polls when hosts_data.yml sets none
+
+def _count(element, path: str) -> int:
+    """Return the integer text at path, or 0 if it is missing."""
+    text = element.findtext(path)
+    try:
+        return int(text.strip()) if text is not None else 0
+    except ValueError:
+        return 0
+
+def parse_route_summary(reply) -> Dict[str, Dict]:
+    """
+    Parse a get-route-summary-information reply into per-table and per-protocol counts.
+
+    Returns:
+        Dict[str, Dict]: Per table name, 'destinations', 'routes', 'active', 'hidden' and
+                         'protocols' (protocol name -> {'routes', 'active'}).
+    """
+    tables = {}
+    for table in reply.iter('route-table'):
+        name = (table.findtext('table-name') or '').strip()
+        if not name:
+            continue
+        protocols = {}
+        for protocol in table.findall('protocols'):
+            protocol_name = (protocol.findtext('protocol-name') or '').strip()
+            protocols[protocol_name] = {
+                'routes': _count(protocol, 'protocol-route-count'),
+                'active': _count(protocol, 'active-route-count'),
+            }
+        tables[name] = {
+            'destinations': _count(table, 'destination-count'),
+            'routes': _count(table, 'total-route-count'),
+            'active': _count(table, 'active-route-count'),
+            'hidden': _count(table, 'hidden-route-count'),
+            'protocols': protocols,
+        }
+    return tables
+
+def fetch_table_counts(dev: Device, tables: List[str]) -> Dict[str, Dict]:
+    """Return per-table counts for tables from one get-route-summary-information RPC."""
+    summary = parse_route_summary(dev.rpc.get_route_summary_information())
+    empty = {'destinations': 0, 'routes': 0, 'active': 0, 'hidden': 0, 'protocols': {}}
+    return {table: summary.get(table, dict(empty)) for table in tables}
+
+def table_routes(dev: Device, table: str, username: Optional[str] = None,
+                 password: Optional[str] = None) -> Iterator[Route]:
+    """
+    Return the routes of one table.
+
+    The table is streamed when credentials are given and fetched with get-route-information otherwise.
+    """
+    if username is not None:
+        return stream_routes(dev.hostname, username, password, table)
+    return iter_routes_from_tree(dev.rpc.get_route_information(table=table), table)
+
+def snapshot_table(dev: Device, table: str, username: Optional[str] = None,
+                   password: Optional[str] = None) -> Dict:
+    """
+    Snapshot one table, store it and compare it with the previous snapshots of the device.
+
+    Returns:
+        Dict: Counts as from fetch_table_counts plus 'added', 'removed', 'changed' and
+              'flapped' prefix counts.
+    """
+    snapshot = RouteSnapshot.from_routes(dev.hostname, table, table_routes(dev, table, username, password))
+    changes = get_snapshot_store().record(snapshot)
+    return dict(changes, destinations=snapshot.destinations, routes=snapshot.routes,
+                active=snapshot.active, protocols={})
+
+def measure_route_collection(dev: Device, tables: Optional[List[str]] = None, username: Optional[str] = None,
+                             password: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Measure reply bytes, Python-side peak allocation, process RSS growth and time for the summary and full paths.
+
+    The summary and streaming paths are measured first because the process RSS high-water mark
+    never goes down. Streaming is only measured when credentials are given; it reports the
+    number of routes read instead of reply bytes, which never exist as one document.
+    """
+    tables = tables or DEFAULT_TABLES
+    measurements = {}
+    modes = ['summary'] + (['stream'] if username is not None else []) + ['full']
+    for mode in modes:
+        if mode == 'stream':
+            tracemalloc.start()
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.time()
+            routes = sum(count_routes(stream_routes(dev.hostname, username, password, table))['routes']
+                         for table in tables)
+            elapsed = time.time() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measurements[mode] = {
+                'bytes': None,
+                'routes': routes,
+                'python_peak_kb': peak // 1024,
+                'rss_growth_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+                'seconds': round(elapsed, 3),
+            }
+            continue
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        start = time.time()
+        if mode == 'summary':
+            replies = [dev.rpc.get_route_summary_information()]
+        else:
+            replies = [dev.rpc.get_route_information(table=table) for table in tables]
+        elapsed = time.time() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        measurements[mode] = {
+            'bytes': sum(len(etree.tostring(reply)) for reply in replies),
+            'python_peak_kb': peak // 1024,
+            'rss_growth_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+            'seconds': round(elapsed, 3),
+        }
+        del replies
+    logger.info(f"Route collection measurement for {dev.hostname}: {measurements}")
+    return measurements
+
+def update_prefix_index(hosts: List[str], tables: List[str], path: str = DEFAULT_INDEX_FILE) -> PrefixIndex:
+    """Rebuild the prefix index from the latest snapshot of every device and table and save it."""
+    store = get_snapshot_store()
+    snapshots = (store.latest(host, table) for host in hosts for table in tables)
+    index = build_index(s for s in snapshots if s is not None)
+    index.save(path)
+    logger.info(f"Prefix index with {len(index)} prefixes saved to {path}")
+    return index
+
+def prefix_report(index: PrefixIndex, hosts: List[str], tables: List[str], prefix: str,
+                  host_lookup: Dict[str, str]) -> str:
+    """
+    Return report lines for one address or prefix.
+
+    Lists the most specific route covering prefix on each device, from the prefix index, and
+    the routes inside prefix added, removed or changed since each table's previous snapshot.
+    """
+    covering = index.devices_covering(prefix)
+    report = f"\nRoutes for {prefix} (most specific covering route per device):\n"
+    for host in hosts:
+        report += f"  {host_lookup.get(host, host):<15} {covering.get(host, 'no covering route')}\n"
+    report += f"\nChanges under {prefix} since the previous snapshot:\n"
+    store = get_snapshot_store()
+    changed = False
+    for host in hosts:
+        for table in tables:
+            snapshots = store.recent(host, table, count=2)
+            if len(snapshots) < 2:
+                continue
+            changes = changes_under(snapshots[0], snapshots[1], prefix)
+            for change in ('added', 'removed', 'changed'):
+                if changes[change]:
+                    changed = True
+                    report += (f"  {host_lookup.get(host, host):<15} {table:<10} {change:<8} "
+                               f"{', '.join(sorted(changes[change]))}\n")
+    if not changed:
+        report += "  none\n"
+    return report
+
+@register_job('route_monitor')
+def collect_route_summary(dev: Device, host_lookup: Dict[str, str], tables: Optional[List[str]] = None,
+                          full: bool = False, username: Optional[str] = None, password: Optional[str] = None) -> Dict:
+    """Collect route and protocol counts from one device."""
+    hostname = host_lookup.get(dev.hostname, dev.hostname)
+    tables = tables or DEFAULT_TABLES
+
+    # Protocol counts plus per-table counts from the route summary, or snapshots of the full
+    # tables when diffing, fetched as one batch over a few sessions
+    calls = {
+        'bgp': lambda d: d.rpc.get_bgp_summary_information(),
+        'ospf': lambda d: d.rpc.get_ospf_neighbor_information(),
+        'ldp': lambda d: d.rpc.get_ldp_session_information(),
+    }
+    if full:
+        for table in tables:
+            calls[f"table:{table}"] = lambda d, table=table: snapshot_table(d, table, username, password)
+    else:
+        calls['summary'] = lambda d: fetch_table_counts(d, tables)
+    replies = run_batch(dev, calls, username, password)
+    if full:
+        table_counts = {table: replies[f"table:{table}"] for table in tables}
+    else:
+        table_counts = replies['summary']
+
+    bgp_count = len(replies['bgp'].xpath('.//bgp-peer'))
+    ospf_count = len(replies['ospf'].xpath('.//ospf-neighbor'))
+    ldp_count = len(replies['ldp'].xpath('.//ldp-session'))
+
+    for table, counts in table_counts.items():
+        print(f"Fetched {counts['destinations']} routes from {hostname} ({dev.hostname}) for table {table}")
+
+    return {
+        'host': hostname,
+        'bgp': bgp_count,
+        'ospf': ospf_count,
+        'ldp': ldp_count,
+        'mpls': table_counts.get('mpls.0', {}).get('destinations', 0),
+        'tables': table_counts,
+        # Route changes are only known when full tables were snapshotted
+        'added': sum(c['added'] for c in table_counts.values()) if full else '-',
+        'removed': sum(c['removed'] for c in table_counts.values()) if full else '-',
+        'flapped': sum(c['flapped'] for c in table_counts.values()) if full else '-'
+    }
+
+def print_poll(entry: Dict) -> None:
+    """Print one line for a completed device poll."""
+    print(f"{datetime.now().isoformat(timespec='seconds')} {entry['host']:<15} BGP {entry['bgp']} "
+          f"OSPF {entry['ospf']} LDP {entry['ldp']} MPLS {entry['mpls']} "
+          f"Added {entry['added']} Removed {entry['removed']} Flapped {entry['flapped']}")
+
+def poll_routes(
+    connections: List[Device],
+    host_lookup: Dict[str, str],
+    tables: List[str],
+    interval: int,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    diff: bool = False,
+    max_cycles: Optional[int] = None,
+    on_result: Optional[Callable[[Device, Dict], None]] = None
+) -> Dict[str, int]:
+    """
+    Poll route and protocol counts from every device each interval until interrupted.
+
+    Polls are staggered across the interval and a device still busy with its previous poll
+    skips a cycle (see DevicePoller).
+    """
+    def _on_result(dev: Device, entry: Dict) -> None:
+        print_poll(entry)
+        get_metrics_store().append(dev.hostname, route_metrics(entry))
+        if on_result:
+            on_result(dev, entry)
+
+    def _on_error(dev: Device, error: BaseException) -> None:
+        print(f"Failed to poll routes from {host_lookup.get(dev.hostname, dev.hostname)} ({dev.hostname}): {error}")
+
+    poller = DevicePoller(
+        connections,
+        lambda dev: collect_route_summary(dev, host_lookup, tables, diff, username=username, password=password),
+        interval,
+        on_result=_on_result,
+        on_error=_on_error
+    )
+    print(f"Polling {len(connections)} device(s) every {interval} seconds for tables {', '.join(tables)}. "
+          f"Press Ctrl+C to stop.")
+    try:
+        stats = poller.run(max_cycles=max_cycles)
+    except KeyboardInterrupt:
+        poller.stop()
+        stats = poller.stats
+        print("\nRoute polling stopped by user.")
+    if diff:
+        update_prefix_index([dev.hostname for dev in connections], tables)
+    print(f"Polls completed: {stats['polled']}, failed: {stats['failed']}, skipped (overlap): {stats['skipped']}")
+    return stats
+
 def monitor_routes(
     username: str,
     password: str,
@@ -14,9 +284,25 @@ def monitor_routes(
     hosts: List[Dict],
     connect_to_hosts: Callable,  # Expecting the function as an argument
     disconnect_from_hosts: Callable,  # Expecting the function as an argument
-    connections: List[Device] = None
+    connections: List[Device] = None,
+    tables: Optional[List[str]] = None,
+    diff: bool = False,
+    measure: bool = False,
+    continuous: bool = False,
+    interval: Optional[int] = None,
+    prefix: Optional[str] = None
 ):
-    """Monitor routing tables on devices and generate a summary report."""
+    """Monitor routing tables on devices and generate a summary report.
+
+    Counts come from get-route-summary-information; full tables are only fetched when diff is
+    set, in which case each table is snapshotted under reports/route_snapshots and the
+    Added/Removed/Flapped columns are filled from the previous snapshots. With measure set,
+    bytes transferred and peak memory of each collection path are added to the report. With
+    prefix set as well as diff, the report traces that address or prefix across the devices.
+
+    Tables and interval default to hosts_data.yml. With continuous set, devices are polled
+    every interval seconds until interrupted instead of producing a one-shot report.
+    """
     logger.info("Starting monitor_routes")
     report_dir = os.path.join(os.path.dirname(__file__), '../reports')
     os.makedirs(report_dir, exist_ok=True)
@@ -40,48 +326,27 @@ def monitor_routes(
             return
 
         host_lookup = {h['ip_address']: h['host_name'] for h in hosts}
-        summary = []
+        settings = monitor_settings(DEFAULT_INTERVAL, DEFAULT_TABLES)
+        tables = tables or settings['tables']
 
+        if continuous:
+            poll_routes(connections, host_lookup, tables, interval or settings['interval'],
+                        username=username, password=password, diff=diff)
+            return
+
+        # Collect from all devices concurrently through the async engine
+        summary = []
+        results = run_job(connections, collect_route_summary, host_lookup, tables, diff,
+                          username=username, password=password)
         for dev in connections:
             hostname = host_lookup.get(dev.hostname, dev.hostname)
-            try:
-                # Fetch routing tables (XML by default)
-                inet0_routes = dev.rpc.get_route_information(table='inet.0')
-                inet3_routes = dev.rpc.get_route_information(table='inet.3')
-                mpls_routes = dev.rpc.get_route_information(table='mpls.0')
-
-                # Parse route counts
-                inet0_count = len(inet0_routes.xpath('.//rt'))
-                inet3_count = len(inet3_routes.xpath('.//rt'))
-                mpls_count = len(mpls_routes.xpath('.//rt'))
-
-                # Fetch protocol-specific counts
-                bgp_summary = dev.rpc.get_bgp_summary_information()
-                ospf_neighbors = dev.rpc.get_ospf_neighbor_information()
-                ldp_sessions = dev.rpc.get_ldp_session_information()
-
-                bgp_count = len(bgp_summary.xpath('.//bgp-peer'))
-                ospf_count = len(ospf_neighbors.xpath('.//ospf-neighbor'))
-                ldp_count = len(ldp_sessions.xpath('.//ldp-session'))
-
-                summary.append({
-                    'host': hostname,
-                    'bgp': bgp_count,
-                    'ospf': ospf_count,
-                    'ldp': ldp_count,
-                    'mpls': mpls_count,
-                    'added': 0,  # Placeholder, update with actual logic
-                    'removed': 0,
-                    'flapped': 0
-                })
-
-                print(f"Fetched {inet0_count} routes from {hostname} ({dev.hostname}) for table inet.0")
-                print(f"Fetched {inet3_count} routes from {hostname} ({dev.hostname}) for table inet.3")
-                print(f"Fetched {mpls_count} routes from {hostname} ({dev.hostname}) for table mpls.0")
-
-            except Exception as e:
-                logger.error(f"Failed to fetch routes from {hostname} ({dev.hostname}): {e}")
-                print(f"Failed to fetch routes from {hostname} ({dev.hostname}): {e}")
+            result = results.get(dev.hostname)
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to fetch routes from {hostname} ({dev.hostname}): {result}")
+                print(f"Failed to fetch routes from {hostname} ({dev.hostname}): {result}")
+                continue
+            summary.append(result)
+            get_metrics_store().append(dev.hostname, route_metrics(result))
 
         # Generate report
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -91,6 +356,34 @@ def monitor_routes(
         for entry in summary:
             report += f"| {entry['host']:<13} | {entry['bgp']:<6} | {entry['ospf']:<6} | {entry['ldp']:<6} | {entry['mpls']:<6} | {entry['added']:<5} | {entry['removed']:<7} | {entry['flapped']:<7} |\n"
         report += "-" * 80 + "\n"
+        report += "\nRoute tables (destinations; routes per protocol):\n"
+        for entry in summary:
+            for table, counts in entry['tables'].items():
+                protocols = ", ".join(f"{name} {c['routes']}" for name, c in sorted(counts['protocols'].items()))
+                changes = f"  +{counts['added']} -{counts['removed']} ~{counts['changed']} flapped {counts['flapped']}" \
+                    if 'added' in counts else ''
+                report += f"  {entry['host']:<15} {table:<10} {counts['destinations']:>9}  {protocols}{changes}\n"
+
+        if measure:
+            report += "\nCollection cost (summary vs full tables):\n"
+            for dev in connections:
+                hostname = host_lookup.get(dev.hostname, dev.hostname)
+                try:
+                    m = measure_route_collection(dev, tables, username, password)
+                except Exception as e:
+                    logger.error(f"Measurement failed on {hostname}: {e}")
+                    continue
+                for mode, values in m.items():
+                    size = f"{values['bytes']} bytes" if values['bytes'] is not None else f"{values['routes']} routes"
+                    report += (f"  {hostname:<15} {mode:<8} {size:>18}  "
+                               f"python peak {values['python_peak_kb']:>8} KB  "
+                               f"rss growth {values['rss_growth_kb']:>8} KB  {values['seconds']:>8}s\n")
+
+        if diff:
+            index = update_prefix_index([dev.hostname for dev in connections], tables)
+            report += f"\nPrefix index: {len(index)} prefixes from {len(index.devices)} device(s) in {DEFAULT_INDEX_FILE}\n"
+            if prefix:
+                report += prefix_report(index, [dev.hostname for dev in connections], tables, prefix, host_lookup)
 
         report_file = os.path.join(report_dir, f"route_monitor_{timestamp}.txt")
         with open(report_file, 'w') as f:
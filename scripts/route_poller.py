@@ -0,0 +1,107 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from jnpr.junos import Device
+
+logger = logging.getLogger(__name__)
+
+# Poller defaults
+DEFAULT_JITTER = 0.2  # Fraction of a device's stagger slot its polls may move either way
+DEFAULT_MAX_WORKERS = 16
+
+class DevicePoller:
+    """
+    Polls every device once per interval on a drift-free schedule.
+
+    Device i is polled at start + offset_i + k * interval, where the offsets spread the devices
+    evenly over the interval and each poll is moved by a random jitter of up to jitter times the
+    slot width. Jitter never accumulates because every poll is placed on the fixed grid. A device
+    whose previous poll is still running skips that cycle instead of queueing a second poll.
+    """
+
+    def __init__(
+        self,
+        connections: List[Device],
+        poll: Callable[[Device], Any],
+        interval: float,
+        jitter: float = DEFAULT_JITTER,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        on_result: Optional[Callable[[Device, Any], None]] = None,
+        on_error: Optional[Callable[[Device, BaseException], None]] = None
+    ):
+        self.connections = list(connections)
+        self.poll = poll
+        self.interval = interval
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self.on_result = on_result
+        self.on_error = on_error
+        self.stop_event = threading.Event()
+        self.stats = {'polled': 0, 'failed': 0, 'skipped': 0}
+        self._running: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def _due(self, start: float, i: int, cycle: int) -> float:
+        """Return when device i is due in cycle, on the fixed grid plus a fresh jitter."""
+        slot = self.interval / max(1, len(self.connections))
+        jitter = random.uniform(-self.jitter, self.jitter) * slot if self.jitter else 0.0
+        return start + i * slot + cycle * self.interval + jitter
+
+    def _run_poll(self, dev: Device) -> None:
+        try:
+            result = self.poll(dev)
+        except BaseException as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            logger.error(f"Poll of {dev.hostname} failed: {e}")
+            if self.on_error:
+                self.on_error(dev, e)
+        else:
+            with self._lock:
+                self.stats['polled'] += 1
+            if self.on_result:
+                self.on_result(dev, result)
+        finally:
+            with self._lock:
+                self._running[dev.hostname] = False
+
+    def run(self, max_cycles: Optional[int] = None) -> Dict[str, int]:
+        """Poll until stop() is called or every device has had max_cycles scheduled polls."""
+        if not self.connections:
+            return self.stats
+        start = time.monotonic()
+        schedule = [(self._due(start, i, 0), i, 0) for i in range(len(self.connections))]
+        heapq.heapify(schedule)
+        logger.info(f"Polling {len(self.connections)} device(s) every {self.interval}s")
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.connections))),
+                                thread_name_prefix='poll') as executor:
+            while schedule and not self.stop_event.is_set():
+                due, i, cycle = schedule[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self.stop_event.wait(wait)
+                    continue
+                heapq.heappop(schedule)
+                dev = self.connections[i]
+                with self._lock:
+                    busy = self._running.get(dev.hostname, False)
+                    if busy:
+                        self.stats['skipped'] += 1
+                    else:
+                        self._running[dev.hostname] = True
+                if busy:
+                    logger.warning(f"Previous poll of {dev.hostname} still running; skipping cycle {cycle}")
+                else:
+                    executor.submit(self._run_poll, dev)
+                if max_cycles is None or cycle + 1 < max_cycles:
+                    heapq.heappush(schedule, (self._due(start, i, cycle + 1), i, cycle + 1))
+        logger.info(f"Polling stopped: {self.stats}")
+        return self.stats
+
+    def stop(self) -> None:
+        self.stop_event.set()
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from scripts.route_stream import Route
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), '../reports/route_snapshots')
+DEFAULT_FLAP_WINDOW = 6  # Snapshots per device and table kept on disk and used for flap detection
+DEFAULT_FLAP_TRANSITIONS = 2  # Changes within the window that make a prefix count as flapping
+
+_MAGIC = b'RSN1'
+_HEADER = struct.Struct('<4sdIIII')
+
+def _route_hash(entries: List[Route]) -> int:
+    """Return a 64-bit hash of the entries of one destination, ignoring their age."""
+    digest = hashlib.blake2b(digest_size=8)
+    for route in entries:
+        digest.update(f"{route.protocol}|{route.next_hop}|{route.preference}|{route.as_path}|{route.active}\n".encode())
+    return int.from_bytes(digest.digest(), 'little')
+
+class RouteSnapshot:
+    """
+    Route table of one device at one point in time, reduced to prefix -> hash of its entries.
+
+    Prefixes and hashes are kept in parallel lists so a snapshot packs into one compressed blob.
+    """
+
+    def __init__(self, host: str, table: str, timestamp: Optional[float] = None):
+        self.host = host
+        self.table = table
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.prefixes: List[str] = []
+        self.hashes = array('Q')
+        self.routes = 0
+        self.active = 0
+
+    @classmethod
+    def from_routes(cls, host: str, table: str, routes: Iterable[Route],
+                    timestamp: Optional[float] = None) -> 'RouteSnapshot':
+        """Build a snapshot from a route stream in one pass."""
+        snapshot = cls(host, table, timestamp)
+        entries: List[Route] = []
+        for route in routes:
+            snapshot.routes += 1
+            snapshot.active += route.active
+            # Entries of one destination arrive together
+            if entries and route.prefix != entries[0].prefix:
+                snapshot.prefixes.append(entries[0].prefix)
+                snapshot.hashes.append(_route_hash(entries))
+                entries = []
+            entries.append(route)
+        if entries:
+            snapshot.prefixes.append(entries[0].prefix)
+            snapshot.hashes.append(_route_hash(entries))
+        return snapshot
+
+    @property
+    def destinations(self) -> int:
+        return len(self.prefixes)
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return prefix -> entry hash."""
+        return dict(zip(self.prefixes, self.hashes))
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a zlib-compressed little-endian blob."""
+        prefixes = '\n'.join(self.prefixes).encode('utf-8')
+        hashes = self.hashes
+        if sys.byteorder != 'little':
+            hashes = array('Q', hashes)
+            hashes.byteswap()
+        header = _HEADER.pack(_MAGIC, self.timestamp, len(self.prefixes), self.routes, self.active, len(prefixes))
+        return zlib.compress(header + prefixes + hashes.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, host: str, table: str) -> 'RouteSnapshot':
+        data = zlib.decompress(blob)
+        magic, timestamp, count, routes, active, prefixes_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a route snapshot file")
+        snapshot = cls(host, table, timestamp)
+        snapshot.routes = routes
+        snapshot.active = active
+        offset = _HEADER.size
+        text = data[offset:offset + prefixes_len].decode('utf-8')
+        snapshot.prefixes = text.split('\n') if count else []
+        offset += prefixes_len
+        snapshot.hashes.frombytes(data[offset:offset + 8 * count])
+        if sys.byteorder != 'little':
+            snapshot.hashes.byteswap()
+        return snapshot
+
+def diff_snapshots(previous: RouteSnapshot, current: RouteSnapshot) -> Dict[str, Set[str]]:
+    """
+    Return the prefixes added, removed and changed (same prefix, different entries) between two snapshots.
+
+    Runs in linear time using dict and set operations.
+    """
+    before = previous.as_dict()
+    after = current.as_dict()
+    before_keys = before.keys()
+    after_keys = after.keys()
+    return {
+        'added': set(after_keys - before_keys),
+        'removed': set(before_keys - after_keys),
+        'changed': {p for p in after_keys & before_keys if after[p] != before[p]},
+    }
+
+def find_flaps(changes: Iterable[Set[str]], min_transitions: int = DEFAULT_FLAP_TRANSITIONS) -> Dict[str, int]:
+    """
+    Return the prefixes that changed at least min_transitions times across a window of polls.
+
+    changes holds the prefixes added, removed or changed in each poll (see diff_snapshots),
+    so a route withdrawn and re-advertised within the window counts as two transitions.
+    """
+    transitions: Counter = Counter()
+    for changed in changes:
+        transitions.update(changed)
+    return {prefix: n for prefix, n in transitions.items() if n >= min_transitions}
+
+class SnapshotStore:
+    """
+    On-disk store of route snapshots under reports/, one file per device, table and poll.
+
+    Only the last window snapshots per device and table are kept on disk. In memory the store
+    keeps the latest snapshot and the prefixes that changed in each poll of the window, so a
+    long-running monitor diffs each poll only against the one before it.
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, window: int = DEFAULT_FLAP_WINDOW,
+                 min_transitions: int = DEFAULT_FLAP_TRANSITIONS):
+        self.root = root
+        self.window = window
+        self.min_transitions = min_transitions
+        self._lock = threading.Lock()
+        self._latest: Dict[Tuple[str, str], RouteSnapshot] = {}
+        self._changes: Dict[Tuple[str, str], Deque[Set[str]]] = {}
+
+    def _dir(self, host: str, table: str) -> str:
+        safe = lambda name: re.sub(r'[^\w.\-]', '_', name)
+        return os.path.join(self.root, safe(host), safe(table))
+
+    def _files(self, host: str, table: str) -> List[str]:
+        """Return snapshot files for a device and table, oldest first."""
+        directory = self._dir(host, table)
+        try:
+            names = sorted(n for n in os.listdir(directory) if n.endswith('.snap'))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, n) for n in names]
+
+    def recent(self, host: str, table: str, count: Optional[int] = None) -> List[RouteSnapshot]:
+        """Read the last count (default: the window) stored snapshots for a device and table, oldest first."""
+        snapshots = []
+        for path in self._files(host, table)[-min(count or self.window, self.window):]:
+            try:
+                with open(path, 'rb') as f:
+                    snapshots.append(RouteSnapshot.from_bytes(f.read(), host, table))
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable route snapshot {path}: {e}")
+        return snapshots
+
+    def save(self, snapshot: RouteSnapshot) -> str:
+        """Write a snapshot atomically, drop ones outside the window and return the file path."""
+        directory = self._dir(snapshot.host, snapshot.table)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{int(snapshot.timestamp * 1000):015d}.snap")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(snapshot.to_bytes())
+        os.replace(tmp_path, path)
+        for old in self._files(snapshot.host, snapshot.table)[:-self.window]:
+            os.remove(old)
+        return path
+
+    def _history(self, key: Tuple[str, str]) -> Tuple[Optional[RouteSnapshot], Deque[Set[str]]]:
+        """Return the latest snapshot and per-poll change sets, loading them from disk on first use."""
+        with self._lock:
+            if key in self._latest:
+                return self._latest[key], self._changes[key]
+        stored = self.recent(*key)
+        changes = deque((set().union(*diff_snapshots(a, b).values()) for a, b in zip(stored, stored[1:])),
+                        maxlen=max(1, self.window - 1))
+        return (stored[-1] if stored else None), changes
+
+    def latest(self, host: str, table: str) -> Optional[RouteSnapshot]:
+        """Return the most recent snapshot of a device and table, or None."""
+        return self._history((host, table))[0]
+
+    def record(self, snapshot: RouteSnapshot) -> Dict[str, int]:
+        """
+        Save a snapshot and compare it with the previous one and the flap window.
+
+        Returns:
+            Dict[str, int]: 'added', 'removed', 'changed' and 'flapped' prefix counts; all zero
+                            for the first snapshot of a device and table.
+        """
+        key = (snapshot.host, snapshot.table)
+        previous, changes = self._history(key)
+        self.save(snapshot)
+        result = {'added': 0, 'removed': 0, 'changed': 0, 'flapped': 0}
+        if previous is not None:
+            diff = diff_snapshots(previous, snapshot)
+            changes.append(set().union(*diff.values()))
+            result = {
+                'added': len(diff['added']),
+                'removed': len(diff['removed']),
+                'changed': len(diff['changed']),
+                'flapped': len(find_flaps(changes, self.min_transitions)),
+            }
+        with self._lock:
+            self._latest[key] = snapshot
+            self._changes[key] = changes
+        return result
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    """Return the snapshot store shared by the process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
@@ -0,0 +1,197 @@
+import logging
+import socket
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+import paramiko
+from lxml import etree
+
+from scripts.utils import HOSTS_DATA_FILE, load_yaml_file
+
+logger = logging.getLogger(__name__)
+
+# Streaming defaults
+DEFAULT_SSH_PORT = 22
+DEFAULT_STREAM_TIMEOUT = 300  # Seconds without data before a stream is abandoned
+_CHUNK_SIZE = 64 * 1024
+
+class Route(NamedTuple):
+    """One route entry from a route table."""
+    table: str
+    prefix: str
+    protocol: str
+    next_hop: str
+    age: int  # Seconds since the route was learned, -1 if unknown
+    active: bool
+    preference: str
+    as_path: str
+
+def _local(tag) -> str:
+    """Return an element tag without its namespace."""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+def _child_text(element, name: str) -> str:
+    """Return the stripped text of the first child named name, ignoring namespaces."""
+    for child in element:
+        if _local(child.tag) == name:
+            return (child.text or '').strip()
+    return ''
+
+def _age_seconds(entry) -> int:
+    """Return the age of an rt-entry in seconds, from the junos:seconds attribute when present."""
+    for child in entry:
+        if _local(child.tag) == 'age':
+            for key, value in child.attrib.items():
+                if key.rsplit('}', 1)[-1] == 'seconds':
+                    try:
+                        return int(value)
+                    except ValueError:
+                        break
+            return -1
+    return -1
+
+def _next_hop(entry) -> str:
+    """Return the selected (or first) next hop of an rt-entry as 'to via', or the route type for local routes."""
+    first = None
+    for nh in entry:
+        if _local(nh.tag) != 'nh':
+            continue
+        hop = ' '.join(v for v in (_child_text(nh, 'to'), _child_text(nh, 'via'), _child_text(nh, 'nh-local-interface')) if v)
+        if first is None:
+            first = hop
+        if any(_local(c.tag) == 'selected-next-hop' for c in nh):
+            return hop
+    return first or _child_text(entry, 'nh-type')
+
+def _routes_from_rt(rt, table: str) -> Iterator[Route]:
+    """Yield a Route for every rt-entry below an <rt> element."""
+    prefix = _child_text(rt, 'rt-destination')
+    length = _child_text(rt, 'rt-prefix-length')
+    if length:
+        prefix = f"{prefix}/{length}"
+    for entry in rt:
+        if _local(entry.tag) != 'rt-entry':
+            continue
+        active = _child_text(entry, 'active-tag') == '*' or \
+            any(_local(c.tag) == 'current-active' for c in entry)
+        yield Route(
+            table=table,
+            prefix=prefix,
+            protocol=_child_text(entry, 'protocol-name'),
+            next_hop=_next_hop(entry),
+            age=_age_seconds(entry),
+            active=active,
+            preference=_child_text(entry, 'preference'),
+            as_path=_child_text(entry, 'as-path'),
+        )
+
+def _table_of(rt) -> str:
+    """Return the table name of the route-table an <rt> element belongs to."""
+    parent = rt.getparent()
+    return _child_text(parent, 'table-name') if parent is not None else ''
+
+def _clear(element) -> None:
+    """Free a processed <rt> element and the already processed <rt> siblings before it."""
+    element.clear()
+    parent = element.getparent()
+    if parent is None:
+        return
+    # Keep the table header (table-name etc.) that precedes the routes
+    previous = element.getprevious()
+    while previous is not None and _local(previous.tag) == 'rt':
+        parent.remove(previous)
+        previous = element.getprevious()
+
+def _drain(parser, default_table: str) -> Iterator[Route]:
+    """Yield the routes of every <rt> element the parser has completed so far."""
+    for _, rt in parser.read_events():
+        yield from _routes_from_rt(rt, _table_of(rt) or default_table)
+        _clear(rt)
+
+def iter_routes_from_tree(reply, table: str = '') -> Iterator[Route]:
+    """Yield routes from an already parsed get-route-information reply."""
+    for rt in reply.iter('{*}rt'):
+        yield from _routes_from_rt(rt, _table_of(rt) or table)
+
+def iter_routes_from_chunks(chunks: Iterable[bytes], table: str = '') -> Iterator[Route]:
+    """Stream routes from an XML reply that arrives in chunks."""
+    parser = etree.XMLPullParser(events=('end',), tag='{*}rt', huge_tree=True)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _drain(parser, table)
+    parser.close()
+    yield from _drain(parser, table)
+
+def accept_unknown_host_keys() -> bool:
+    """Return True if hosts_data.yml opts in to trusting SSH host keys not in known_hosts."""
+    hosts_data = load_yaml_file(HOSTS_DATA_FILE) or {}
+    return bool(hosts_data.get('accept_unknown_host_keys', False))
+
+def _ssh_chunks(channel: paramiko.Channel) -> Iterator[bytes]:
+    """Yield stdout of an exec channel until the command finishes."""
+    while True:
+        chunk = channel.recv(_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def stream_routes(
+    host: str,
+    username: str,
+    password: str,
+    table: str,
+    port: int = DEFAULT_SSH_PORT,
+    timeout: int = DEFAULT_STREAM_TIMEOUT,
+    accept_unknown_keys: Optional[bool] = None
+) -> Iterator[Route]:
+    """
+    Stream the routes of one table from a device without materializing the reply.
+
+    The table is read with 'show route table <table> | display xml' over an SSH exec channel
+    and parsed incrementally as bytes arrive. The NETCONF session is not used, because PyEZ
+    RPCs always build the complete reply tree.
+
+    The device's host key must be in ~/.ssh/known_hosts. Unknown keys are
+    rejected unless accept_unknown_keys is set (default: 'accept_unknown_host_keys' in
+    hosts_data.yml).
+    """
+    if accept_unknown_keys is None:
+        accept_unknown_keys = accept_unknown_host_keys()
+    client = paramiko.SSHClient()
+    client.load_system_host_keys()
+    if accept_unknown_keys:
+        logger.warning(f"Trusting the SSH host key of {host} even if it is unknown (accept_unknown_host_keys is set)")
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    else:
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+    try:
+        client.connect(host, port=port, username=username, password=password, timeout=timeout,
+                       allow_agent=False, look_for_keys=False)
+        channel = client.get_transport().open_session()
+        channel.settimeout(timeout)
+        channel.exec_command(f"show route table {table} | display xml")
+        count = 0
+        for route in iter_routes_from_chunks(_ssh_chunks(channel), table):
+            count += 1
+            yield route
+        status = channel.recv_exit_status()
+        if status:
+            error = channel.recv_stderr(_CHUNK_SIZE).decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"show route table {table} on {host} exited with {status}: {error}")
+        logger.info(f"Streamed {count} route(s) from {host} table {table}")
+    except socket.timeout as e:
+        raise TimeoutError(f"No route data from {host} table {table} within {timeout} seconds") from e
+    finally:
+        client.close()
+
+def count_routes(routes: Iterable[Route]) -> Dict[str, int]:
+    """Count destinations, route entries and active entries of a route stream."""
+    counts = {'destinations': 0, 'routes': 0, 'active': 0}
+    last_prefix: Optional[str] = None
+    for route in routes:
+        counts['routes'] += 1
+        counts['active'] += route.active
+        # Entries of one destination arrive together
+        if route.prefix != last_prefix:
+            counts['destinations'] += 1
+            last_prefix = route.prefix
+    return counts
@@ -0,0 +1,73 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from jnpr.junos import Device
+
+from scripts.connection_pool import DeviceSessions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SESSIONS = 3  # Sessions per device used for one batch, including the caller's
+
+def run_batch(
+    dev: Device,
+    calls: Dict[str, Callable[[Device], Any]],
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    max_sessions: int = DEFAULT_BATCH_SESSIONS,
+    raise_errors: bool = True
+) -> Dict[str, Any]:
+    """
+    Run a set of RPCs against one device concurrently and return all replies together.
+
+    A NETCONF session handles one RPC at a time, so the calls are spread over up to max_sessions
+    sessions: dev itself plus extra ones checked out of the shared connection pool when
+    credentials are given. Without credentials, or when the pool has no spare session, the calls
+    share dev and run one after another. Per-device latency drops from the sum of the round
+    trips to roughly the slowest one.
+
+    Args:
+        dev: Open device; always used for at least one call.
+        calls: Name -> callable taking a Device, e.g. lambda d: d.rpc.get_bgp_summary_information().
+        username: Login username used to open extra sessions.
+        password: Login password used to open extra sessions.
+        max_sessions: Maximum sessions to the device used at once.
+        raise_errors: Re-raise the first failure once every call has finished; otherwise failed
+                      calls map to their exception.
+
+    Returns:
+        Dict[str, Any]: Reply (or exception) per call name.
+    """
+    if not calls:
+        return {}
+    width = max(1, min(max_sessions, len(calls)))
+    sessions = DeviceSessions(dev, width, username, password)
+
+    def _call(item: Tuple[str, Callable[[Device], Any]]) -> Tuple[str, Any]:
+        name, call = item
+        session = sessions.checkout()
+        try:
+            return name, call(session)
+        except Exception as e:
+            return name, e
+        finally:
+            sessions.checkin(session)
+
+    start = time.time()
+    try:
+        if width == 1:
+            results = dict(_call(item) for item in calls.items())
+        else:
+            with ThreadPoolExecutor(max_workers=width, thread_name_prefix='batch') as executor:
+                results = dict(executor.map(_call, calls.items()))
+    finally:
+        sessions.release_extra()
+    logger.info(f"Batch of {len(calls)} call(s) on {dev.hostname} over {sessions.opened} session(s) "
+                f"in {time.time() - start:.2f}s")
+    if raise_errors:
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                raise result
+    return results
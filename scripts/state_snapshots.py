@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from jnpr.junos import Device
+
+from scripts.device_state import SECTIONS, capture_fleet_state, diff_states
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(__file__), '../reports/state_store')
+
+class StateStore:
+    """
+    Content-addressed, compressed store of fleet state snapshots.
+
+    Each section of each device's state is serialized canonically, hashed with SHA-256 and
+    written once as a zlib-compressed object, so identical sections (the same BGP peers before
+    and after a change, identical interface sets across a fleet of one model) are stored once.
+    A snapshot is a small manifest mapping device -> section -> object hash.
+    """
+
+    def __init__(self, root: str = DEFAULT_STATE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self._cache: Dict[str, object] = {}
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.z")
+
+    def put_object(self, value: object) -> str:
+        """Store a JSON-serializable value if it is new and return its hash."""
+        data = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, path)
+        return digest
+
+    def get_object(self, digest: str) -> object:
+        if digest not in self._cache:
+            with open(self._object_path(digest), 'rb') as f:
+                self._cache[digest] = json.loads(zlib.decompress(f.read()))
+        return self._cache[digest]
+
+    def save_snapshot(self, label: str, states: Dict[str, Dict], timestamp: Optional[float] = None) -> str:
+        """Store the states of a fleet and return the snapshot id."""
+        timestamp = time.time() if timestamp is None else timestamp
+        devices = {}
+        for host, state in states.items():
+            entry = {section: self.put_object(state[section]) for section in SECTIONS if section in state}
+            for key in ('error', 'errors', 'timings'):
+                if state.get(key):
+                    entry[key] = state[key]
+            devices[host] = entry
+        snapshot_id = f"{datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')}_{label}"
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        path = os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'id': snapshot_id, 'label': label, 'timestamp': timestamp, 'devices': devices}, f,
+                      separators=(',', ':'))
+        os.replace(tmp_path, path)
+        logger.info(f"Saved state snapshot {snapshot_id} for {len(devices)} device(s)")
+        return snapshot_id
+
+    def load_manifest(self, snapshot_id: str) -> Dict:
+        with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), 'r') as f:
+            return json.load(f)
+
+    def load_snapshot(self, snapshot_id: str) -> Dict[str, Dict]:
+        """Return device -> state for a stored snapshot."""
+        states = {}
+        for host, entry in self.load_manifest(snapshot_id)['devices'].items():
+            state = {k: v for k, v in entry.items() if k not in SECTIONS}
+            for section in SECTIONS:
+                if section in entry:
+                    state[section] = self.get_object(entry[section])
+            states[host] = state
+        return states
+
+    def diff_snapshots(self, pre_id: str, post_id: str) -> Dict:
+        """
+        Compare two fleet snapshots.
+
+        Sections with the same hash are skipped without being loaded, so only changed sections are diffed.
+
+        Returns:
+            Dict: 'devices' (host -> diff_states result, only devices with changes), 'missing'
+                  (hosts only in the pre snapshot), 'new' (hosts only in the post snapshot),
+                  'failed' (host -> capture error) and 'unchanged' (count).
+        """
+        pre = self.load_manifest(pre_id)['devices']
+        post = self.load_manifest(post_id)['devices']
+        summary = {
+            'devices': {},
+            'missing': sorted(pre.keys() - post.keys()),
+            'new': sorted(post.keys() - pre.keys()),
+            'failed': {h: e.get('error') for h, e in post.items() if e.get('error')},
+            'unchanged': 0,
+        }
+        for host in sorted(pre.keys() & post.keys()):
+            if host in summary['failed']:
+                continue
+            if pre[host].get('error'):
+                summary['failed'][host] = f"pre snapshot: {pre[host]['error']}"
+                continue
+            changed = [s for s in SECTIONS if pre[host].get(s) != post[host].get(s)]
+            if not changed:
+                summary['unchanged'] += 1
+                continue
+            before = {s: self.get_object(pre[host][s]) for s in changed if s in pre[host]}
+            after = {s: self.get_object(post[host][s]) for s in changed if s in post[host]}
+            differences = diff_states(before, after)
+            if differences:
+                summary['devices'][host] = differences
+            else:
+                summary['unchanged'] += 1
+        return summary
+
+def take_fleet_snapshot(connections: List[Device], label: str, store: Optional[StateStore] = None,
+                        host_lookup: Optional[Dict[str, str]] = None) -> str:
+    """Capture every device concurrently, store the snapshot and return its id."""
+    store = store or StateStore()
+    start = time.time()
+    states = capture_fleet_state(connections, host_lookup=host_lookup)
+    snapshot_id = store.save_snapshot(label, states)
+    print(f"Captured {label} state of {len(states)} device(s) in {time.time() - start:.1f}s ({snapshot_id})")
+    return snapshot_id
+
+def format_fleet_diff(summary: Dict, host_lookup: Optional[Dict[str, str]] = None) -> str:
+    """Return a text report of a fleet snapshot diff."""
+    host_lookup = host_lookup or {}
+    name = lambda host: host_lookup.get(host, host)
+    lines = [f"Devices changed: {len(summary['devices'])}, unchanged: {summary['unchanged']}, "
+             f"failed: {len(summary['failed'])}, missing: {len(summary['missing'])}, new: {len(summary['new'])}"]
+    for section in SECTIONS:
+        affected = [h for h, d in summary['devices'].items() if section in d]
+        if affected:
+            lines.append(f"  {section}: {len(affected)} device(s) changed")
+    for host, differences in sorted(summary['devices'].items()):
+        lines.append(f"\n{name(host)} ({host}):")
+        for section, diff in differences.items():
+            for key in sorted(diff['removed']):
+                lines.append(f"  {section} - {key}")
+            for key in sorted(diff['added']):
+                lines.append(f"  {section} + {key}")
+            for key, fields in sorted(diff['changed'].items()):
+                changes = ', '.join(f"{field} {values[0]} -> {values[1]}" for field, values in sorted(fields.items()))
+                lines.append(f"  {section} ~ {key}: {changes}")
+    for host, error in sorted(summary['failed'].items()):
+        lines.append(f"\n{name(host)} ({host}): capture failed: {error}")
+    for host in summary['missing']:
+        lines.append(f"\n{name(host)} ({host}): missing from post snapshot")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,121 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.dirname(__file__), '../reports')
+JOURNAL_PREFIX = 'upgrade_journal_'
+
+# Phases of a device upgrade, in order; each is recorded once it has completed
+PHASES = ('preflight', 'staged', 'installed', 'rebooting', 'verified')
+
+def next_phase(completed: Optional[str]) -> Optional[str]:
+    """Return the phase that follows completed, or None once the upgrade is verified."""
+    if completed is None:
+        return PHASES[0]
+    index = PHASES.index(completed)
+    return PHASES[index + 1] if index + 1 < len(PHASES) else None
+
+class UpgradeJournal:
+    """
+    Append-only, crash-safe journal of an upgrade run.
+
+    Every record is one JSON line, flushed and fsynced before the call returns, so a phase that
+    the journal shows as completed really completed even if the process dies right after. The
+    first record describes the run (image, target version, hosts); later records mark phase
+    completions and failures per device. A torn last line left by a crash is ignored on load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run: Dict = {}
+        self.phases: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+        self.snapshots: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, run: Dict, directory: str = DEFAULT_JOURNAL_DIR) -> 'UpgradeJournal':
+        """Start a journal for a new run described by run (JSON-serializable, no secrets)."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{JOURNAL_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        journal = cls(path)
+        journal._append({'type': 'run', **run})
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> 'UpgradeJournal':
+        """Replay a journal file into per-device phases, cutting off a torn last record."""
+        journal = cls(path)
+        valid = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logger.warning(f"Dropping torn last record of {path}: {line[:80]!r}")
+                    break
+                valid += len(line)
+                try:
+                    journal._apply(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Ignoring damaged record in {path}: {line[:80]!r}")
+        if valid != os.path.getsize(path):
+            # New records must start on a fresh line
+            os.truncate(path, valid)
+        return journal
+
+    @staticmethod
+    def latest(directory: str = DEFAULT_JOURNAL_DIR) -> Optional[str]:
+        """Return the path of the most recent journal, or None."""
+        paths = sorted(glob.glob(os.path.join(directory, f"{JOURNAL_PREFIX}*.jsonl")))
+        return paths[-1] if paths else None
+
+    def _apply(self, record: Dict) -> None:
+        kind = record.get('type')
+        if kind == 'run':
+            self.run = {k: v for k, v in record.items() if k not in ('type', 'time')}
+        elif kind == 'phase':
+            self.phases[record['host']] = record['phase']
+            self.errors.pop(record['host'], None)
+        elif kind == 'failed':
+            self.errors[record['host']] = record.get('error')
+        elif kind == 'snapshot':
+            self.snapshots[record['label']] = record['id']
+
+    def _append(self, record: Dict) -> None:
+        record = {'time': time.time(), **record}
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def complete(self, host: str, phase: str, **details) -> None:
+        """Record that host completed phase."""
+        if phase not in PHASES:
+            raise ValueError(f"Unknown upgrade phase {phase}")
+        self._append({'type': 'phase', 'host': host, 'phase': phase, **details})
+        logger.info(f"{host}: {phase} completed")
+
+    def fail(self, host: str, error: str) -> None:
+        """Record that host failed after its last completed phase."""
+        self._append({'type': 'failed', 'host': host, 'phase': self.phases.get(host), 'error': error})
+
+    def snapshot(self, label: str, snapshot_id: str) -> None:
+        """Record a fleet state snapshot taken during the run."""
+        self._append({'type': 'snapshot', 'label': label, 'id': snapshot_id})
+
+    def completed(self, host: str) -> Optional[str]:
+        """Return the last phase host completed, or None."""
+        return self.phases.get(host)
+
+    def pending(self) -> List[str]:
+        """Return the hosts of the run that are not verified, in run order."""
+        return [h for h in self.run.get('hosts', []) if self.phases.get(h) != PHASES[-1]]
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from scripts.utils import flatten_inventory, load_yaml_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INVENTORY_FILE = os.path.join(os.path.dirname(__file__), '../data/inventory.yml')
+
+# Rollout defaults, overridden by the 'rollout' section of upgrade_data.yml
+DEFAULT_MAX_IN_FLIGHT = 4  # Devices upgrading at once
+DEFAULT_FAILURE_BUDGET = 1  # Failures tolerated before no new device is started
+
+def load_host_groups(inventory_file: str = DEFAULT_INVENTORY_FILE) -> Dict[str, Dict[str, str]]:
+    """Return IP/hostname -> {'location', 'platform'} from inventory.yml."""
+    inventory = load_yaml_file(inventory_file)
+    groups = {}
+    for host in flatten_inventory(inventory or []):
+        entry = {'location': host.get('location'), 'platform': host.get('platform')}
+        for key in (host.get('ip_address'), host.get('host_name')):
+            if key:
+                groups[key] = entry
+    return groups
+
+def rollout_settings(upgrade_data: Dict) -> Dict:
+    """Return the rollout limits from upgrade_data.yml, falling back to the defaults."""
+    settings = upgrade_data.get('rollout') or {}
+    return {
+        'max_in_flight': int(settings.get('max_in_flight', DEFAULT_MAX_IN_FLIGHT)),
+        'failure_budget': int(settings.get('failure_budget', DEFAULT_FAILURE_BUDGET)),
+        'caps': {group: int(settings[f"per_{group}"]) for group in ('location', 'platform')
+                 if settings.get(f"per_{group}")},
+    }
+
+class RollingUpgrade:
+    """
+    Runs a per-device upgrade concurrently under rollout limits.
+
+    At most max_in_flight devices are upgrading at once, and at most caps[group] devices sharing
+    the same value of an inventory group ('location' or 'platform') so a site or a model is never
+    taken down together. Devices are started in the given order as limits allow. Once more than
+    failure_budget devices have failed, no new device is started; devices already in flight
+    finish, and the rest are reported as not started.
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        upgrade: Callable[[str], Dict],
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        caps: Optional[Dict[str, int]] = None,
+        failure_budget: int = DEFAULT_FAILURE_BUDGET,
+        host_groups: Optional[Dict[str, Dict[str, str]]] = None
+    ):
+        self.hosts = list(hosts)
+        self.upgrade = upgrade
+        self.max_in_flight = max(1, max_in_flight)
+        self.caps = caps or {}
+        self.failure_budget = failure_budget
+        self.host_groups = host_groups or {}
+        self.stop_event = threading.Event()
+
+    def _group(self, host: str, group: str) -> Optional[str]:
+        return self.host_groups.get(host, {}).get(group)
+
+    def _fits(self, host: str, running: List[str]) -> bool:
+        if len(running) >= self.max_in_flight:
+            return False
+        for group, cap in self.caps.items():
+            value = self._group(host, group)
+            if value is not None and sum(1 for h in running if self._group(h, group) == value) >= cap:
+                return False
+        return True
+
+    def _run_one(self, host: str) -> Dict:
+        try:
+            return self.upgrade(host)
+        except Exception as e:
+            logger.error(f"Error upgrading {host}: {e}")
+            return {'hostname': host, 'success': False, 'error': str(e)}
+
+    def run(self) -> List[Dict]:
+        """Upgrade every host and return one status dict per host, in the given order."""
+        pending = list(self.hosts)
+        running: Dict[Future, str] = {}
+        results: Dict[str, Dict] = {}
+        failures = 0
+        start = time.time()
+        logger.info(f"Rolling upgrade of {len(pending)} device(s): max in flight {self.max_in_flight}, "
+                    f"caps {self.caps or 'none'}, failure budget {self.failure_budget}")
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='upgrade') as executor:
+            while pending or running:
+                if failures <= self.failure_budget and not self.stop_event.is_set():
+                    for host in list(pending):
+                        if self._fits(host, list(running.values())):
+                            pending.remove(host)
+                            running[executor.submit(self._run_one, host)] = host
+                            logger.info(f"Started upgrade of {host} ({len(running)} in flight)")
+                            print(f"▶ Starting upgrade of {host} ({len(running)} in flight)")
+                elif pending:
+                    reason = "failure budget exceeded" if failures > self.failure_budget else "rollout stopped"
+                    logger.warning(f"Not starting {len(pending)} device(s): {reason}")
+                    print(f"⚠️ Not starting {len(pending)} remaining device(s): {reason}")
+                    for host in pending:
+                        results[host] = {'hostname': host, 'success': False, 'error': f"Not started: {reason}"}
+                    pending = []
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host = running.pop(future)
+                    results[host] = future.result()
+                    if not results[host]['success']:
+                        failures += 1
+                    logger.info(f"Finished upgrade of {host}: {'ok' if results[host]['success'] else results[host]['error']}")
+        logger.info(f"Rolling upgrade finished in {time.time() - start:.0f}s with {failures} failure(s)")
+        return [results[host] for host in self.hosts]
+
+    def stop(self) -> None:
+        """Start no further devices; devices already in flight finish."""
+        self.stop_event.set()
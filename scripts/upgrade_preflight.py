@@ -0,0 +1,247 @@
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from jnpr.junos import Device
+
+from scripts.async_engine import AsyncEngine, register_job
+from scripts.rpc_batch import run_batch
+
+logger = logging.getLogger(__name__)
+
+# Pre-flight defaults, overridden by the 'preflight' section of upgrade_data.yml
+DEFAULT_SPACE_FACTOR = 2.0  # Free space needed to unpack and install, as a multiple of the image size
+DEFAULT_MAX_CPU = 80  # Percent routing-engine CPU above which a device is not upgraded
+DEFAULT_MAX_MEMORY = 80  # Percent routing-engine memory above which a device is not upgraded
+DEFAULT_ALARM_CLASSES = ('Major',)  # Alarm classes that block an upgrade; other alarms are warnings
+DEFAULT_PREFLIGHT_CONCURRENCY = 256
+
+PKG_LOCK_FILE = '/var/run/pkg.active'
+# Filesystems holding /var/tmp, most specific first (branch SRX, newer Junos, others)
+VAR_MOUNTS = ('/cf/var', '/.mount/var', '/var', '/')
+_BLOCK_SIZE = 512  # Junos storage XML counts 512-byte blocks
+
+CHECKS = ('version', 'image', 'storage', 'alarms', 'pkg_lock', 'cpu', 'memory')
+
+def preflight_settings(upgrade_data: Dict) -> Dict:
+    """Return the pre-flight thresholds from upgrade_data.yml, falling back to the defaults."""
+    settings = upgrade_data.get('preflight') or {}
+    return {
+        'space_factor': float(settings.get('space_factor', DEFAULT_SPACE_FACTOR)),
+        'max_cpu': float(settings.get('max_cpu', DEFAULT_MAX_CPU)),
+        'max_memory': float(settings.get('max_memory', DEFAULT_MAX_MEMORY)),
+        'alarm_classes': [str(c) for c in settings.get('alarm_classes') or DEFAULT_ALARM_CLASSES],
+    }
+
+def _int(text: Optional[str]) -> Optional[int]:
+    try:
+        return int(text.strip()) if text is not None else None
+    except ValueError:
+        return None
+
+def parse_var_free(reply) -> Optional[Dict]:
+    """Return the mount point and free bytes of the filesystem holding /var/tmp."""
+    available = {}
+    for fs in reply.iter('filesystem'):
+        mount = (fs.findtext('mounted-on') or '').strip()
+        blocks = _int(fs.findtext('available-blocks'))
+        if mount and blocks is not None and mount not in available:
+            available[mount] = blocks * _BLOCK_SIZE
+    for mount in VAR_MOUNTS:
+        if mount in available:
+            return {'mount': mount, 'free': available[mount]}
+    return None
+
+def parse_alarms(*replies) -> List[str]:
+    """Return 'class: description' for every active system and chassis alarm."""
+    alarms = []
+    for reply in replies:
+        for detail in reply.iter('alarm-detail'):
+            alarms.append(f"{(detail.findtext('alarm-class') or '').strip()}: "
+                          f"{(detail.findtext('alarm-description') or '').strip()}")
+    return alarms
+
+def parse_file_size(reply) -> Optional[int]:
+    """Return the size of the file a 'file list detail' reply describes, or None if it is missing."""
+    info = reply.find('.//file-information')
+    if info is None:
+        return None
+    return _int(info.findtext('file-size')) or 0
+
+def parse_routing_engine(reply) -> Dict[str, Optional[float]]:
+    """Return CPU and memory utilization (percent) of the first routing engine."""
+    engine = reply.find('.//route-engine')
+    if engine is None:
+        return {'cpu': None, 'memory': None}
+    idle = _int(engine.findtext('cpu-idle'))
+    memory = _int(engine.findtext('memory-buffer-utilization'))
+    if memory is None:
+        memory = _int(engine.findtext('memory-system-total-util'))
+    return {'cpu': None if idle is None else 100 - idle, 'memory': memory}
+
+def _version(reply) -> Optional[str]:
+    version = reply.findtext('.//junos-version')
+    if not version:
+        for package in reply.iter('package-information'):
+            comment = package.findtext('comment') or ''
+            if '[' in comment:
+                return comment.split('[')[-1].strip(' ]')
+    return version.strip() if version else None
+
+def _calls(image_path: str) -> Dict[str, Callable[[Device], Any]]:
+    return {
+        'software': lambda d: d.rpc.get_software_information(),
+        'image': lambda d: d.rpc.file_list(detail=True, path=image_path),
+        'storage': lambda d: d.rpc.get_system_storage(),
+        'system_alarms': lambda d: d.rpc.get_system_alarm_information(),
+        'chassis_alarms': lambda d: d.rpc.get_alarm_information(),
+        'pkg_lock': lambda d: d.rpc.file_list(detail=True, path=PKG_LOCK_FILE),
+        'routing_engine': lambda d: d.rpc.get_route_engine_information(),
+    }
+
+@register_job('upgrade_preflight')
+def preflight_checks(
+    dev: Device,
+    image_path: str,
+    target_version: str,
+    image_size: Optional[int] = None,
+    space_factor: float = DEFAULT_SPACE_FACTOR,
+    max_cpu: float = DEFAULT_MAX_CPU,
+    max_memory: float = DEFAULT_MAX_MEMORY,
+    alarm_classes: Iterable[str] = DEFAULT_ALARM_CLASSES
+) -> Dict[str, Any]:
+    """
+    Run every pre-upgrade check against one device and decide go/no-go.
+
+    The checks are: current version, image present in /var/tmp, free space on the /var
+    filesystem (/cf/var on branch SRX) of at least space_factor times the image size (plus the
+    image itself when it still has to be copied), no active alarm of a class in alarm_classes,
+    no package lock file and routing-engine CPU and memory below their limits. Alarms of other
+    classes (e.g. Minor) do not block the upgrade and are reported as warnings. image_size
+    defaults to the size of the image on the device. A check whose RPC fails counts as failed.
+
+    Returns:
+        Dict[str, Any]: 'version', 'on_target', 'checks' (check -> {'ok', 'detail'}), 'go',
+                        'reasons' (details of the failed checks) and 'warnings'.
+    """
+    replies = run_batch(dev, _calls(image_path), raise_errors=False)
+    checks: Dict[str, Dict] = {}
+    warnings: List[str] = []
+
+    def check(name: str, evaluate: Callable[[], tuple], *sources: str) -> None:
+        failed = [replies[s] for s in sources if isinstance(replies[s], Exception)]
+        if failed:
+            checks[name] = {'ok': False, 'detail': f"{name} unavailable: {failed[0]}"}
+            return
+        try:
+            ok, detail = evaluate()
+        except Exception as e:
+            ok, detail = False, f"{name} unreadable: {e}"
+        checks[name] = {'ok': ok, 'detail': detail}
+
+    version = None if isinstance(replies['software'], Exception) else _version(replies['software'])
+    on_target = bool(version) and (version == target_version or version.startswith(f"{target_version}."))
+    check('version', lambda: (bool(version), version or "version not found"), 'software')
+
+    remote_size = None if isinstance(replies['image'], Exception) else parse_file_size(replies['image'])
+    check('image', lambda: (remote_size is not None,
+                            f"{os.path.basename(image_path)} {'present' if remote_size is not None else 'missing'}"),
+          'image')
+
+    def storage() -> tuple:
+        var = parse_var_free(replies['storage'])
+        if var is None:
+            return False, "/var filesystem not found"
+        size = image_size or remote_size
+        if not size:
+            return False, f"{var['mount']} {var['free'] / 1048576:.0f} MB free, image size unknown"
+        needed = size * space_factor + (0 if remote_size is not None else size)
+        return var['free'] >= needed, f"{var['mount']} {var['free'] / 1048576:.0f} MB free, {needed / 1048576:.0f} MB needed"
+    check('storage', storage, 'storage')
+
+    def alarms() -> tuple:
+        blocking_classes = {c.lower() for c in alarm_classes}
+        blocking = []
+        for alarm in parse_alarms(replies['system_alarms'], replies['chassis_alarms']):
+            if alarm.split(':', 1)[0].lower() in blocking_classes:
+                blocking.append(alarm)
+            else:
+                warnings.append(f"alarm {alarm}")
+        if blocking:
+            return False, '; '.join(blocking)
+        return True, f"no {'/'.join(alarm_classes)} alarms" if warnings else "no alarms"
+    check('alarms', alarms, 'system_alarms', 'chassis_alarms')
+
+    def pkg_lock() -> tuple:
+        locked = parse_file_size(replies['pkg_lock']) is not None
+        return not locked, f"{PKG_LOCK_FILE} present" if locked else "no package lock"
+    check('pkg_lock', pkg_lock, 'pkg_lock')
+
+    usage = {} if isinstance(replies['routing_engine'], Exception) else parse_routing_engine(replies['routing_engine'])
+    for name, limit in (('cpu', max_cpu), ('memory', max_memory)):
+        value = usage.get(name)
+        check(name, lambda: (value is not None and value <= limit,
+                             f"{name} {value}% (limit {limit:.0f}%)" if value is not None else f"{name} unknown"),
+              'routing_engine')
+
+    reasons = [c['detail'] for name, c in checks.items() if not c['ok']]
+    return {'version': version, 'on_target': on_target, 'checks': checks, 'go': not reasons, 'reasons': reasons,
+            'warnings': warnings}
+
+def run_preflight(
+    connections: List[Device],
+    image_path: str,
+    target_version: str,
+    image_size: Optional[int] = None,
+    settings: Optional[Dict] = None,
+    max_concurrency: int = DEFAULT_PREFLIGHT_CONCURRENCY
+) -> Dict[str, Dict]:
+    """
+    Run the pre-flight checks on every open device concurrently, one session per device.
+
+    Returns:
+        Dict[str, Dict]: preflight_checks result per device hostname; a device whose checks could
+                         not run at all is a no-go with the error as its reason.
+    """
+    settings = settings or {}
+    start = time.time()
+    engine = AsyncEngine(max_concurrency=max_concurrency, max_threads=max_concurrency)
+    results = engine.run(connections, preflight_checks, image_path, target_version, image_size, **settings)
+    reports = {}
+    for host, result in results.items():
+        if isinstance(result, BaseException):
+            logger.error(f"Pre-flight checks failed to run on {host}: {result}")
+            reports[host] = {'version': None, 'on_target': False, 'checks': {}, 'go': False,
+                             'reasons': [f"checks failed: {result}"], 'warnings': []}
+        else:
+            reports[host] = result
+    go = sum(1 for r in reports.values() if r['go'])
+    logger.info(f"Pre-flight of {len(reports)} device(s) in {time.time() - start:.2f}s: {go} go")
+    return reports
+
+def format_preflight(reports: Dict[str, Dict], target_version: str) -> str:
+    """Return a go/no-go table with one line per device, the reasons of each no-go and any warnings."""
+    lines = [f"{'Host':<18} {'Result':<7} {'Version':<18} " + ' '.join(f"{c:<8}" for c in CHECKS)]
+    for host, report in sorted(reports.items()):
+        result = 'SKIP' if report['on_target'] else 'GO' if report['go'] else 'NO-GO'
+        marks = ' '.join(f"{('ok' if report['checks'][c]['ok'] else 'FAIL') if c in report['checks'] else '-':<8}"
+                         for c in CHECKS)
+        version = f"{report['version'] or '-'}{' *' if report['on_target'] else ''}"
+        lines.append(f"{host:<18} {result:<7} {version:<18} {marks}")
+    for host, report in sorted(reports.items()):
+        if not report['on_target']:
+            lines.extend(f"  {host}: {reason}" for reason in report['reasons'])
+            lines.extend(f"  {host}: warning: {warning}" for warning in report.get('warnings', []))
+    lines.append(f"(* already on {target_version}; SKIP devices are not upgraded)")
+    return '\n'.join(lines) + '\n'
+
+def save_preflight_report(text: str) -> str:
+    """Write a pre-flight table to reports/ and return its path."""
+    report_dir = os.path.join(os.path.dirname(__file__), '../reports')
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"upgrade_preflight_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
@@ -8,6 +8,8 @@ from jnpr.junos import Device
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+HOSTS_DATA_FILE = os.path.join(os.path.dirname(__file__), '../data/hosts_data.yml')
+
 def load_yaml_file(file_path: str) -> Optional[Dict]:
     """Load a YAML file and return its contents as a Python dict or list."""
     try:
@@ -32,6 +34,14 @@ def save_yaml_file(file_path: str, data: dict) -> None:
     except Exception as e:
         raise Exception(f"Error saving {file_path}: {e}")
 
+def monitor_settings(default_interval: int, default_tables: Optional[List[str]] = None) -> Dict:
+    """Return the polling 'interval' and route 'tables' from hosts_data.yml, falling back to the given defaults."""
+    hosts_data = load_yaml_file(HOSTS_DATA_FILE) or {}
+    return {
+        'interval': int(hosts_data.get('interval') or default_interval),
+        'tables': list(hosts_data.get('tables') or default_tables or []),
+    }
+
 def flatten_inventory(inventory: List[Dict]) -> List[Dict]:
     """Flatten inventory.yml into a list of hosts from switches, routers, and firewalls."""
     flat_hosts = []
@@ -81,78 +91,35 @@ def merge_host_data(inventory_file: str, hosts_data_file: str) -> Optional[Dict]
     return merged
 
 def capture_device_state(dev: Device, hostname: str) -> Dict:
-    """Capture device state: interfaces, BGP, OSPF, and routing table."""
-    state = {}
+    """Capture device state as keyed records: interfaces, BGP peers, OSPF neighbors and route tables.
+
+    All probes run on one session. An already-open session is used as is and left open; a
+    closed device is opened once for the capture and closed again afterwards. See
+    scripts.device_state.capture_state.
+    """
+    # Imported here because the connection pool imports this module
+    from scripts.device_state import capture_state
+    opened_here = False
     try:
-        # Interface status
-        with dev:
-            interfaces = dev.cli("show interfaces terse", warning=False)
-            state['interfaces'] = interfaces.strip()
-            logger.info(f"Captured interface status for {hostname}")
-
-        # BGP summary (if configured)
-        try:
-            bgp_summary = dev.cli("show bgp summary", warning=False)
-            state['bgp_summary'] = bgp_summary.strip() if "Groups:" in bgp_summary else "BGP not configured"
-            logger.info(f"Captured BGP summary for {hostname}")
-        except Exception:
-            state['bgp_summary'] = "BGP not configured"
-            logger.info(f"BGP not configured on {hostname}")
-
-        # OSPF neighbors (if configured)
-        try:
-            ospf_neighbors = dev.cli("show ospf neighbor", warning=False)
-            state['ospf_neighbors'] = ospf_neighbors.strip() if "Neighbor" in ospf_neighbors else "OSPF not configured"
-            logger.info(f"Captured OSPF neighbors for {hostname}")
-        except Exception:
-            state['ospf_neighbors'] = "OSPF not configured"
-            logger.info(f"OSPF not configured on {hostname}")
-
-        # Routing table summary
-        routing_summary = dev.cli("show route summary", warning=False)
-        state['routing_summary'] = routing_summary.strip()
-        logger.info(f"Captured routing table summary for {hostname}")
-
+        if not dev.connected:
+            dev.open()
+            opened_here = True
+        state = capture_state(dev)
+        logger.info(f"Captured state for {hostname}: " +
+                    ", ".join(f"{len(state[s])} {s}" for s in ('interfaces', 'bgp', 'ospf', 'routes')) +
+                    f" (probe seconds: {state['timings']})")
     except Exception as e:
         logger.error(f"Error capturing state for {hostname}: {e}")
-        state['error'] = str(e)
-
+        state = {'error': str(e)}
+    finally:
+        if opened_here:
+            try:
+                dev.close()
+            except Exception as e:
+                logger.debug(f"Error closing {hostname} after state capture: {e}")
     return state
 
 def compare_states(pre_state: Dict, post_state: Dict) -> Dict:
-    """Compare pre- and post-states and return differences."""
-    differences = {}
-
-    # Compare interfaces
-    if pre_state.get('interfaces') != post_state.get('interfaces'):
-        differences['interfaces'] = {
-            'pre': pre_state.get('interfaces', 'N/A'),
-            'post': post_state.get('interfaces', 'N/A'),
-            'note': 'Interface status changed'
-        }
-
-    # Compare BGP summary
-    if pre_state.get('bgp_summary') != post_state.get('bgp_summary'):
-        differences['bgp_summary'] = {
-            'pre': pre_state.get('bgp_summary', 'N/A'),
-            'post': post_state.get('bgp_summary', 'N/A'),
-            'note': 'BGP summary changed'
-        }
-
-    # Compare OSPF neighbors
-    if pre_state.get('ospf_neighbors') != post_state.get('ospf_neighbors'):
-        differences['ospf_neighbors'] = {
-            'pre': pre_state.get('ospf_neighbors', 'N/A'),
-            'post': post_state.get('ospf_neighbors', 'N/A'),
-            'note': 'OSPF neighbors changed'
-        }
-
-    # Compare routing summary
-    if pre_state.get('routing_summary') != post_state.get('routing_summary'):
-        differences['routing_summary'] = {
-            'pre': pre_state.get('routing_summary', 'N/A'),
-            'post': post_state.get('routing_summary', 'N/A'),
-            'note': 'Routing table summary changed'
-        }
-
-    return differences
+    """Compare pre- and post-states and return only the changed objects and fields."""
+    from scripts.device_state import diff_states
+    return diff_states(pre_state, post_state)
@@ -0,0 +1,133 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from jnpr.junos import Device
+
+from scripts.facts_cache import get_device_facts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_FILE = os.path.join(os.path.dirname(__file__), '../reports/validation_ledger.json')
+DEFAULT_MAX_AGE = 7 * 86400  # Seconds a passed validation can stand in for a new one
+
+def _config_hash(dev: Device) -> str:
+    """Hash the running configuration, ignoring the '## Last commit' comment lines."""
+    config = dev.rpc.get_config(options={'format': 'text'})
+    text = config.findtext('.') if hasattr(config, 'findtext') else str(config)
+    lines = [line for line in (text or '').splitlines() if not line.lstrip().startswith('##')]
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+def _image_md5(dev: Device, image_path: str) -> Optional[str]:
+    """Return the MD5 the device computes for an image ('file checksum md5')."""
+    reply = dev.rpc.get_checksum_information(path=image_path)
+    checksum = reply.findtext('.//checksum')
+    return checksum.strip().lower() if checksum else None
+
+def validation_key(dev: Device, image_path: str) -> Dict[str, str]:
+    """
+    Return what a validation result depends on: the chassis serial, the image checksum and the running config.
+
+    Raises if any part cannot be read, so callers fall back to validating.
+    """
+    serial = get_device_facts(dev).get('serial')
+    image_md5 = _image_md5(dev, image_path)
+    if not serial or not image_md5:
+        raise ValueError(f"Missing {'serial' if not serial else 'image checksum'} for {dev.hostname}")
+    return {'serial': serial, 'image_md5': image_md5, 'config_hash': _config_hash(dev)}
+
+class ValidationLedger:
+    """
+    Persistent record of image validation results, keyed by serial, image checksum and config hash.
+
+    Validation only depends on the hardware, the image and the configuration it is checked
+    against, so a passed validation with the same three values can be trusted on a retry and
+    the multi-minute validation skipped.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_FILE, max_age: int = DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    @staticmethod
+    def _key(key: Dict[str, str]) -> str:
+        return f"{key['serial']}|{key['image_md5']}|{key['config_hash']}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record(self, host: str, image: str, key: Dict[str, str], passed: bool, duration: float) -> None:
+        with self._lock:
+            self._load()[self._key(key)] = dict(key, host=host, image=image, passed=passed,
+                                                 duration=round(duration, 1), timestamp=time.time())
+            self._save()
+        logger.info(f"Recorded {'passed' if passed else 'failed'} validation of {image} on {host}")
+
+    def lookup(self, key: Dict[str, str]) -> Optional[Dict]:
+        """Return a recent passed validation for key, or None."""
+        with self._lock:
+            entry = self._load().get(self._key(key))
+        if entry and entry['passed'] and time.time() - entry['timestamp'] <= self.max_age:
+            return entry
+        return None
+
+    def entries(self, host: Optional[str] = None) -> List[Dict]:
+        """Return recorded validations, newest first, optionally for one host."""
+        with self._lock:
+            entries = list(self._load().values())
+        return sorted((e for e in entries if host is None or e['host'] == host),
+                      key=lambda e: e['timestamp'], reverse=True)
+
+_ledger: Optional[ValidationLedger] = None
+_ledger_lock = threading.Lock()
+
+def get_validation_ledger() -> ValidationLedger:
+    """Return the validation ledger shared by the process."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = ValidationLedger()
+        return _ledger
+
+def print_ledger(entries: List[Dict], max_age: int = DEFAULT_MAX_AGE) -> None:
+    """Print one line per recorded validation; 'reusable' marks entries a retry would skip on."""
+    print(f"{'Time':<19}  {'Host':<16} {'Serial':<14} {'Image':<40} {'Result':<7} {'Secs':>6}  Reusable")
+    now = time.time()
+    for e in entries:
+        reusable = 'yes' if e['passed'] and now - e['timestamp'] <= max_age else 'no'
+        print(f"{datetime.fromtimestamp(e['timestamp']).isoformat(sep=' ', timespec='seconds'):<19}  "
+              f"{e['host']:<16} {e['serial']:<14} {e['image']:<40} {'passed' if e['passed'] else 'failed':<7} "
+              f"{e['duration']:>6.0f}  {reusable}")
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Show recorded image validations")
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER_FILE)
+    parser.add_argument('--host', help="Only show validations of this host")
+    args = parser.parse_args(argv)
+    ledger = ValidationLedger(args.ledger)
+    print_ledger(ledger.entries(args.host), ledger.max_age)
+
+if __name__ == "__main__":
+    # Run as: python -m scripts.validation_ledger [--host 172.27.200.200]
+    main()
@@ -4,6 +4,8 @@ from jnpr.junos import Device
 from jnpr.junos.exception import ConnectError, ConnectRefusedError, RpcError
 from jnpr.junos.utils.sw import SW
 
+from scripts.facts_cache import get_device_facts, invalidate_device_facts
+
 # Device credentials and image path
 device_ip = "172.27.200.200"
 username = "admin"
@@ -20,9 +22,9 @@ TARGET_VERSION = "23.4R2-S3.9"
 
 
 def get_junos_version(dev):
-    # Get the device facts, including the version
-    facts = dev.facts
-    return facts.get("version", "Unknown version")
+    # Get the version from the facts cache, refreshing from the device when stale
+    facts = get_device_facts(dev)
+    return facts.get("version") or "Unknown version"
 
 
 def reconnect_device():
@@ -33,7 +35,7 @@ def reconnect_device():
             print(
                 f"Attempting to reconnect to {device_ip} (Attempt {retry_count + 1}/{MAX_RETRIES})..."
             )
-            dev = Device(host=device_ip, user=username, passwd=password)
+            dev = Device(host=device_ip, user=username, passwd=password, gather_facts=False)
             dev.open()
             print(f"✅ Successfully logged in to {device_ip} after reboot.")
             return dev
@@ -51,7 +53,7 @@ def reconnect_device():
 
 try:
     print("Connecting to device...")
-    dev = Device(host=device_ip, user=username, passwd=password)
+    dev = Device(host=device_ip, user=username, passwd=password, gather_facts=False)
     dev.open()
 
     print(f"✅ Successfully logged in to {device_ip}")
@@ -64,6 +66,7 @@ try:
     if success:
         print("✅ Installation validated successfully. Rebooting...")
         sw.reboot()
+        invalidate_device_facts(device_ip)
 
         # Wait for device to come back online (reconnect with retry mechanism)
         dev = reconnect_device()